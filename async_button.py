@@ -2,12 +2,16 @@
 # SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
 #
 # SPDX-License-Identifier: MIT
+# pylint: disable=too-many-lines
 """
 `async_button`
 ================================================================================
 
 a library for reading buttons using asyncio
 
+`ClickClassifier` and `PolledButton` live in `async_button_core` and are imported from
+there. `SimpleButton` and `Button` extend the ones in `async_button_core`.
+
 
 * Author(s): Phil Underwood
 
@@ -30,75 +34,56 @@ Implementation Notes
 __version__ = "0.0.0+auto.0"
 __repo__ = "https://github.com/furbrain/CircuitPython_async_button.git"
 
-import asyncio
-from asyncio import Event
+import gc
+import struct
+from array import array
+
+try:
+    import asyncio
+except ImportError:
+    # ClickClassifier and PolledButton can be used without asyncio
+    asyncio = None
 
-from adafruit_ticks import ticks_add, ticks_less, ticks_ms
+from adafruit_ticks import ticks_add, ticks_diff, ticks_less, ticks_ms
 
 try:
-    from typing import Dict, Sequence, Awaitable, Any, Union
+    from typing import Dict, List, Sequence, Awaitable, Any, Union, Callable, Tuple
 except ImportError:
     pass
 
-import digitalio
 import keypad
 from microcontroller import Pin
-import countio
 
+try:
+    import countio
+except ImportError:
+    # countio is not available on all boards (or on a host computer), only SimpleButton needs it
+    countio = None
 
-class SimpleButton:
-    """
-    Asynchronous interface to a button or other IO input. This does not create a background
-    task.
-    """
-
-    def __init__(
-        self, pin: Pin, value_when_pressed: bool, *, pull: bool = True, interval=0.05
-    ):
-        """
+try:
+    import rotaryio
+except ImportError:
+    # rotaryio is not available on all boards (or on a host computer), only RotaryEncoder
+    # needs it
+    rotaryio = None
 
-        :param Pin pin: Pin to wait for
-        :param bool value_when_pressed: ``True`` if the pin reads high when the key is pressed.
-          ``False`` if the pin reads low (is grounded) when the key is pressed.
-        :param bool pull: ``True`` if an internal pull-up or pull-down should be enabled on the
-          pin. A pull-up will be used if value_when_pressed is False; a pull-down will be used if
-          it is ``True``. If an external pull is already provided for the pin, you can set
-          pull to ``False``. However, enabling an internal pull when an external one is already
-          present is not a problem; it simply uses slightly more current.
-        :param float interval: How long to wait between checks of whether the button has changed.
-          Default is 0.05s (human experience of "instantaneous" is up to 0.1s). This parameter
-          can be set to zero and the button will be checked as often as possible, although other
-          coroutines will still be able to run.
-        """
-        self.pin: Pin = pin
-        self.value_when_pressed = value_when_pressed
-        self.interval = interval
-        if pull:
-            self.pull = digitalio.Pull.DOWN if value_when_pressed else digitalio.Pull.UP
-        else:
-            self.pull = None
+try:
+    import touchio
+except (ImportError, NotImplementedError):
+    # only TouchKeys needs touchio
+    touchio = None
 
-    async def pressed(self):
-        """
-        Wait until button is pressed
-        """
-        edge = countio.Edge.RISE if self.value_when_pressed else countio.Edge.FALL
-        with countio.Counter(self.pin, edge=edge, pull=self.pull) as counter:
-            while True:
-                if counter.count > 0:
-                    return
-                await asyncio.sleep(self.interval)
+try:
+    import analogio
+except (ImportError, NotImplementedError):
+    # only LadderKeys needs analogio
+    analogio = None
 
-    async def released(self):
-        """
-        Wait until button is released
-        """
-        edge = countio.Edge.FALL if self.value_when_pressed else countio.Edge.RISE
-        with countio.Counter(self.pin, edge=edge, pull=self.pull) as counter:
-            while True:
-                if counter.count > 0:
-                    return
-                await asyncio.sleep(self.interval)
+import async_button_core
+from async_button_core import (  # pylint: disable=unused-import
+    ClickClassifier,
+    PolledButton,
+)
 
 
 class TaskWrapper:
@@ -107,7 +92,7 @@ class TaskWrapper:
     Shouldn't really need this but CircuitPython does not have asyncio.wait or Task.result()
     """
 
-    def __init__(self, coro: Awaitable, event: Event):
+    def __init__(self, coro: Awaitable, event: "asyncio.Event"):
         """
         :param Awaitable coro: coroutine to run
         :param asyncio.Event event:
@@ -147,230 +132,1242 @@ class TaskWrapper:
         self.task.cancel()
 
 
-class Button:
+class SimpleButton(async_button_core.SimpleButton):
+    """
+    Asynchronous interface to a button or other IO input. This does not create a background
+    task. This is `async_button_core.SimpleButton` with `wait_any` added.
+    """
+
+    @staticmethod
+    async def wait_any(
+        buttons: Sequence["SimpleButton"], *, release: bool = False
+    ) -> Tuple["SimpleButton", int]:
+        """
+        Wait until any of several buttons is pressed (or released). All the pins are checked
+        in one loop, so there is one wakeup per check however many buttons there are, rather
+        than one per button as when awaiting `pressed` on each. The checks are made at the
+        shortest ``interval`` of the buttons. ``debounce`` is not applied.
+
+        :param Sequence[SimpleButton] buttons: The buttons to wait for
+        :param bool release: ``True`` to wait for a release rather than a press
+        :return: The first of ``buttons`` that fired, and how many edges it has seen
+        :example:
+          .. code-block:: python
+
+            >>> buttons = [SimpleButton(pin, False) for pin in (board.D5, board.D6, board.D7)]
+            >>> button, _ = await SimpleButton.wait_any(buttons)
+            >>> print(button.pin, "pressed")
+        """
+        interval = min(button.interval for button in buttons)
+        counters = []
+        try:
+            for button in buttons:
+                rise = button.value_when_pressed != release
+                edge = countio.Edge.RISE if rise else countio.Edge.FALL
+                counters.append(
+                    countio.Counter(button.pin, edge=edge, pull=button.pull)
+                )
+            while True:
+                for button, counter in zip(buttons, counters):
+                    count = counter.count
+                    if count:
+                        return button, count
+                await asyncio.sleep(interval)
+        finally:
+            for counter in counters:
+                counter.deinit()
+
+
+class EventRecord:
+    """
+    Details of events fired by a `Button`, as returned by `Button.wait_record`. Records come
+    from a small pool owned by each button and are reused, so a record is only valid until
+    that button has fired `Button.record_pool_size` more times. Copy out any values you need
+    to keep.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        #: The `Button` that fired these events
+        self.button = None
+        #: Bitmask of the events that fired together, e.g. ``Button.RELEASED | Button.SINGLE``
+        self.events = 0
+        #: When the events happened in milliseconds, from the `keypad.Event` timestamp where
+        #: available
+        self.timestamp = 0
+        #: How long the button was held for in milliseconds (zero for `Button.PRESSED`)
+        self.duration = 0
+        #: Position of the press in its click sequence: 1, 2 or 3 for single, double or
+        #: triple click
+        self.clicks = 1
+
+    def __repr__(self):
+        return "<EventRecord events={} timestamp={} duration={} clicks={}>".format(
+            self.events, self.timestamp, self.duration, self.clicks
+        )
+
+
+class Button(async_button_core.Button):
     """
     This object will monitor the specified pin for changes and will report
     single, double, triple and long_clicks. It creates a background `asyncio` process
     that will monitor the button. The `events` chapter in the documentation shows when the
     various events are triggered
+
+    Buttons can also be declared before the event loop is running, e.g. in a table at
+    module level, by passing ``start=False``. Such a button does not claim its pin or create
+    its background task until `start` is called, or it is first waited for. Use
+    `MultiButton.start` to start a whole group at once.
     """
 
-    PRESSED = 1  #: Button has been pressed
-    RELEASED = 2  #: Button has been released
-    SINGLE = 4  #: Single click
-    DOUBLE = 8  #: Double click
-    TRIPLE = 16  #: Triple click
-    LONG = 32  #: Long click
-    ANY_CLICK = (
-        SINGLE,
-        DOUBLE,
-        TRIPLE,
-        LONG,
-    )  #: Any of `SINGLE`, `DOUBLE`, `TRIPLE` or `LONG`
-    ALL_EVENTS = (PRESSED, RELEASED, SINGLE, DOUBLE, TRIPLE, LONG)  #: Any event
+    # pylint: disable=too-many-instance-attributes
 
-    def __init__(
+    record_pool_size = 4  #: Number of `EventRecord` objects each button reuses
+
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         pin: Pin,
         value_when_pressed: bool,
         *,
-        pull: bool = True,
-        interval: float = 0.020,
-        double_click_max_duration=0.5,
-        long_click_min_duration=2.0,
-        double_click_enable: bool = True,
-        triple_click_enable: bool = False,
-        long_click_enable: bool = False,
+        sink=None,
+        sink_source: int = 0,
+        lateness_budget: float = None,
+        on_late: Callable[["Button", int], None] = None,
+        start: bool = True,
+        **kwargs,
     ):
         """
-        Create the button object and start the background async process, this object must be
-        created only when the asyncio event loop is running
+        Create the button object and start the background async process. Unless ``start`` is
+        ``False``, this object must be created only when the asyncio event loop is running.
+        Other parameters are as for `PolledButton`.
 
-        :param Pin pin: the pin to be monitored
-        :param bool value_when_pressed: ``True`` if the pin reads high when the key is pressed.
-          ``False`` if the pin reads low (is grounded) when the key is pressed.
-        :param bool pull: ``True`` if an internal pull-up or pull-down should be enabled on
-          the pin. A pull-up will be used if ``value_when_pressed`` is ``False``; a pull-down
-          will be used if it is True. If an external pull is already provided for the pins,
-          you can set pull to ``False``. However, enabling an internal pull when an external one
-          is already present is not a problem; it simply uses slightly more current. Default is
-          True.
-        :param float interval: How long we wait between checking the state of the button. Default is
-          0.02 (20 milliseconds), which is a good value for debouncing.
-        :param float double_click_max_duration: how long in seconds before a second click is
-          registered as a double click (this is also the value used for triple clicks.
-          Default is 0.5 seconds.
-        :param float long_click_min_duration: how long in seconds the button must be pressed before
-          a long_click is triggered. Default is 2 seconds.
-        :param bool double_click_enable: Whether double clicks are detected. Default is True.
-        :param bool triple_click_enable: Whether triple clicks are detected. Default is False.
-        :param bool long_click_enable: Whether long clicks are detected. Default is False.
-        """
-        self.pin = pin
-        self.value_when_pressed = value_when_pressed
-        #: Maximum separation between two clicks to register as double in seconds (default is 0.5s)
-        self.double_click_max_duration = double_click_max_duration
-        #: Minimum duration for a click to register as a long click in seconds. Default is 2s
-        self.long_click_min_duration = long_click_min_duration
-        self.interval = interval
-        if not double_click_enable and triple_click_enable:
-            raise ValueError("Must have double click enabled to use triple click")
-        self.click_enabled = {
-            self.DOUBLE: double_click_enable,
-            self.TRIPLE: triple_click_enable,
-            self.LONG: long_click_enable,
-        }
-        self.keys = keypad.Keys(
-            (self.pin,),
-            value_when_pressed=self.value_when_pressed,
-            pull=pull,
-            interval=self.interval,
-        )
-        self.monitor_task = asyncio.create_task(self._monitor())
-        self.events = {
-            x: asyncio.Event()
-            for x in (
-                self.SINGLE,
-                self.DOUBLE,
-                self.TRIPLE,
-                self.LONG,
-                self.PRESSED,
-                self.RELEASED,
-            )
-        }
-        self.last_click = self.SINGLE
-        self.pressed = False
+        :param EventSink sink: If given, every event is also recorded in this sink
+        :param int sink_source: Identifies this button in the sink's records, 0-255
+        :param float lateness_budget: How late in seconds the background task may wake up
+          before it counts as starved, see `lateness`. Default is ``None``, no budget.
+        :param on_late: Called as ``on_late(button, lateness)`` each time the background task
+          wakes up more than ``lateness_budget`` late, with the lateness in milliseconds.
+          Use this to find out which coroutine is hogging the event loop.
+        :param bool start: If ``False``, the pin is not claimed and the background task is
+          not created until `start` is called or the button is first waited for. Default is
+          ``True``.
+        """
+        self._started = start
+        self._deinited = False
+        #: The `EventSink` that events are recorded in, or ``None``
+        self.sink = sink
+        #: Identifies this button in the records of `sink`
+        self.sink_source = sink_source
+        #: ``(state, index)`` for each `MultiButton` this button is in: the `PressedState`
+        #: shared with the other buttons of that group, and this button's index in it. This
+        #: is filled in by `MultiButton`.
+        self.pressed_states = []
+        #: How late the background task may wake up in seconds, or ``None``
+        self.lateness_budget = lateness_budget
+        #: Called when `lateness_budget` is exceeded, or ``None``
+        self.on_late = on_late
+        #: How late in milliseconds the background task woke up last time, compared with
+        #: when it asked to be woken
+        self.lateness = 0
+        #: The largest `lateness` seen; set this to zero to start measuring again
+        self.max_lateness = 0
+        #: How many times the background task has woken up later than `lateness_budget`
+        self.late_count = 0
+        self._records = [EventRecord() for _ in range(self.record_pool_size)]
+        self._record_index = 0
+        #: The `EventRecord` for the most recent events, or ``None`` if nothing has happened
+        self.last_record = None
+        super().__init__(pin, value_when_pressed, **kwargs)
+
+    def _make_keys(self):
+        if not self._started:
+            # claimed by start()
+            return None
+        return super()._make_keys()
+
+    def _start_monitor(self):
+        if self._started:
+            super()._start_monitor()
+
+    def start(self):
+        """
+        Claim the pin and start the background task, if this has not already been done. This
+        must be called when the asyncio event loop is running. A button cannot be started
+        again after `deinit`.
+        """
+        self._check_for_deinit()
+        self._started = True
+        if self.keys is None:
+            self.keys = self._make_keys()
+        self._start_monitor()
+
+    def _check_for_deinit(self):
+        if self._deinited:
+            raise ValueError("Object has been deinitialized")
 
     async def _monitor(self):
         """
         This is the main background task that monitors key presses and releases
         """
-        evt = keypad.Event(0, False)
-        now = ticks_ms()
-        long_click_due = ticks_add(now, int(self.long_click_min_duration * 1000))
-        dbl_clk_expires = ticks_add(now, -100)
+        late = False
         while True:
-            if self.keys.events.get_into(evt):
-                if evt.pressed:
-                    self._trigger(self.PRESSED)
-                    now = getattr(
-                        evt, "timestamp", ticks_ms()
-                    )  # use now if timestamp not there
-                    if ticks_less(now, dbl_clk_expires):
-                        self._increase_clicks()
-                    else:
-                        self.last_click = self.SINGLE
-                    long_click_due = ticks_add(
-                        now, int(self.long_click_min_duration * 1000)
-                    )
-                    dbl_clk_expires = ticks_add(
-                        now, int(self.double_click_max_duration * 1000)
-                    )
-                    self.pressed = True
-                else:
-                    self._trigger(self.RELEASED)
-                    if self.last_click != self.LONG:
-                        self._trigger(self.last_click)
-                    else:
-                        self.last_click = self.SINGLE
-                    self.pressed = False
-            else:
-                if self.pressed and self.click_enabled[self.LONG]:
-                    if (
-                        ticks_less(long_click_due, ticks_ms())
-                        and self.last_click != self.LONG
-                    ):
-                        self.last_click = self.LONG
-                        self._trigger(self.LONG)
-            await asyncio.sleep(self.interval)
+            if late and self.keys is not None:
+                # catch up: handle every queued press and release by its timestamp before
+                # judging deadlines against the current time
+                while self.keys.events.get_into(self._evt):
+                    fired = self._update(self._evt)
+                    if fired:
+                        self._trigger(fired)
+                        await asyncio.sleep(0)
+            fired = self.poll()
+            if fired:
+                self._trigger(fired)
+            now = self.clock()
+            if self.sink is not None:
+                self.sink.service(now)
+            delay = self._delay(now)
+            wake = ticks_add(now, int(delay * 1000))
+            await asyncio.sleep(delay)
+            late = self._check_lateness(ticks_diff(self.clock(), wake))
 
-    def _increase_clicks(self):
-        if self.last_click == self.SINGLE and self.click_enabled[self.DOUBLE]:
-            self.last_click = self.DOUBLE
-        elif self.last_click == self.DOUBLE and self.click_enabled[self.TRIPLE]:
-            self.last_click = self.TRIPLE
-        else:
-            self.last_click = self.SINGLE
+    def _check_lateness(self, lateness: int) -> bool:
+        self.lateness = lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        if self.lateness_budget is None or lateness <= self.lateness_budget * 1000:
+            return False
+        self.late_count += 1
+        if self.on_late is not None:
+            self.on_late(self, lateness)
+        return True
 
-    def _trigger(self, event: int):
-        evt = self.events[event]
-        evt.set()
-        evt.clear()
+    def _trigger(self, fired: int):
+        record = self._records[self._record_index]
+        self._record_index = (self._record_index + 1) % len(self._records)
+        record.button = self
+        record.events = fired
+        self._fill_record(record)
+        self.last_record = record
+        if self.sink is not None:
+            self.sink.add(self.sink_source, record)
+        if fired & self._EDGES:
+            for state, index in self.pressed_states:
+                state.update(index, self.classifier.pressed, record.timestamp)
+        super()._trigger(fired)
 
-    async def wait(self, click_types: Union[int, Sequence[int]] = ALL_EVENTS):
+    def _fill_record(self, record: EventRecord):
+        classifier = self.classifier
+        record.timestamp = classifier.event_time
+        record.duration = classifier.press_duration
+        record.clicks = classifier.clicks
+
+    async def wait(self, click_types: Union[int, Sequence[int]] = None):
         """
-        Wait for the first of the specified events.
+        Wait for the first of the specified events, starting the button first if it was
+        created with ``start=False``. See `async_button_core.Button.wait`.
 
         :param (List[int] | int) click_types: List of events to listen for. You can also pass a
-          single event type in. Default is to listen for all events.
+          single event type in. Default is to listen for all events, see `ALL_EVENTS`.
         :return: A list of the clicks that actually happened.
+        """
+        if self.monitor_task is None:
+            self.start()
+        return await super().wait(click_types)
+
+    async def wait_record(
+        self, click_types: Union[int, Sequence[int]] = None
+    ) -> EventRecord:
+        """
+        Wait for the first of the specified events, and return the details of what happened.
+        This is the same as `wait`, but also tells you when the events happened, how long
+        the button was held and how many clicks there were.
+
+        :param (List[int] | int) click_types: List of events to listen for. You can also pass a
+          single event type in. Default is to listen for all events.
+        :return: An `EventRecord` from this button's pool
 
         :example:
           .. code-block:: python
 
-            >>> async def get_click():
-            >>>     # wait for a double or triple click
-            >>>     clicks = await button.wait((Button.DOUBLE, Button.TRIPLE))
-            >>>     if Button.DOUBLE in clicks:
-            >>>         # do something
+            >>> record = await button.wait_record(Button.RELEASED)
+            >>> print("Held for", record.duration, "ms")
+        """
+        await self.wait(click_types)
+        return self.last_record
+
+    def deinit(self):
+        """
+        Deinitialise object and stop the background task
+        """
+        super().deinit()
+        self._started = False
+        self._deinited = True
+        if self.sink is not None:
+            self.sink.flush()
+
+
+class EventSink:
+    """
+    Collects events from one or more buttons as fixed size binary records, and writes them to
+    a stream in bulk. This is much cheaper than printing a line per event, which blocks the
+    event loop while the text is sent.
+
+    Each record is `RECORD_SIZE` bytes, packed little-endian with `RECORD_FORMAT`: source,
+    clicks, events, timestamp, duration. ``source`` identifies which button the record came
+    from (see `Button.sink_source`), the other fields are as for `EventRecord`. Use
+    `async_button_analysis.decode_events` to unpack them on a host computer.
+
+    Records are written to the stream when the buffer is full, or by `service` once the
+    oldest buffered record is ``flush_interval`` seconds old. `Button` calls `service`
+    from its background task, so you only need to call `flush` before shutting down.
+
+    :example:
+      .. code-block:: python
+
+        >>> sink = EventSink(open("/events.bin", "ab"))
+        >>> button = Button(board.D5, True, sink=sink)
+    """
+
+    RECORD_FORMAT = "<BBHLL"  #: `struct` format of each record
+    RECORD_SIZE = struct.calcsize(RECORD_FORMAT)  #: Size of each record in bytes
+
+    def __init__(
+        self,
+        stream,
+        *,
+        capacity: int = 32,
+        flush_interval: float = 1.0,
+        clock: Callable[[], int] = None,
+    ):
+        """
+        :param stream: Where to write records: anything with a ``write`` method that accepts
+          bytes, e.g. a file, `usb_cdc.Serial`, `busio.UART` or `io.BytesIO`
+        :param int capacity: Number of records to buffer before writing them out
+        :param float flush_interval: Longest time to keep a record in the buffer, in seconds
+        :param clock: Function returning the current time in milliseconds, see
+          `PolledButton`. Default is `adafruit_ticks.ticks_ms`.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.stream = stream
+        self.flush_interval = flush_interval
+        self._clock = ticks_ms if clock is None else clock
+        self._buffer = bytearray(capacity * self.RECORD_SIZE)
+        self._view = memoryview(self._buffer)
+        self._length = 0
+        self._first_time = 0
+        #: Number of records written to the stream so far
+        self.records_written = 0
+
+    def __len__(self):
+        """Number of records waiting in the buffer"""
+        return self._length // self.RECORD_SIZE
+
+    def add(self, source: int, record: EventRecord):
+        """
+        Add a record to the buffer, writing the buffer out first if it is full
+
+        :param int source: Identifier of the button, 0-255
+        :param EventRecord record: The events to record
+        """
+        if self._length == len(self._buffer):
+            self.flush()
+        if not self._length:
+            self._first_time = self._clock()
+        struct.pack_into(
+            self.RECORD_FORMAT,
+            self._buffer,
+            self._length,
+            source,
+            record.clicks,
+            record.events,
+            record.timestamp,
+            record.duration,
+        )
+        self._length += self.RECORD_SIZE
+
+    def service(self, now: int):
+        """
+        Write out the buffer if its oldest record has been waiting for ``flush_interval``
+
+        :param int now: The current time from `adafruit_ticks.ticks_ms`
+        """
+        if self._length and ticks_diff(now, self._first_time) >= int(
+            self.flush_interval * 1000
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered records to the stream
+        """
+        if self._length:
+            self.stream.write(self._view[: self._length])
+            self.records_written += self._length // self.RECORD_SIZE
+            self._length = 0
+
+
+class RotaryEncoder(Button):
+    """
+    A rotary encoder, optionally with a push button, that works like a `Button`: wait for
+    `ROTATED` with `wait` or `wait_rotation`, or add it to a `MultiButton`. The push button
+    gets the same click detection as any other `Button`.
+
+    Turns are coalesced: however many detents go by before you next look, one `ROTATED`
+    event wakes you, and `rotation` gives the net number of detents since you last asked.
+
+    :example:
+      .. code-block:: python
 
+        >>> encoder = RotaryEncoder(board.D5, board.D6, board.D7, False)
+        >>> while True:
+        >>>     delta, velocity = await encoder.wait_rotation()
+        >>>     volume += delta * (5 if abs(velocity) > 20 else 1)
+    """
+
+    ROTATED = 1 << 14  #: The encoder has turned, see `rotation`
+    ALL_EVENTS = Button.ALL_EVENTS + (ROTATED,)  #: Any event
+    _ALL_EVENTS_MASK = Button._ALL_EVENTS_MASK | ROTATED
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        pin_a: Pin,
+        pin_b: Pin,
+        button_pin: Pin = None,
+        value_when_pressed: bool = False,
+        *,
+        divisor: int = 4,
+        **kwargs,
+    ):
+        """
+        :param Pin pin_a: First pin of the encoder
+        :param Pin pin_b: Second pin of the encoder
+        :param Pin button_pin: Pin of the push button, or ``None`` if there isn't one
+        :param bool value_when_pressed: ``True`` if the push button pin reads high when
+          pressed. Default is ``False``, as most encoder buttons connect to ground.
+        :param int divisor: How many quadrature steps make one detent, see
+          `rotaryio.IncrementalEncoder`. Default is 4.
+
+        Other parameters are as for `Button`.
+        """
+        self.pin_a = pin_a
+        self.pin_b = pin_b
+        self.divisor = divisor
+        #: The `rotaryio.IncrementalEncoder`, or ``None`` if not yet started
+        self.encoder = None
+        self._position = 0
+        self._delta = 0
+        self._delta_start = 0
+        self._delta_end = 0
+        self._last_sample = 0
+        super().__init__(button_pin, value_when_pressed, **kwargs)
+
+    def _make_keys(self):
+        if self.pin is None:
+            return None
+        return super()._make_keys()
+
+    def _claim_encoder(self):
+        if self.encoder is None:
+            self.encoder = rotaryio.IncrementalEncoder(
+                self.pin_a, self.pin_b, divisor=self.divisor
+            )
+            self._position = self.encoder.position
+            self._last_sample = self.clock()
+
+    def _start_monitor(self):
+        if self._started:
+            self._claim_encoder()
+        super()._start_monitor()
+
+    def poll(self) -> int:
+        """
+        Check the push button and the encoder for changes, see `PolledButton.poll`
+
+        :return: the events that happened as a bitmask, including `ROTATED` if the encoder
+          has turned since the last call
+        """
+        fired = 0 if self.keys is None else super().poll()
+        now = self.clock()
+        position = self.encoder.position
+        if position != self._position:
+            if not self._delta:
+                # measure speed from the last time the encoder was seen still
+                self._delta_start = self._last_sample
+            self._delta += position - self._position
+            self._delta_end = now
+            self._position = position
+            fired |= self.ROTATED
+        self._last_sample = now
+        return fired
+
+    def _trigger(self, fired: int):
+        # a turn gets a record of its own, as it does not share the push button's timing
+        if fired & self.ROTATED and fired != self.ROTATED:
+            super()._trigger(fired & ~self.ROTATED)
+            fired = self.ROTATED
+        super()._trigger(fired)
+
+    def _fill_record(self, record: EventRecord):
+        if record.events == self.ROTATED:
+            record.timestamp = self._delta_end
+            record.duration = 0
+            record.clicks = 1
+        else:
+            super()._fill_record(record)
+
+    def rotation(self) -> Tuple[int, float]:
+        """
+        How far the encoder has turned since this was last called, and how fast
+
+        :return: the net number of detents turned (positive for clockwise), and the average
+          speed in detents per second over that turn (negative for anticlockwise)
+        """
+        delta = self._delta
+        if not delta:
+            return 0, 0.0
+        self._delta = 0
+        elapsed = max(ticks_diff(self._delta_end, self._delta_start), 1)
+        return delta, delta * 1000 / elapsed
+
+    async def wait_rotation(self) -> Tuple[int, float]:
+        """
+        Wait until the encoder has turned, and return the turn as for `rotation`. If it has
+        already turned since `rotation` was last called, this returns at once.
+        """
+        if not self._delta:
+            await self.wait(self.ROTATED)
+        return self.rotation()
+
+    def deinit(self):
+        """
+        Deinitialise object, stop the background task and release the pins
+        """
+        super().deinit()
+        if self.encoder is not None:
+            self.encoder.deinit()
+            self.encoder = None
+
+
+class ThresholdKeys:
+    """
+    Base class for keys read by comparing a measurement with a threshold, rather than by
+    `keypad`. Give one to a `ButtonMatrix` in place of a `keypad` scanner: every key is then
+    sampled in one pass each ``interval``, and fed to the same click detection.
+
+    A key only changes state once ``debounce`` samples in a row agree. Subclasses fill in
+    `_read`.
+    """
+
+    def __init__(self, key_count: int, *, debounce: int = 2):
+        """
+        :param int key_count: Number of keys
+        :param int debounce: How many samples in a row must agree before a key changes
+          state. Default is 2.
+        """
+        if debounce < 1:
+            raise ValueError("debounce must be at least 1")
+        self.key_count = key_count
+        self.debounce = debounce
+        self._state = bytearray(key_count)
+        self._count = bytearray(key_count)
+        self._raw = bytearray(key_count)
+        #: Keys that changed in the last `scan`, see `changed_pressed`
+        self.changed_keys = array("H", [0]) * key_count
+        #: Whether each of `changed_keys` was pressed (1) or released (0)
+        self.changed_pressed = bytearray(key_count)
+
+    def _read(self, raw: bytearray):
+        """
+        Take one sample of every key, and set ``raw[key]`` to 1 if it looks pressed. The
+        current debounced state is in ``self._state`` for applying hysteresis.
+        """
+        raise NotImplementedError
+
+    def scan(self) -> int:
+        """
+        Sample every key once and debounce the result
+
+        :return: the number of keys that changed state; they are the first entries of
+          `changed_keys` and `changed_pressed`
+        """
+        raw = self._raw
+        self._read(raw)
+        state = self._state
+        count = self._count
+        changed = 0
+        for key in range(self.key_count):
+            if raw[key] == state[key]:
+                count[key] = 0
+                continue
+            count[key] += 1
+            if count[key] >= self.debounce:
+                count[key] = 0
+                state[key] = raw[key]
+                self.changed_keys[changed] = key
+                self.changed_pressed[changed] = raw[key]
+                changed += 1
+        return changed
+
+    def pressed(self, key: int) -> bool:
+        """
+        :return: whether the key is pressed, after debouncing
+        """
+        return bool(self._state[key])
+
+    def deinit(self):
+        """
+        Release the hardware
+        """
+
+
+class TouchKeys(ThresholdKeys):
+    """
+    Capacitive touch pads read with `touchio`, as keys for a `ButtonMatrix`
+
+    :example:
+      .. code-block:: python
+
+        >>> matrix = ButtonMatrix(TouchKeys((board.A1, board.A2, board.A3)))
+        >>> pad, clicks = await matrix.wait(Button.ANY_CLICK)
+    """
+
+    def __init__(
+        self,
+        pins: Sequence[Pin],
+        *,
+        thresholds: Sequence[int] = None,
+        hysteresis: int = 50,
+        debounce: int = 2,
+    ):
+        """
+        :param Sequence[Pin] pins: The touch pads
+        :param Sequence[int] thresholds: `touchio.TouchIn.raw_value` above which each pad is
+          touched. Default is the threshold `touchio` calibrates for each pad.
+        :param int hysteresis: How far ``raw_value`` must fall below the threshold before a
+          touched pad is released. Default is 50.
+        :param int debounce: See `ThresholdKeys`
+        """
+        super().__init__(len(pins), debounce=debounce)
+        #: The `touchio.TouchIn` for each pad
+        self.pads = [touchio.TouchIn(pin) for pin in pins]
+        if thresholds is None:
+            thresholds = [pad.threshold for pad in self.pads]
+        self.thresholds = list(thresholds)
+        self.hysteresis = hysteresis
+
+    def _read(self, raw: bytearray):
+        state = self._state
+        for key, pad in enumerate(self.pads):
+            threshold = self.thresholds[key]
+            if state[key]:
+                threshold -= self.hysteresis
+            raw[key] = pad.raw_value > threshold
+
+    def deinit(self):
+        """
+        Release the pads
+        """
+        for pad in self.pads:
+            pad.deinit()
+
+
+class LadderKeys(ThresholdKeys):
+    """
+    Several keys on one analog input through a resistor ladder, read with `analogio`, as
+    keys for a `ButtonMatrix`. Each key pulls the input to a different level, so only one
+    key can be seen at a time.
+
+    :example:
+      .. code-block:: python
+
+        >>> ladder = LadderKeys(board.A0, (5000, 20000, 35000, 50000))
+        >>> matrix = ButtonMatrix(ladder)
+        >>> key, clicks = await matrix.wait(Button.ANY_CLICK)
+    """
+
+    def __init__(
+        self,
+        pin: Pin,
+        levels: Sequence[int],
+        *,
+        tolerance: int = 3000,
+        hysteresis: int = 1000,
+        debounce: int = 2,
+    ):
+        """
+        :param Pin pin: The analog input
+        :param Sequence[int] levels: `analogio.AnalogIn.value` when each key is pressed
+        :param int tolerance: How far the reading may be from a level for that key to count
+          as pressed. Default is 3000.
+        :param int hysteresis: How much further than ``tolerance`` the reading may drift
+          before a pressed key is released. Default is 1000.
+        :param int debounce: See `ThresholdKeys`
+        """
+        super().__init__(len(levels), debounce=debounce)
+        #: The `analogio.AnalogIn` for the ladder
+        self.adc = analogio.AnalogIn(pin)
+        self.levels = list(levels)
+        self.tolerance = tolerance
+        self.hysteresis = hysteresis
+
+    def _read(self, raw: bytearray):
+        value = self.adc.value
+        best = -1
+        best_error = self.tolerance + 1
+        for key, level in enumerate(self.levels):
+            raw[key] = 0
+            error = abs(value - level)
+            if self._state[key]:
+                error -= self.hysteresis
+            if error < best_error:
+                best = key
+                best_error = error
+        if best >= 0:
+            raw[best] = 1
+
+    def deinit(self):
+        """
+        Release the analog input
+        """
+        self.adc.deinit()
+
+
+class KeyMatrixClassifier:
+    """
+    The same click detection as `ClickClassifier`, for many keys at once, e.g. all the keys of
+    a `keypad.KeyMatrix`. Rather than one object per key, the state of every key is held in
+    preallocated arrays indexed by key number. With the list of keys waiting for a deadline
+    and the buffers for the events found by `advance`, this takes 13 bytes per key on
+    CircuitPython, and no memory is allocated as keys are pressed and released.
+
+    Keys share their settings through *profiles*: each profile is a `ClickClassifier`, of
+    which only the settings (not the state) are used. Changing a profile's settings changes
+    them for every key that uses it. Staged holds (``hold_thresholds``) are not supported.
+
+    :example:
+      .. code-block:: python
+
+        >>> typing = ClickClassifier(double_click_enable=False)
+        >>> special = ClickClassifier(long_click_enable=True)
+        >>> classifier = KeyMatrixClassifier(64, profiles=(typing, special))
+        >>> classifier.set_profile(63, 1)  # last key detects long clicks
+    """
+
+    _CLICK_MASK = 0x03  # index of last click: 0=SINGLE, 1=DOUBLE, 2=TRIPLE, 3=LONG
+    _PRESSED = 0x04
+    _PENDING = 0x08  # a click is being held back by exclusive_clicks
+    _SEEN = 0x10  # key has been pressed at least once, so press time is valid
+    _CLICK_INDEX = {
+        ClickClassifier.SINGLE: 0,
+        ClickClassifier.DOUBLE: 1,
+        ClickClassifier.TRIPLE: 2,
+        ClickClassifier.LONG: 3,
+    }
+
+    def __init__(
+        self,
+        key_count: int,
+        *,
+        profiles: Sequence[ClickClassifier] = None,
+        key_profiles: Sequence[int] = None,
+    ):
+        """
+        :param int key_count: number of keys
+        :param Sequence[ClickClassifier] profiles: settings to use, up to 256 of them.
+          Default is a single profile with the default settings.
+        :param Sequence[int] key_profiles: index into ``profiles`` for each key. Default is
+          to use the first profile for every key.
+        """
+        if profiles is None:
+            profiles = (ClickClassifier(),)
+        for profile in profiles:
+            if profile.hold_thresholds:
+                raise ValueError("hold_thresholds are not supported for key matrices")
+        #: The settings in use, see `set_profile`
+        self.profiles = tuple(profiles)
+        self.key_count = key_count
+        self._press_time = array("l", [0]) * key_count
+        self._state = bytearray(key_count)
+        self._profile = bytearray(key_count)
+        if key_profiles is not None:
+            for key, profile in enumerate(key_profiles):
+                self.set_profile(key, profile)
+        # numbers of the keys that have a deadline pending, and a flag for each key that is
+        # set while it is listed
+        self._active = array("H", [0]) * key_count
+        self._active_count = 0
+        self._is_active = bytearray(key_count)
+        #: Key numbers of the events found by the last call to `advance`
+        self.fired_keys = array("H", [0]) * key_count
+        #: Event bitmasks found by the last call to `advance`
+        self.fired_events = array("H", [0]) * key_count
+
+    def set_profile(self, key: int, profile: int):
+        """
+        Choose which of `profiles` a key uses
+
+        :param int key: key number
+        :param int profile: index into `profiles`
+        """
+        if not 0 <= profile < len(self.profiles):
+            raise ValueError("No such profile")
+        self._profile[key] = profile
+
+    def pressed(self, key: int) -> bool:
+        """
+        :param int key: key number
+        :return: ``True`` if the key is currently held down
+        """
+        return bool(self._state[key] & self._PRESSED)
+
+    def last_click(self, key: int) -> int:
+        """
+        :param int key: key number
+        :return: click type of the current or most recent press of the key
+        """
+        return ClickClassifier.SINGLE << (self._state[key] & self._CLICK_MASK)
+
+    def update(self, key: int, pressed: bool, timestamp: int) -> int:
+        """
+        Process a press or release of a key
+
+        :param int key: key number
+        :param bool pressed: ``True`` if the key has been pressed, ``False`` if released
+        :param int timestamp: when this happened, in milliseconds
+        :return: the events that fired for this key, as a bitmask
+        """
+        profile = self.profiles[self._profile[key]]
+        fired = self._advance_key(key, profile, timestamp)
+        state = self._state[key]
+        click = ClickClassifier.SINGLE << (state & self._CLICK_MASK)
+        press_time = self._press_time[key]
+        dbl_clk_expires = ticks_add(
+            press_time, int(profile.double_click_max_duration * 1000)
+        )
+        if pressed:
+            fired |= ClickClassifier.PRESSED
+            if state & self._SEEN and ticks_less(timestamp, dbl_clk_expires):
+                click = ClickClassifier.next_click(click, profile.click_enabled)
+            else:
+                click = ClickClassifier.SINGLE
+            state = self._PRESSED | self._SEEN
+            self._press_time[key] = timestamp
+            if profile.click_enabled[ClickClassifier.LONG]:
+                self._activate(key)
+        else:
+            if click == ClickClassifier.LONG:
+                click = ClickClassifier.SINGLE
+            elif (
+                profile.exclusive_clicks
+                and ClickClassifier.next_click(click, profile.click_enabled)
+                != ClickClassifier.SINGLE
+                and ticks_less(timestamp, dbl_clk_expires)
+            ):
+                state |= self._PENDING
+                self._activate(key)
+            else:
+                fired |= click
+            fired |= ClickClassifier.RELEASED
+            state &= ~self._PRESSED
+        self._state[key] = (state & ~self._CLICK_MASK) | self._CLICK_INDEX[click]
+        return fired
+
+    def _advance_key(self, key: int, profile: ClickClassifier, now: int) -> int:
+        state = self._state[key]
+        fired = 0
+        if (
+            state & self._PRESSED
+            and profile.click_enabled[ClickClassifier.LONG]
+            and state & self._CLICK_MASK != 3
+        ):
+            due = ticks_add(
+                self._press_time[key], int(profile.long_click_min_duration * 1000)
+            )
+            if ticks_less(due, now):
+                state |= 3
+                fired = ClickClassifier.LONG
+        if state & self._PENDING:
+            expires = ticks_add(
+                self._press_time[key], int(profile.double_click_max_duration * 1000)
+            )
+            if not ticks_less(now, expires):
+                fired |= ClickClassifier.SINGLE << (state & self._CLICK_MASK)
+                state &= ~self._PENDING
+        self._state[key] = state
+        return fired
+
+    def advance(self, now: int, groups: bytearray = None, group: int = 0) -> int:
+        """
+        Let time pass with no presses or releases. Only keys that have a deadline pending are
+        checked. The events found are stored in `fired_keys` and `fired_events`.
+
+        :param int now: the current time in milliseconds
+        :param bytearray groups: a group number for each key, e.g. the priority tier used by
+          `ButtonMatrix`. If given, only keys in ``group`` are checked. Default is all keys.
+        :param int group: the group to check
+        :return: the number of keys that had events
+        """
+        count = 0
+        kept = 0
+        active = self._active
+        for i in range(self._active_count):
+            key = active[i]
+            if groups is None or groups[key] == group:
+                profile = self.profiles[self._profile[key]]
+                fired = self._advance_key(key, profile, now)
+                if fired:
+                    self.fired_keys[count] = key
+                    self.fired_events[count] = fired
+                    count += 1
+                state = self._state[key]
+                if not state & self._PENDING and (
+                    not state & self._PRESSED or state & self._CLICK_MASK == 3
+                ):
+                    self._is_active[key] = 0
+                    continue
+            active[kept] = key
+            kept += 1
+        self._active_count = kept
+        return count
+
+    def _activate(self, key: int):
+        if not self._is_active[key]:
+            self._is_active[key] = 1
+            self._active[self._active_count] = key
+            self._active_count += 1
+
+
+class PressedState:
+    """
+    Which of a group of buttons or keys are held down, and since when. `MultiButton` and
+    `ButtonMatrix` keep one of these up to date from their background tasks as presses and
+    releases are classified, so the queries below take constant time, never wait and do not
+    allocate memory.
+
+    :example:
+      .. code-block:: python
+
+        >>> matrix = ButtonMatrix(keypad.KeyMatrix(row_pins, column_pins))
+        >>> state = matrix.pressed_state
+        >>> if state.any_pressed() and state.held_ms(4) > 1000:
+        >>>     show_help()
+    """
+
+    #: Largest group for which `pressed_mask` is available
+    MAX_MASK_SIZE = 30
+
+    def __init__(self, count: int, *, clock: Callable[[], int] = None):
+        """
+        :param int count: Number of buttons or keys
+        :param clock: Function returning the current time in milliseconds, see
+          `PolledButton`. Default is `adafruit_ticks.ticks_ms`.
+        """
+        self._clock = ticks_ms if clock is None else clock
+        self._pressed = bytearray(count)
+        self._pressed_count = 0
+        # only kept for small groups, so it stays a small int on CircuitPython
+        self._mask = 0 if count <= self.MAX_MASK_SIZE else None
+        self._press_time = array("l", [0]) * count
+
+    def update(self, index: int, pressed: bool, timestamp: int):
+        """
+        Record a press or release. This is called by `MultiButton` and `ButtonMatrix`.
+
+        :param int index: Button or key number
+        :param bool pressed: ``True`` if it has been pressed, ``False`` if released
+        :param int timestamp: When this happened, from `adafruit_ticks.ticks_ms`
+        """
+        if pressed:
+            self._press_time[index] = timestamp
+        if pressed == self._pressed[index]:
+            return
+        self._pressed[index] = 1 if pressed else 0
+        self._pressed_count += 1 if pressed else -1
+        if self._mask is not None:
+            self._mask ^= 1 << index
+
+    def any_pressed(self) -> bool:
+        """
+        :return: ``True`` if any button or key is held down
+        """
+        return self._pressed_count > 0
+
+    def pressed_mask(self) -> int:
+        """
+        Only available for groups of up to `MAX_MASK_SIZE` buttons or keys; use `is_pressed`
+        for larger groups.
+
+        :return: A bitmask with bit ``n`` set if button or key ``n`` is held down
+        """
+        if self._mask is None:
+            raise ValueError("pressed_mask is only available for up to 30 keys")
+        return self._mask
+
+    def is_pressed(self, index: int) -> bool:
+        """
+        :param int index: Button or key number
+        :return: ``True`` if it is held down
+        """
+        return bool(self._pressed[index])
+
+    def held_ms(self, index: int) -> int:
+        """
+        :param int index: Button or key number
+        :return: How long it has been held down in milliseconds, or 0 if it is not
+        """
+        if not self._pressed[index]:
+            return 0
+        return ticks_diff(self._clock(), self._press_time[index])
+
+
+class ButtonMatrix:
+    """
+    Click detection for every key of a `keypad` scanner (e.g. `keypad.KeyMatrix`), with a
+    single background `asyncio` task and a `KeyMatrixClassifier` holding the state of all
+    keys.
+
+    Keys can be put in priority *tiers*, each serviced at its own interval by the same task.
+    Tier 0 is checked every time the task wakes, and its presses and releases are classified
+    and dispatched as soon as they are seen, ahead of any other keys. Presses and releases of
+    keys in the other tiers are queued with their timestamps and classified when their tier
+    is next due, so a busy panel cannot hold up a critical key.
+
+    :example:
+      .. code-block:: python
+
+        >>> keys = keypad.KeyMatrix(row_pins, column_pins)
+        >>> matrix = ButtonMatrix(keys)
+        >>> key, clicks = await matrix.wait(Button.ANY_CLICK)
+        >>> # key 0 is an emergency stop checked every 5ms, the rest every 50ms
+        >>> tiers = [1] * keys.key_count
+        >>> tiers[0] = 0
+        >>> matrix = ButtonMatrix(keys, key_tiers=tiers, tier_intervals=(0.005, 0.05))
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        keys,
+        *,
+        profiles: Sequence[ClickClassifier] = None,
+        key_profiles: Sequence[int] = None,
+        interval: float = 0.020,
+        clock: Callable[[], int] = None,
+        key_tiers: Sequence[int] = None,
+        tier_intervals: Sequence[float] = None,
+    ):
+        """
+        Create the matrix and start the background async process, this object must be
+        created only when the asyncio event loop is running
+
+        :param keys: a `keypad.Keys`, `keypad.KeyMatrix` or `keypad.ShiftRegisterKeys`, or a
+          `ThresholdKeys` such as `TouchKeys` or `LadderKeys`
+        :param Sequence[ClickClassifier] profiles: settings to use, see `KeyMatrixClassifier`
+        :param Sequence[int] key_profiles: index into ``profiles`` for each key
+        :param float interval: How long we wait between checking the keys. Default is
+          0.02 (20 milliseconds).
+        :param clock: Function returning the current time in milliseconds, see
+          `PolledButton`. Default is `adafruit_ticks.ticks_ms`.
+        :param Sequence[int] key_tiers: index into ``tier_intervals`` for each key. Default
+          is to put every key in tier 0.
+        :param Sequence[float] tier_intervals: How often each tier is serviced, in seconds.
+          Tier 0 must have the shortest interval, and replaces ``interval``. Default is a
+          single tier serviced every ``interval``.
+        """
+        if tier_intervals is None:
+            tier_intervals = (interval,)
+        if min(tier_intervals) < tier_intervals[0]:
+            raise ValueError("Tier 0 must have the shortest interval")
+        tier_count = len(tier_intervals)
+        self.keys = keys
+        self.interval = tier_intervals[0]
+        #: Function that returns the current time in milliseconds
+        self.clock = ticks_ms if clock is None else clock
+        #: The `KeyMatrixClassifier` that does the click detection
+        self.classifier = KeyMatrixClassifier(
+            keys.key_count, profiles=profiles, key_profiles=key_profiles
+        )
+        #: Which keys are held down, and since when
+        self.pressed_state = PressedState(keys.key_count, clock=self.clock)
+        self._key_tier = bytearray(keys.key_count)
+        if key_tiers is not None:
+            for key, tier in enumerate(key_tiers):
+                if not 0 <= tier < tier_count:
+                    raise ValueError("No such tier")
+                self._key_tier[key] = tier
+        self._tier_ms = array("l", [int(x * 1000) for x in tier_intervals])
+        self._tier_due = array("l", [self.clock()]) * tier_count
+        # presses and releases waiting for their tier, in a ring buffer for each tier
+        # after tier 0
+        self._queue_size = max(16, 2 * keys.key_count)
+        size = self._queue_size * (tier_count - 1)
+        self._queued_key = array("H", [0]) * size
+        self._queued_time = array("l", [0]) * size
+        self._queued_pressed = bytearray(size)
+        self._queue_head = array("H", [0]) * tier_count
+        self._queue_length = array("H", [0]) * tier_count
+        #: How long in milliseconds the latest press or release in each tier took from being
+        #: scanned to being classified and dispatched
+        self.tier_latency = array("l", [0]) * tier_count
+        #: The largest `tier_latency` seen for each tier; set entries to zero to start
+        #: measuring again
+        self.tier_max_latency = array("l", [0]) * tier_count
+        self._sampled = isinstance(keys, ThresholdKeys)
+        self._evt = keypad.Event(0, False)
+        self._event = asyncio.Event()
+        self._last_key = 0
+        self._last_fired = 0
+        self.monitor_task = asyncio.create_task(self._monitor())
+
+    async def _monitor(self):
+        keys = self.keys
+        tier_due = self._tier_due
+        while True:
+            now = self.clock()
+            if self._sampled:
+                for i in range(keys.scan()):
+                    await self._edge(keys.changed_keys[i], keys.changed_pressed[i], now)
+            else:
+                await self._poll()
+            await self._advance(0, now)
+            for tier in range(1, len(tier_due)):
+                if ticks_diff(now, tier_due[tier]) >= 0:
+                    tier_due[tier] = ticks_add(now, self._tier_ms[tier])
+                    await self._flush(tier)
+                    await self._advance(tier, now)
+            await asyncio.sleep(self.interval)
+
+    async def _poll(self):
+        evt = self._evt
+        while self.keys.events.get_into(evt):
+            now = getattr(evt, "timestamp", self.clock())
+            await self._edge(evt.key_number, evt.pressed, now)
+
+    async def _edge(self, key: int, pressed: bool, timestamp: int):
+        tier = self._key_tier[key]
+        if tier == 0:
+            await self._classify(key, pressed, timestamp)
+            return
+        if self._queue_length[tier] == self._queue_size:
+            await self._flush(tier, poll=False)
+        index = (self._queue_head[tier] + self._queue_length[tier]) % self._queue_size
+        index += self._queue_size * (tier - 1)
+        self._queued_key[index] = key
+        self._queued_time[index] = timestamp
+        self._queued_pressed[index] = pressed
+        self._queue_length[tier] += 1
+
+    async def _flush(self, tier: int, poll: bool = True):
+        while self._queue_length[tier]:
+            index = self._queue_head[tier] + self._queue_size * (tier - 1)
+            self._queue_head[tier] = (self._queue_head[tier] + 1) % self._queue_size
+            self._queue_length[tier] -= 1
+            await self._classify(
+                self._queued_key[index],
+                bool(self._queued_pressed[index]),
+                self._queued_time[index],
+            )
+            if poll and not self._sampled:
+                # pick up any critical keys pressed while the waiters were busy
+                await self._poll()
+
+    async def _classify(self, key: int, pressed: bool, timestamp: int):
+        tier = self._key_tier[key]
+        latency = ticks_diff(self.clock(), timestamp)
+        self.tier_latency[tier] = latency
+        self.tier_max_latency[tier] = max(self.tier_max_latency[tier], latency)
+        self.pressed_state.update(key, pressed, timestamp)
+        fired = self.classifier.update(key, pressed, timestamp)
+        if fired:
+            await self._dispatch(key, fired)
+
+    async def _advance(self, tier: int, now: int):
+        classifier = self.classifier
+        for i in range(classifier.advance(now, self._key_tier, tier)):
+            await self._dispatch(classifier.fired_keys[i], classifier.fired_events[i])
+
+    async def _dispatch(self, key: int, fired: int):
+        self._last_key = key
+        self._last_fired = fired
+        self._event.set()
+        self._event.clear()
+        # let waiters see this event before the next one is dispatched
+        await asyncio.sleep(0)
+
+    async def wait(
+        self,
+        click_types: Union[int, Sequence[int]] = PolledButton.ALL_EVENTS,
+        keys: Sequence[int] = None,
+    ):
+        """
+        Wait for the first of the specified events on any of the specified keys
+
+        :param (List[int] | int) click_types: events to listen for, as for `Button.wait`.
+          Default is to listen for all events.
+        :param Sequence[int] keys: key numbers to listen to. Default is all keys.
+        :return: key number, and a list of the events that actually happened
         """
         if isinstance(click_types, int):
             click_types = [click_types]
-        # shortcut for efficiency: if only one click type awaited, just await that
-        if len(click_types) == 1:
-            await self.events[click_types[0]].wait()
-            return [click_types[0]]
-
-        # multiple click types - needs more complex algorithm
-        evts: Dict[int, TaskWrapper] = {}
-        one_event_done = asyncio.Event()
-        for evt_type in click_types:
-            coro = self.events[evt_type].wait()
-            evts[evt_type] = TaskWrapper(coro, one_event_done)
-        try:
-            await one_event_done.wait()
-            if len(evts) > 1:
-                await asyncio.sleep(
-                    0
-                )  # ensure all event types get an opportunity to run
-            results = []
-            for evt_type, evt in evts.items():
-                if evt.done():
-                    results.append(evt_type)
-            return results
-        finally:
-            # make sure all tasks are cancelled on exit
-            for evt in evts.values():
-                if not evt.done():
-                    evt.cancel()
+        mask = 0
+        for click_type in click_types:
+            mask |= click_type
+        while True:
+            await self._event.wait()
+            if self._last_fired & mask and (keys is None or self._last_key in keys):
+                return self._last_key, [x for x in click_types if x & self._last_fired]
+
+    def any_pressed(self) -> bool:
+        """
+        :return: ``True`` if any key is held down
+        """
+        return self.pressed_state.any_pressed()
+
+    def pressed_mask(self) -> int:
+        """
+        Only available for up to `PressedState.MAX_MASK_SIZE` keys, see `is_pressed`
+
+        :return: A bitmask with bit ``n`` set if key ``n`` is held down
+        """
+        return self.pressed_state.pressed_mask()
 
-    async def wait_for_click(self):
+    def is_pressed(self, key: int) -> bool:
         """
-        Wait for any click and return it
+        :param int key: Key number
+        :return: ``True`` if the key is held down
+        """
+        return self.pressed_state.is_pressed(key)
 
-        :return: Which click happened i.e. one of `SINGLE`, `DOUBLE`, `TRIPLE` or `LONG`
+    def held_ms(self, key: int) -> int:
+        """
+        :param int key: Key number
+        :return: How long it has been held down in milliseconds, or 0 if it is not
         """
-        clicks = await self.wait(self.ANY_CLICK)
-        return clicks[0]
+        return self.pressed_state.held_ms(key)
 
     def deinit(self):
         """
-        Deinitialise object and stop the background task
+        Stop the background task and deinitialise the scanner
         """
-        try:
-            self.monitor_task.cancel()
-        except KeyError:
-            # sometimes get a key error if deinited before asyncio starts
-            pass
+        self.monitor_task.cancel()
         self.keys.deinit()
 
 
 class MultiButton:
     """
-    This class allows you to await the first click from any of two or more buttons
+    This class allows you to await the first click from any of two or more buttons.
+    If several buttons fire at the same time, none of the clicks are lost: they are queued and
+    handed out in timestamp order by the following calls to `wait`, or all at once by
+    `wait_many`. Clicks with the same timestamp are handed out in turn, starting with the
+    button after the one that was served last, so no button is always last in line. Queued
+    clicks that a call is not waiting for stay queued for a later call, up to `MAX_PENDING`
+    of them; beyond that the oldest are dropped.
     """
 
+    MAX_PENDING = 16  #: The most clicks kept queued
+
     def __init__(self, **kwargs):
         """
 
@@ -388,38 +1385,570 @@ class MultiButton:
             if not isinstance(button, Button):
                 raise TypeError("Must pass in async_button.Button as parameters")
         self.buttons: Dict[Any, Button] = kwargs
+        self._order = {name: index for index, name in enumerate(kwargs)}
+        first = next(iter(kwargs.values()), None)
+        #: Which buttons are held down, and since when, indexed in the order the buttons
+        #: were passed in
+        self.pressed_state = PressedState(
+            len(kwargs), clock=getattr(first, "clock", None)
+        )
+        for index, button in enumerate(kwargs.values()):
+            # a button can be in several groups, each with its own state
+            button.pressed_states.append((self.pressed_state, index))
+        self._turn = 0
+        # (name, click, record) that happened together with a click already handed out
+        self._pending = []
 
-    async def wait(self, **kwargs):
+    def any_pressed(self) -> bool:
+        """
+        :return: ``True`` if any of the buttons is held down
         """
-        Wait for any specified clicks
+        return self.pressed_state.any_pressed()
 
-        :param kwargs: pass by keyword what clicks you want to listen for
-        :return: button, click type
-        :example:
-          .. code-block:: python
+    def pressed_mask(self) -> int:
+        """
+        :return: A bitmask with bit ``n`` set if button ``n`` is held down, counting from 0 in
+          the order the buttons were passed in
+        """
+        return self.pressed_state.pressed_mask()
 
-            >>> multi = MultiButton(a = button_a, b=button_b)
-            >>> button, result = await multi.wait(a=Button.SINGLE, b= (Button.DOUBLE, Button.LONG))
-            >>> # Long click on button B
-            >>> print(button, result) # "b", Button.Long
+    def held_ms(self, name) -> int:
+        """
+        :param name: Name of the button
+        :return: How long it has been held down in milliseconds, or 0 if it is not
+        """
+        return self.pressed_state.held_ms(self._order[name])
+
+    async def _wait_button(self, name, click_types):
+        button = self.buttons[name]
+        clicks = await button.wait(click_types)
+        return clicks, getattr(button, "last_record", None)
+
+    def _take_pending(self, kwargs) -> list:
+        """Take the queued clicks that match ``kwargs`` off the queue and return them"""
+        ready = []
+        kept = []
+        for entry in self._pending:
+            wanted = kwargs.get(entry[0], ())
+            if entry[1] == wanted or (
+                not isinstance(wanted, int) and entry[1] in wanted
+            ):
+                ready.append(entry)
+            else:
+                kept.append(entry)
+        self._pending = kept
+        return ready
+
+    async def _collect(self, kwargs) -> list:
         """
+        Wait for any of the clicks in ``kwargs``, and return every ``(name, click, record)``
+        that is ready, in the order they should be handed out. Queued clicks that do not
+        match ``kwargs`` stay queued.
+        """
+        ready = self._take_pending(kwargs)
+        if ready:
+            return ready
         if len(kwargs) == 1:
-            button = list(kwargs)[0]
-            results = await self.buttons[button].wait(kwargs[button])
-            return button, results[0]
+            name = list(kwargs)[0]
+            clicks, record = await self._wait_button(name, kwargs[name])
+            return [(name, click, record) for click in clicks]
         tasks: Dict[Any, TaskWrapper] = {}
         click_happened = asyncio.Event()
-        for key, value in kwargs.items():
-            tasks[key] = TaskWrapper(self.buttons[key].wait(value), click_happened)
+        for name, value in kwargs.items():
+            tasks[name] = TaskWrapper(self._wait_button(name, value), click_happened)
         try:
             await click_happened.wait()
-            result = (None, None)
-            for key, task in tasks.items():
+            for name, task in tasks.items():
                 if task.done():
-                    result = (key, task.result()[0])
-            return result
+                    clicks, record = task.result()
+                    for click in clicks:
+                        ready.append((name, click, record))
         finally:
             # make sure all tasks are cancelled on exit
             for task in tasks.values():
                 if not task.done():
                     task.cancel()
+        if len(ready) > 1:
+            self._fair_sort(ready)
+        return ready
+
+    def _fair_sort(self, ready: list):
+        """Sort by timestamp, then by turn, starting after the last button served"""
+        start = None
+        for _, _, record in ready:
+            if record is not None:
+                start = record.timestamp
+                break
+        if start is None:
+            start = 0
+        count = len(self._order)
+
+        def sort_key(entry):
+            name, _, record = entry
+            age = 0 if record is None else ticks_diff(record.timestamp, start)
+            return age, (self._order[name] - self._turn) % count
+
+        ready.sort(key=sort_key)
+
+    def _queue(self, entries: list):
+        """Queue clicks to hand out later, dropping the oldest beyond `MAX_PENDING`"""
+        pending = self._pending + entries
+        if len(pending) > 1:
+            self._fair_sort(pending)
+        if len(pending) > self.MAX_PENDING:
+            del pending[: len(pending) - self.MAX_PENDING]
+        self._pending = pending
+
+    async def _next(self, kwargs):
+        ready = await self._collect(kwargs)
+        self._queue(ready[1:])
+        self._turn = self._order[ready[0][0]] + 1
+        return ready[0]
+
+    async def wait(self, **kwargs):
+        """
+        Wait for any specified clicks. If clicks are still queued from earlier calls, the
+        earliest one that matches is returned straight away, and the rest stay queued.
+
+        :param kwargs: pass by keyword what clicks you want to listen for
+        :return: button, click type
+        :example:
+          .. code-block:: python
+
+            >>> multi = MultiButton(a = button_a, b=button_b)
+            >>> button, result = await multi.wait(a=Button.SINGLE, b= (Button.DOUBLE, Button.LONG))
+            >>> # Long click on button B
+            >>> print(button, result) # "b", Button.Long
+        """
+        name, click, _ = await self._next(kwargs)
+        return name, click
+
+    async def wait_many(self, **kwargs) -> List[Tuple[Any, int]]:
+        """
+        Wait for any specified clicks, and return every one that is ready, so that a burst
+        of clicks on several buttons is handled in one go.
+
+        :param kwargs: pass by keyword what clicks you want to listen for
+        :return: A list of ``(button, click type)``, in the order that `wait` would have
+          returned them
+        :example:
+          .. code-block:: python
+
+            >>> multi = MultiButton(left=button_l, right=button_r, fire=button_f)
+            >>> clicks = await multi.wait_many(left=Button.PRESSED, right=Button.PRESSED,
+            >>>                                fire=Button.PRESSED)
+            >>> for button, _ in clicks:
+            >>>     move(button)
+        """
+        ready = await self._collect(kwargs)
+        self._turn = self._order[ready[-1][0]] + 1
+        return [(name, click) for name, click, _ in ready]
+
+    async def wait_record(self, **kwargs) -> EventRecord:
+        """
+        Wait for any specified clicks, and return the details of what happened
+
+        :param kwargs: pass by keyword what clicks you want to listen for
+        :return: An `EventRecord`; its ``button`` attribute is the `Button` that fired
+        :example:
+          .. code-block:: python
+
+            >>> multi = MultiButton(a = button_a, b=button_b)
+            >>> record = await multi.wait_record(a=Button.SINGLE, b=Button.LONG)
+            >>> if record.button is button_b:
+            >>>     print("Long click at", record.timestamp)
+        """
+        _, _, record = await self._next(kwargs)
+        return record
+
+    def start(self):
+        """
+        Start all the buttons that were created with ``start=False``. All the pins are
+        claimed before any background task is created, and if one cannot be claimed, the
+        pins claimed so far are released again and the error is raised. This must be called
+        when the asyncio event loop is running.
+
+        :example:
+          .. code-block:: python
+
+            >>> # at module level, before the event loop is running
+            >>> BUTTONS = MultiButton(
+            >>>     up=Button(board.D5, False, start=False),
+            >>>     down=Button(board.D6, False, start=False),
+            >>> )
+            >>> async def main():
+            >>>     BUTTONS.start()
+        """
+        # pylint: disable=protected-access
+        for button in self.buttons.values():
+            button._check_for_deinit()
+        claimed = []
+        encoders = []
+        try:
+            for button in self.buttons.values():
+                if button.keys is None:
+                    button._started = True
+                    claimed.append(button)
+                    button.keys = button._make_keys()
+                if isinstance(button, RotaryEncoder) and button.encoder is None:
+                    button._claim_encoder()
+                    encoders.append(button)
+        except Exception:
+            for button in claimed:
+                if button.keys is not None:
+                    button.keys.deinit()
+                    button.keys = None
+                button._started = False
+            for button in encoders:
+                button.encoder.deinit()
+                button.encoder = None
+            raise
+        for button in self.buttons.values():
+            button.start()
+
+    def attach_sink(self, sink: EventSink) -> list:
+        """
+        Record the events of all the buttons in one `EventSink` (or `ComboMatcher`). Each
+        button is given a ``sink_source`` in the order the buttons were passed in.
+
+        :param EventSink sink: The sink to record events in
+        :return: The button names, indexed by ``sink_source``
+        """
+        names = list(self.buttons)
+        for source, name in enumerate(names):
+            self.buttons[name].sink = sink
+            self.buttons[name].sink_source = source
+        return names
+
+
+class ComboMatcher:
+    """
+    Matches sequences of events across several buttons, such as "A, A, B, long click on C".
+    It takes the place of an `EventSink`: attach it to the buttons with `attach` or as their
+    ``sink``, and it is fed every event from their background tasks, so no input is missed
+    between one wait and the next, and no task is created per sequence.
+
+    All the sequences are compiled into one trie, with links from each step back to the
+    longest partial match that is still possible, so each event is handled with one dict
+    lookup however many sequences there are. Events that are not part of any sequence are
+    ignored, but any other event that cannot continue the current partial match (or start a
+    new one) ends it. Each step may set a timeout: the longest time since the step before
+    it. After a sequence matches, matching starts again from scratch, so a sequence that is
+    contained in a longer one stops the longer one from matching.
+
+    :example:
+      .. code-block:: python
+
+        >>> multi = MultiButton(a=button_a, b=button_b, c=button_c)
+        >>> combos = ComboMatcher()
+        >>> combos.add_sequence(
+        >>>     "service", [("a", Button.SINGLE), ("a", Button.SINGLE), ("b", Button.SINGLE),
+        >>>                 ("c", Button.LONG, 3.0)])
+        >>> combos.attach(multi)
+        >>> await combos.wait("service")
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, *, timeout: float = 1.0):
+        """
+        :param float timeout: Default longest time between steps, in seconds
+        """
+        self.timeout = timeout
+        # trie: edges for each node, and the timeout and sequence name for each node
+        self._children = [{}]
+        self._timeouts = [None]
+        self._names = [None]
+        self._goto = None
+        self._outputs = None
+        self._symbols = None
+        self._state = 0
+        self._last = 0
+        self._sources = None
+        self._event = None
+        #: Name of the sequence that matched most recently
+        self.last_match = None
+
+    def add_sequence(self, name, steps: Sequence[tuple]):
+        """
+        Register a sequence. Steps are ``(source, event)`` or ``(source, event, timeout)``:
+        ``source`` is the name of a button in the `MultiButton` given to `attach`, or the
+        ``sink_source`` of a button if there is none, ``event`` is a single event type such as
+        `Button.SINGLE`, and ``timeout`` is the longest time in seconds since the step before.
+        If two sequences start with the same steps, those steps must have the same timeouts.
+
+        :param name: Returned when the sequence matches
+        :param Sequence[tuple] steps: The events that make up the sequence, in order
+        """
+        if not steps:
+            raise ValueError("Sequence must have at least one step")
+        node = 0
+        for index, step in enumerate(steps):
+            event = step[1]
+            if not event or event & (event - 1):
+                raise ValueError("Each step must be a single event type")
+            timeout = None
+            if index:
+                timeout = int((step[2] if len(step) > 2 else self.timeout) * 1000)
+            child = self._children[node].get(step[:2])
+            if child is None:
+                child = len(self._children)
+                self._children[node][step[:2]] = child
+                self._children.append({})
+                self._timeouts.append(timeout)
+                self._names.append(None)
+            elif self._timeouts[child] != timeout:
+                raise ValueError(
+                    "Sequences with the same start must use the same timeouts"
+                )
+            node = child
+        self._names[node] = name
+        self._goto = None
+
+    def _build(self):
+        """Fill in the transitions for steps that continue a shorter partial match"""
+        goto = [dict(children) for children in self._children]
+        outputs = list(self._names)
+        fail = [0] * len(goto)
+        queue = list(self._children[0].values())
+        index = 0
+        while index < len(queue):
+            node = queue[index]
+            index += 1
+            for symbol, child in self._children[node].items():
+                fail[child] = goto[fail[node]].get(symbol, 0)
+                if outputs[child] is None:
+                    outputs[child] = outputs[fail[child]]
+                queue.append(child)
+            for symbol, target in goto[fail[node]].items():
+                goto[node].setdefault(symbol, target)
+        self._goto = goto
+        self._outputs = outputs
+        self._symbols = {symbol for children in self._children for symbol in children}
+
+    def feed(self, source, events: int, timestamp: int):
+        """
+        Handle events from one button. `Button` calls this through `add`, so you only need it
+        to feed events from elsewhere.
+
+        :param source: The button the events came from
+        :param int events: Bitmask of the events that fired
+        :param int timestamp: When they fired, from `adafruit_ticks.ticks_ms`
+        :return: The name of the sequence that matched, or ``None``
+        """
+        if self._goto is None:
+            self._build()
+        goto = self._goto
+        bit = 1
+        while bit <= events:
+            if events & bit:
+                symbol = (source, bit)
+                node = goto[self._state].get(symbol, 0)
+                if not node and symbol in self._symbols:
+                    # a wrong step, which does not start any sequence either
+                    self._state = 0
+                elif node:
+                    timeout = self._timeouts[node]
+                    if (
+                        timeout is not None
+                        and ticks_diff(timestamp, self._last) > timeout
+                    ):
+                        # too slow, so this can only be the start of a new match
+                        node = goto[0].get(symbol, 0)
+                    self._last = timestamp
+                    self._state = node
+                    name = self._outputs[node]
+                    if name is not None:
+                        self._state = 0
+                        self._matched(name)
+                        return name
+            bit <<= 1
+        return None
+
+    def _matched(self, name):
+        self.last_match = name
+        if self._event is not None:
+            self._event.set()
+            self._event.clear()
+
+    def reset(self):
+        """Forget any partial match"""
+        self._state = 0
+
+    async def wait(self, *names):
+        """
+        Wait for a sequence to match
+
+        :param names: The sequences to wait for. Default is any sequence.
+        :return: The name of the sequence that matched
+        """
+        if self._event is None:
+            self._event = asyncio.Event()
+        while True:
+            await self._event.wait()
+            if not names or self.last_match in names:
+                return self.last_match
+
+    def attach(self, multi: MultiButton):
+        """
+        Feed this the events of all the buttons in ``multi``, so that sequences can use their
+        names. This replaces any ``sink`` the buttons already had.
+
+        :param MultiButton multi: The buttons to match sequences from
+        """
+        self._sources = multi.attach_sink(self)
+
+    def add(self, source: int, record: EventRecord):
+        """
+        Handle a record from a button, for compatibility with `EventSink`
+
+        :param int source: ``sink_source`` of the button
+        :param EventRecord record: The events that fired
+        """
+        if self._sources is not None:
+            source = self._sources[source]
+        self.feed(source, record.events, record.timestamp)
+
+    def service(self, now: int):
+        """Does nothing, for compatibility with `EventSink`"""
+
+    def flush(self):
+        """Does nothing, for compatibility with `EventSink`"""
+
+
+class GCScheduler:
+    """
+    Keeps garbage collections out of gestures. A collection can take long enough to delay a
+    button's background task past a double click window or a long click threshold, and so
+    change the click that is reported. This runs one background task that checks whether
+    any of its buttons is in the middle of a gesture (see `ClickClassifier.in_gesture`).
+    While one is, automatic collections are put off with `gc.disable` (the heap is still
+    collected if it runs out), and once every button is idle again the heap is collected
+    with `gc.collect`, and again every ``collect_interval`` while idle.
+
+    It also counts the collections that happened during gestures and outside them. On a
+    board, automatic collections are spotted by `gc.mem_alloc` going down between checks;
+    on a host computer, by `gc.callbacks`.
+
+    :example:
+      .. code-block:: python
+
+        >>> scheduler = GCScheduler(list(multi.buttons.values()))
+        >>> ...
+        >>> await scheduler.wait_idle()  # before allocating a lot of memory
+        >>> print(scheduler.critical_collections, "collections during gestures")
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        buttons: Sequence[PolledButton],
+        *,
+        interval: float = 0.05,
+        collect_interval: float = 5.0,
+        defer: bool = True,
+    ):
+        """
+        :param Sequence[PolledButton] buttons: The buttons to watch
+        :param float interval: How often to check the buttons, in seconds
+        :param float collect_interval: How often to collect while all buttons are idle, in
+          seconds
+        :param bool defer: Whether to disable automatic collections during gestures. If
+          ``False``, collections are only counted and scheduled. Default is ``True``.
+        """
+        self.buttons = list(buttons)
+        self.interval = interval
+        self.collect_interval = collect_interval
+        self.defer = defer
+        #: ``True`` while any of the buttons is in the middle of a gesture
+        self.critical = False
+        #: Number of collections (automatic or not) that happened during a gesture
+        self.critical_collections = 0
+        #: Number of collections that happened while every button was idle
+        self.idle_collections = 0
+        #: Number of those that were made by this scheduler
+        self.scheduled_collections = 0
+        self._idle_event = None
+        self._disabled = False
+        self._mem_alloc = getattr(gc, "mem_alloc", None)
+        self._callbacks = None if self._mem_alloc else getattr(gc, "callbacks", None)
+        if self._callbacks is not None:
+            self._callbacks.append(self._on_gc)
+        self.task = asyncio.create_task(self._run())
+
+    def _on_gc(self, phase, _info):
+        if phase == "start":
+            self._count(self.critical)
+
+    def _count(self, critical: bool):
+        if critical:
+            self.critical_collections += 1
+        else:
+            self.idle_collections += 1
+
+    def _in_gesture(self) -> bool:
+        for button in self.buttons:
+            if button.classifier.in_gesture(button.clock()):
+                return True
+        return False
+
+    def _collect(self):
+        self.scheduled_collections += 1
+        if self._callbacks is None:
+            self.idle_collections += 1
+        gc.collect()
+
+    async def _run(self):
+        last_alloc = self._mem_alloc() if self._mem_alloc else 0
+        idle_time = 0
+        while True:
+            critical = self._in_gesture()
+            if self._mem_alloc:
+                alloc = self._mem_alloc()
+                if alloc < last_alloc:
+                    self._count(critical or self.critical)
+            if critical and not self.critical:
+                if self.defer:
+                    gc.disable()
+                    self._disabled = True
+            elif self.critical and not critical:
+                self._enable()
+                idle_time = self.collect_interval
+                if self._idle_event is not None:
+                    self._idle_event.set()
+                    self._idle_event.clear()
+            self.critical = critical
+            if not critical:
+                if idle_time >= self.collect_interval:
+                    self._collect()
+                    idle_time = 0
+                idle_time += self.interval
+            if self._mem_alloc:
+                last_alloc = self._mem_alloc()
+            await asyncio.sleep(self.interval)
+
+    def _enable(self):
+        if self._disabled:
+            gc.enable()
+            self._disabled = False
+
+    async def wait_idle(self):
+        """
+        Wait until no button is in the middle of a gesture, e.g. before doing work that
+        allocates a lot of memory. Returns at once if none is.
+        """
+        if not self.critical:
+            return
+        if self._idle_event is None:
+            self._idle_event = asyncio.Event()
+        await self._idle_event.wait()
+
+    def deinit(self):
+        """
+        Stop the background task and allow automatic collections again
+        """
+        self.task.cancel()
+        self._enable()
+        if self._callbacks is not None and self._on_gc in self._callbacks:
+            self._callbacks.remove(self._on_gc)
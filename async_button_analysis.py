@@ -0,0 +1,520 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+`async_button_analysis`
+================================================================================
+
+Offline tools for analysing recorded button input. These are intended to be run on a host
+computer, not on the microcontroller.
+
+A *trace* is a sequence of ``(timestamp, pressed)`` pairs, as reported by `keypad.Event`
+for a single key: ``timestamp`` is in milliseconds (from `adafruit_ticks.ticks_ms`) and
+``pressed`` is ``True`` for a press and ``False`` for a release.
+
+* Author(s): Phil Underwood
+
+**Software and Dependencies:**
+
+* NumPy (optional) is used by `classify_edges` if it is installed
+"""
+
+import math
+import struct
+from array import array
+
+from adafruit_ticks import ticks_diff
+
+try:
+    from typing import Dict, Iterable, List, Sequence, Tuple, Any, Optional
+except ImportError:
+    pass
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from async_button import ClickClassifier, EventSink
+
+PRESSED = ClickClassifier.PRESSED
+RELEASED = ClickClassifier.RELEASED
+SINGLE = ClickClassifier.SINGLE
+DOUBLE = ClickClassifier.DOUBLE
+TRIPLE = ClickClassifier.TRIPLE
+LONG = ClickClassifier.LONG
+_CLICKS = (SINGLE, DOUBLE, TRIPLE)
+
+
+def trace_intervals(trace: Iterable[Tuple[int, bool]]) -> Tuple[array, array]:
+    """
+    Extract the timings that matter for click classification from a trace
+
+    :param trace: sequence of ``(timestamp, pressed)`` pairs
+    :return: two arrays of milliseconds: the time from each press to the next press (this is
+      what is compared with ``double_click_max_duration``), and how long each press was held
+      (which is compared with ``long_click_min_duration``)
+    """
+    gaps = array("l")
+    holds = array("l")
+    last_press = None
+    pressed = False
+    for timestamp, is_pressed in trace:
+        if is_pressed and not pressed:
+            if last_press is not None:
+                gaps.append(ticks_diff(timestamp, last_press))
+            last_press = timestamp
+        elif pressed and not is_pressed:
+            holds.append(ticks_diff(timestamp, last_press))
+        pressed = is_pressed
+    return gaps, holds
+
+
+_ERROR_TOLERANCE = 0.001
+
+
+def _normal_cdf(value: float) -> float:
+    return 0.5 * (1.0 + math.erf(value / math.sqrt(2.0)))
+
+
+class _Split:
+    """
+    Two cluster model of a set of durations, fitted in the log domain: one cluster of short
+    durations and one of long ones
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, durations: Sequence[int]):
+        logs = sorted(math.log(max(x, 1)) for x in durations)
+        count = len(logs)
+        self.count = count
+        self.valid = False
+        if count < 2:
+            return
+        # Otsu's method: the split point with the largest between-class variance
+        prefix = [0.0]
+        for value in logs:
+            prefix.append(prefix[-1] + value)
+        total = prefix[-1]
+        best = -1.0
+        split = 0
+        for i in range(1, count):
+            if logs[i] == logs[i - 1]:
+                continue
+            low_mean = prefix[i] / i
+            high_mean = (total - prefix[i]) / (count - i)
+            between = i * (count - i) * (high_mean - low_mean) ** 2
+            if between > best:
+                best = between
+                split = i
+        if split == 0:
+            return
+        self.low = self._fit(logs[:split])
+        self.high = self._fit(logs[split:])
+        self.low_weight = split / count
+        self.valid = True
+
+    @staticmethod
+    def _fit(values: Sequence[float]) -> Tuple[float, float, int]:
+        mean = sum(values) / len(values)
+        var = sum((x - mean) ** 2 for x in values) / len(values)
+        # stop a tight cluster from having zero width
+        return mean, max(math.sqrt(var), 0.05), len(values)
+
+    def error(self, threshold_ms: float) -> float:
+        """
+        Estimated fraction of durations that fall on the wrong side of ``threshold_ms``
+        """
+        log_t = math.log(threshold_ms)
+        low_mean, low_sd, _ = self.low
+        high_mean, high_sd, _ = self.high
+        low_wrong = 1.0 - _normal_cdf((log_t - low_mean) / low_sd)
+        high_wrong = _normal_cdf((log_t - high_mean) / high_sd)
+        return self.low_weight * low_wrong + (1.0 - self.low_weight) * high_wrong
+
+    def best_threshold(
+        self, max_ms: float, min_samples: int
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Find the threshold with lowest estimated error that is no larger than ``max_ms``
+
+        :return: threshold and its estimated error, or ``(None, None)`` if there is not
+          enough data in both clusters
+        """
+        if not self.valid or min(self.low[2], self.high[2]) < min_samples:
+            return None, None
+        # search a 10ms grid between the centres of the two clusters
+        start = max(int(math.exp(self.low[0]) / 10) * 10, 10)
+        stop = min(math.exp(self.high[0]), max_ms)
+        candidates = []
+        threshold = start
+        while threshold <= stop:
+            candidates.append((threshold, self.error(threshold)))
+            threshold += 10
+        if not candidates:
+            return max_ms, self.error(max_ms)
+        # among all thresholds that are practically as good as the best, take the
+        # shortest, as that gives the lowest latency
+        best_err = min(err for _, err in candidates)
+        for threshold, err in candidates:
+            if err <= best_err + _ERROR_TOLERANCE:
+                return threshold, err
+        return None, None  # not reached
+
+
+class TimingRecommendation:
+    """
+    Recommended `async_button.Button` timing for one user or device
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(
+        self,
+        double_click_max_duration: float,
+        long_click_min_duration: float,
+        double_click_error: Optional[float],
+        long_click_error: Optional[float],
+        gaps: array,
+        holds: array,
+    ):
+        # pylint: disable=too-many-arguments
+        #: Recommended ``double_click_max_duration`` in seconds
+        self.double_click_max_duration = double_click_max_duration
+        #: Recommended ``long_click_min_duration`` in seconds
+        self.long_click_min_duration = long_click_min_duration
+        #: Estimated fraction of press-to-press gaps that would be misclassified, or ``None``
+        #: if there was not enough data and the default was used
+        self.double_click_error = double_click_error
+        #: Estimated fraction of presses whose long/short status would be misclassified, or
+        #: ``None`` if there was not enough data and the default was used
+        self.long_click_error = long_click_error
+        #: All press-to-press gaps seen, in milliseconds
+        self.gaps = gaps
+        #: All hold durations seen, in milliseconds
+        self.holds = holds
+
+    def as_kwargs(self) -> Dict[str, float]:
+        """
+        :return: the recommendation as keyword arguments for `async_button.Button` or
+          `async_button.Button.reconfigure`
+        """
+        return {
+            "double_click_max_duration": self.double_click_max_duration,
+            "long_click_min_duration": self.long_click_min_duration,
+        }
+
+    def __repr__(self):
+        return "<TimingRecommendation double={}s long={}s>".format(
+            self.double_click_max_duration, self.long_click_min_duration
+        )
+
+
+def recommend_timing(
+    traces: Iterable[Iterable[Tuple[int, bool]]],
+    *,
+    max_double_click_latency: float = 0.5,
+    max_long_click_latency: float = 2.0,
+    min_samples: int = 5,
+) -> TimingRecommendation:
+    """
+    Recommend ``double_click_max_duration`` and ``long_click_min_duration`` from a set of
+    traces recorded from one user or device.
+
+    Press-to-press gaps and hold durations are each split into a "short" and a "long"
+    cluster, and the threshold chosen is the one that is estimated to misclassify fewest
+    presses, but is no longer than the given latency. Where several thresholds are within
+    0.1% of the lowest error, the shortest is chosen. If either cluster has fewer than
+    ``min_samples`` entries, the maximum latency is used instead.
+
+    :param traces: traces from a single user or device
+    :param float max_double_click_latency: largest acceptable ``double_click_max_duration``
+      in seconds. Default is 0.5s.
+    :param float max_long_click_latency: largest acceptable ``long_click_min_duration``
+      in seconds. Default is 2.0s.
+    :param int min_samples: minimum size of each cluster for a recommendation to be made
+    :return: the recommended timing
+    """
+    gaps = array("l")
+    holds = array("l")
+    for trace in traces:
+        trace_gaps, trace_holds = trace_intervals(trace)
+        gaps.extend(trace_gaps)
+        holds.extend(trace_holds)
+    double_ms, double_err = _Split(gaps).best_threshold(
+        max_double_click_latency * 1000, min_samples
+    )
+    long_ms, long_err = _Split(holds).best_threshold(
+        max_long_click_latency * 1000, min_samples
+    )
+    if double_ms is None:
+        double_ms = max_double_click_latency * 1000
+    if long_ms is None:
+        long_ms = max_long_click_latency * 1000
+    return TimingRecommendation(
+        double_ms / 1000, long_ms / 1000, double_err, long_err, gaps, holds
+    )
+
+
+def recommend_timings(
+    traces: Dict[Any, Iterable[Iterable[Tuple[int, bool]]]], **kwargs
+) -> Dict[Any, TimingRecommendation]:
+    """
+    Run `recommend_timing` for many users or devices at once
+
+    :param traces: traces for each user or device, keyed by whatever identifies them
+    :param kwargs: passed on to `recommend_timing`
+    :return: a recommendation for each user or device, with the same keys
+    """
+    return {key: recommend_timing(value, **kwargs) for key, value in traces.items()}
+
+
+class _Settings:
+    """
+    Click settings, as passed to `async_button.Button`, converted to milliseconds
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, **kwargs):
+        # use a real classifier so settings are checked and defaulted exactly as on the device
+        classifier = ClickClassifier(**kwargs)
+        self.kwargs = kwargs
+        self.double_ms = int(classifier.double_click_max_duration * 1000)
+        self.long_ms = int(classifier.long_click_min_duration * 1000)
+        self.hold_ms = [int(x * 1000) for x in classifier.hold_thresholds]
+        self.click_enabled = classifier.click_enabled
+        self.exclusive_clicks = classifier.exclusive_clicks
+        # how many presses before the click type goes back to SINGLE
+        self.cycle = 1
+        click = ClickClassifier.next_click(SINGLE, self.click_enabled)
+        while click != SINGLE:
+            self.cycle += 1
+            click = ClickClassifier.next_click(click, self.click_enabled)
+
+
+def _classify_reference(timestamps, pressed, settings: _Settings, end):
+    """
+    Edge by edge classification with `async_button.ClickClassifier`, used when numpy is not
+    available or the edges are not a simple press/release sequence
+    """
+    classifier = ClickClassifier(**settings.kwargs)
+    events = array("l")
+    times = array("q")
+    press_time = 0
+
+    def add_hold_events(fired):
+        # long clicks and hold stages, in the order they became due
+        due = []
+        if fired & LONG:
+            due.append((settings.long_ms, LONG))
+        for stage, hold_ms in enumerate(settings.hold_ms):
+            if fired & ClickClassifier.hold_event(stage):
+                due.append((hold_ms, ClickClassifier.hold_event(stage)))
+        for delay, event_type in sorted(due):
+            events.append(event_type)
+            times.append(press_time + delay)
+
+    def add_deadline_events(fired):
+        # events that became due between edges: a long click, or a held back click
+        add_hold_events(fired)
+        for event_type in _CLICKS:
+            if fired & event_type:
+                events.append(event_type)
+                times.append(press_time + settings.double_ms)
+
+    # most edges fire nothing but PRESSED or RELEASED, so only look further when they do
+    hold_mask = LONG
+    for stage in range(len(settings.hold_ms)):
+        hold_mask |= ClickClassifier.hold_event(stage)
+    click_mask = SINGLE | DOUBLE | TRIPLE
+    update = classifier.update
+    add_event = events.append
+    add_time = times.append
+    for timestamp, edge in zip(timestamps, pressed):
+        fired = update(edge, timestamp)
+        if edge:
+            if fired & (hold_mask | click_mask):
+                add_deadline_events(fired)
+            press_time = timestamp
+            add_event(PRESSED)
+            add_time(timestamp)
+        else:
+            if fired & hold_mask:
+                add_hold_events(fired)
+            add_event(RELEASED)
+            add_time(timestamp)
+            if fired & click_mask:
+                for event_type in _CLICKS:
+                    if fired & event_type:
+                        add_event(event_type)
+                        add_time(timestamp)
+    if end is not None:
+        add_deadline_events(classifier.advance(end))
+    return events, times
+
+
+def _classify_numpy(timestamps, settings: _Settings, end):
+    """
+    Vectorised classification of a strictly alternating press/release sequence
+    """
+    # pylint: disable=too-many-locals
+    presses = timestamps[0::2]
+    releases = timestamps[1::2]
+    count = len(presses)
+    released = np.zeros(count, dtype=bool)
+    released[: len(releases)] = True
+    release_times = np.zeros(count, dtype=np.int64)
+    release_times[: len(releases)] = releases
+    if end is not None:
+        release_times[~released] = end
+    is_long = np.zeros(count, dtype=bool)
+    if settings.click_enabled[LONG]:
+        is_long = release_times - presses > settings.long_ms
+        if end is None:
+            is_long &= released
+    # a press within the double click window of the previous one carries on its click
+    # sequence; otherwise (or after a long click) the sequence starts again
+    index = np.arange(count)
+    within = np.zeros(count, dtype=bool)
+    within[1:] = presses[1:] - presses[:-1] < settings.double_ms
+    anchors = np.where(within, -1, index)
+    after_long = np.zeros(count, dtype=bool)
+    after_long[1:] = within[1:] & is_long[:-1]
+    anchors[after_long] = index[after_long] - 1
+    run = index - np.maximum.accumulate(anchors)
+    clicks = SINGLE << (run % settings.cycle)
+    fires_click = released & ~is_long
+    click_times = release_times.copy()
+    if settings.exclusive_clicks:
+        # clicks that could still be upgraded are held back until the window closes, and
+        # dropped if the next press arrives in time to upgrade them
+        held = (
+            fires_click
+            & ((run % settings.cycle) + 1 < settings.cycle)
+            & (release_times - presses < settings.double_ms)
+        )
+        fires_click[:-1] &= ~(held[:-1] & within[1:])
+        if count and held[-1]:
+            fires_click[-1] = (
+                end is not None and end >= presses[-1] + settings.double_ms
+            )
+        click_times[held] = presses[held] + settings.double_ms
+
+    # one row per press: PRESSED, LONG, RELEASED, click, in the order Button triggers them
+    events = np.empty((count, 4), dtype=np.int32)
+    events[:, 0] = PRESSED
+    events[:, 1] = LONG
+    events[:, 2] = RELEASED
+    events[:, 3] = clicks
+    times = np.empty((count, 4), dtype=np.int64)
+    times[:, 0] = presses
+    times[:, 1] = presses + settings.long_ms
+    times[:, 2] = release_times
+    times[:, 3] = click_times
+    mask = np.empty((count, 4), dtype=bool)
+    mask[:, 0] = True
+    mask[:, 1] = is_long
+    mask[:, 2] = released
+    mask[:, 3] = fires_click
+    mask = mask.ravel()
+    return events.ravel()[mask], times.ravel()[mask]
+
+
+def classify_edges(
+    timestamps: Sequence[int],
+    pressed: Sequence[bool],
+    *,
+    end: Optional[int] = None,
+    vectorise: Optional[bool] = None,
+    **kwargs,
+):
+    """
+    Work out which events an `async_button.Button` would have triggered for a recorded
+    sequence of edges, without running it in real time. This uses exactly the same rules as
+    `async_button.Button`, except that events that fire on a deadline (a
+    `LONG <async_button.Button.LONG>` click, or a click held back by ``exclusive_clicks``)
+    are reported at the moment they became due rather than when the button next checked.
+
+    If NumPy is installed, the edges alternate between press and release (starting with a
+    press) and there are no ``hold_thresholds``, the classification is vectorised and can
+    handle millions of edges per second. Otherwise each edge is processed in turn.
+
+    :param Sequence[int] timestamps: time of each edge in milliseconds. These must not wrap
+      around, so use `unwrap_ticks` on values from `adafruit_ticks.ticks_ms` first.
+    :param Sequence[bool] pressed: ``True`` for each press and ``False`` for each release
+    :param int end: time at which the recording stopped; if given, a final press that was
+      still held at this time may produce a long click
+    :param bool vectorise: ``None`` (the default) to vectorise when possible, ``False`` to
+      always process each edge in turn, or ``True`` to raise `ValueError` if the
+      classification cannot be vectorised. This is for comparing the two with
+      `async_button_testing.fuzz`.
+    :param kwargs: ``double_click_max_duration``, ``long_click_min_duration``,
+      ``double_click_enable``, ``triple_click_enable``, ``long_click_enable``,
+      ``exclusive_clicks`` and ``hold_thresholds``, with the same meaning and defaults as
+      for `async_button.Button`
+    :return: two arrays: the event types (`async_button.Button.PRESSED` etc.) and the
+      time each one happened, in the order the button would trigger them
+    """
+    settings = _Settings(**kwargs)
+    if np is None or vectorise is False:
+        if vectorise:
+            raise ValueError("NumPy is needed to vectorise")
+        return _classify_reference(timestamps, pressed, settings, end)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    pressed = np.asarray(pressed, dtype=bool)
+    if len(timestamps) != len(pressed):
+        raise ValueError("timestamps and pressed must be the same length")
+    if settings.hold_ms or not (np.all(pressed[0::2]) and not np.any(pressed[1::2])):
+        if vectorise:
+            raise ValueError(
+                "Only alternating edges without hold stages can be vectorised"
+            )
+        events, times = _classify_reference(timestamps, pressed, settings, end)
+        return np.asarray(events, dtype=np.int32), np.asarray(times, dtype=np.int64)
+    return _classify_numpy(timestamps, settings, end)
+
+
+def unwrap_ticks(timestamps: Sequence[int]):
+    """
+    Convert values from `adafruit_ticks.ticks_ms`, which wrap around every 2**29
+    milliseconds, into an ever increasing sequence
+
+    :param Sequence[int] timestamps: values from `adafruit_ticks.ticks_ms`, in order
+    :return: the timestamps, relative to the first one
+    """
+    if np is None:
+        result = array("q")
+        total = 0
+        last = None
+        for timestamp in timestamps:
+            if last is not None:
+                total += ticks_diff(timestamp, last)
+            result.append(total)
+            last = timestamp
+        return result
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if not len(timestamps):  # pylint: disable=use-implicit-booleaness-not-len
+        return timestamps
+    period = 1 << 29
+    steps = (np.diff(timestamps) + period // 2) % period - period // 2
+    return np.concatenate(([0], np.cumsum(steps)))
+
+
+def decode_events(data: bytes) -> List[Tuple[int, int, int, int, int]]:
+    """
+    Unpack the records written by an `async_button.EventSink`
+
+    :param bytes data: The bytes written to the sink's stream, e.g. the contents of the log file
+    :return: a list of ``(source, events, timestamp, duration, clicks)`` tuples, one per
+      record, in the order they were recorded
+    """
+    if len(data) % EventSink.RECORD_SIZE:
+        raise ValueError("data is not a whole number of records")
+    return [
+        (source, events, timestamp, duration, clicks)
+        for source, clicks, events, timestamp, duration in struct.iter_unpack(
+            EventSink.RECORD_FORMAT, data
+        )
+    ]
@@ -0,0 +1,862 @@
+# SPDX-FileCopyrightText: 2017 Scott Shawcroft, written for Adafruit Industries
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+`async_button_core`
+================================================================================
+
+The core of `async_button`: `SimpleButton`, `ClickClassifier`, `PolledButton` and `Button`,
+without `async_button.MultiButton`, `async_button.ButtonMatrix`, `async_button.EventSink` or
+the other extras. Import from here rather than from `async_button` to save memory if these
+are all you need; see ``benchmarks/footprint.py`` for how much. `async_button` uses
+`ClickClassifier` and `PolledButton` as they are, and its `SimpleButton` and `Button` add to
+these ones, so code written for this module also works with that one.
+
+
+* Author(s): Phil Underwood
+
+Implementation Notes
+--------------------
+
+**Software and Dependencies:**
+
+* Adafruit CircuitPython firmware for the supported boards:
+  https://circuitpython.org/downloads
+
+* CircuitPython asyncio module:
+  https://github.com/adafruit/Adafruit_CircuitPython_asyncio
+
+* CircuitPython ticks module:
+  https://github.com/adafruit/Adafruit_CircuitPython_Ticks
+"""
+
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/furbrain/CircuitPython_async_button.git"
+
+try:
+    import asyncio
+except ImportError:
+    # ClickClassifier and PolledButton can be used without asyncio
+    asyncio = None
+
+from adafruit_ticks import ticks_add, ticks_diff, ticks_less, ticks_ms
+
+try:
+    from typing import Dict, Sequence, Union, Callable
+except ImportError:
+    pass
+
+import digitalio
+import keypad
+from microcontroller import Pin
+
+try:
+    import countio
+except ImportError:
+    # countio is not available on all boards (or on a host computer), only SimpleButton needs it
+    countio = None
+
+
+class SimpleButton:
+    """
+    Asynchronous interface to a button or other IO input. This does not create a background
+    task.
+    """
+
+    def __init__(
+        self,
+        pin: Pin,
+        value_when_pressed: bool,
+        *,
+        pull: bool = True,
+        interval=0.05,
+        debounce: float = 0,
+    ):
+        """
+
+        :param Pin pin: Pin to wait for
+        :param bool value_when_pressed: ``True`` if the pin reads high when the key is pressed.
+          ``False`` if the pin reads low (is grounded) when the key is pressed.
+        :param bool pull: ``True`` if an internal pull-up or pull-down should be enabled on the
+          pin. A pull-up will be used if value_when_pressed is False; a pull-down will be used if
+          it is ``True``. If an external pull is already provided for the pin, you can set
+          pull to ``False``. However, enabling an internal pull when an external one is already
+          present is not a problem; it simply uses slightly more current.
+        :param float interval: How long to wait between checks of whether the button has changed.
+          Default is 0.05s (human experience of "instantaneous" is up to 0.1s). This parameter
+          can be set to zero and the button will be checked as often as possible, although other
+          coroutines will still be able to run.
+        :param float debounce: How long in seconds the switch must go without bouncing before a
+          press or release counts. Once there have been no more edges for this long, the pin is
+          read to make sure it really has changed, so `pressed` and `released` return once per
+          physical press, this much later. Anything shorter than this is ignored. Default is 0,
+          which returns at the first edge.
+        """
+        # pylint: disable=too-many-arguments
+        self.pin: Pin = pin
+        self.value_when_pressed = value_when_pressed
+        self.interval = interval
+        self.debounce = debounce
+        #: Number of edges ignored as contact bounce or glitches when ``debounce`` is set
+        self.bounce_count = 0
+        if pull:
+            self.pull = digitalio.Pull.DOWN if value_when_pressed else digitalio.Pull.UP
+        else:
+            self.pull = None
+
+    async def pressed(self):
+        """
+        Wait until button is pressed
+        """
+        await self._wait_for(self.value_when_pressed)
+
+    async def released(self):
+        """
+        Wait until button is released
+        """
+        await self._wait_for(not self.value_when_pressed)
+
+    async def _wait_for(self, level: bool):
+        edge = countio.Edge.RISE if level else countio.Edge.FALL
+        while True:
+            with countio.Counter(self.pin, edge=edge, pull=self.pull) as counter:
+                seen = counter.count
+                while not seen:
+                    await asyncio.sleep(self.interval)
+                    seen = counter.count
+                if not self.debounce:
+                    return
+                # wait until a whole debounce time passes without another edge
+                while True:
+                    await asyncio.sleep(self.debounce)
+                    count = counter.count
+                    if count == seen:
+                        break
+                    seen = count
+                self.bounce_count += seen - 1
+            if self._read() == level:
+                return
+            # pin has gone back, so this was a glitch or too short to count
+            self.bounce_count += 1
+
+    def _read(self) -> bool:
+        with digitalio.DigitalInOut(self.pin) as pin:
+            pin.switch_to_input(self.pull)
+            return pin.value
+
+
+class ClickClassifier:
+    """
+    The click detection used by `Button`, without any I/O. It is fed with presses and
+    releases (and their timestamps) and the current time, and returns the events that
+    fired as a bitmask. This can be used with any scheduler, or none at all.
+
+    All times are in milliseconds, as returned by `adafruit_ticks.ticks_ms`.
+
+    :example:
+      .. code-block:: python
+
+        >>> classifier = ClickClassifier(long_click_enable=True)
+        >>> classifier.update(True, ticks_ms())  # button pressed
+        1
+        >>> events = classifier.advance(ticks_ms())  # call regularly while nothing happens
+        >>> if events & ClickClassifier.LONG:
+        >>>     print("Long click")
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    PRESSED = 1  #: Button has been pressed
+    RELEASED = 2  #: Button has been released
+    SINGLE = 4  #: Single click
+    DOUBLE = 8  #: Double click
+    TRIPLE = 16  #: Triple click
+    LONG = 32  #: Long click
+    HOLD = 64  #: First stage of a staged hold, see `hold_event`
+    MAX_HOLD_STAGES = 8  #: Maximum number of ``hold_thresholds``
+    _CLICK_COUNTS = {SINGLE: 1, DOUBLE: 2, TRIPLE: 3}
+
+    def __init__(
+        self,
+        *,
+        double_click_max_duration: float = 0.5,
+        long_click_min_duration: float = 2.0,
+        double_click_enable: bool = True,
+        triple_click_enable: bool = False,
+        long_click_enable: bool = False,
+        exclusive_clicks: bool = False,
+        hold_thresholds: Sequence[float] = (),
+    ):
+        """
+        :param float double_click_max_duration: how long in seconds before a second click is
+          registered as a double click (this is also the value used for triple clicks.
+          Default is 0.5 seconds.
+        :param float long_click_min_duration: how long in seconds the button must be pressed
+          before a long_click is triggered. Default is 2 seconds.
+        :param bool double_click_enable: Whether double clicks are detected. Default is True.
+        :param bool triple_click_enable: Whether triple clicks are detected. Default is False.
+        :param bool long_click_enable: Whether long clicks are detected. Default is False.
+        :param bool exclusive_clicks: If ``True``, only one click event is fired per gesture:
+          a click is held back until it is certain that it will not become a double or triple
+          click. Default is False.
+        :param Sequence[float] hold_thresholds: times in seconds, in increasing order, at which
+          to fire `hold_event` for each stage while the button is held. If any stage fires, no
+          click is fired on release. Default is no stages.
+        """
+        # pylint: disable=too-many-arguments
+        if not double_click_enable and triple_click_enable:
+            raise ValueError("Must have double click enabled to use triple click")
+        self._check_hold_thresholds(hold_thresholds)
+        #: Maximum separation between two clicks to register as double in seconds
+        self.double_click_max_duration = double_click_max_duration
+        #: Minimum duration for a click to register as a long click in seconds
+        self.long_click_min_duration = long_click_min_duration
+        #: Whether `DOUBLE`, `TRIPLE` and `LONG` clicks are detected
+        self.click_enabled = {
+            self.DOUBLE: double_click_enable,
+            self.TRIPLE: triple_click_enable,
+            self.LONG: long_click_enable,
+        }
+        #: Click type of the current or most recent press
+        self.last_click = self.SINGLE
+        #: ``True`` if the button is currently held down
+        self.pressed = False
+        #: ``True`` if only one click event is fired per gesture
+        self.exclusive_clicks = exclusive_clicks
+        #: When the most recent events happened, in milliseconds. For events that fire on a
+        #: deadline (e.g. `LONG`) this is the deadline, not the time `advance` was called
+        self.event_time = 0
+        #: How long the button was held for, in milliseconds: for `LONG` this is the time
+        #: until the long click fired, and for `PRESSED` it is zero
+        self.press_duration = 0
+        #: Position of the current or most recent press in its click sequence: 1 for a single
+        #: click, 2 for a double click and 3 for a triple click
+        self.clicks = 1
+        self._press_time = None
+        self._long_click_due = 0
+        self._dbl_clk_expires = 0
+        self._pending_click = 0
+        #: Times in seconds at which each stage of a staged hold fires
+        self.hold_thresholds = tuple(hold_thresholds)
+        self._hold_stage = len(self.hold_thresholds)  # next stage to fire
+        self._hold_due = 0
+
+    @staticmethod
+    def hold_event(stage: int) -> int:
+        """
+        The event fired when the button has been held for ``hold_thresholds[stage]``
+
+        :param int stage: index into ``hold_thresholds``
+        :return: the event type
+        """
+        return ClickClassifier.HOLD << stage
+
+    @staticmethod
+    def _check_hold_thresholds(thresholds: Sequence[float]):
+        if len(thresholds) > ClickClassifier.MAX_HOLD_STAGES:
+            raise ValueError("Too many hold thresholds")
+        last = 0
+        for threshold in thresholds:
+            if threshold <= last:
+                raise ValueError("Hold thresholds must be positive and increasing")
+            last = threshold
+
+    def configure(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        double_click_max_duration: float = None,
+        long_click_min_duration: float = None,
+        double_click_enable: bool = None,
+        triple_click_enable: bool = None,
+        long_click_enable: bool = None,
+        exclusive_clicks: bool = None,
+        hold_thresholds: Sequence[float] = None,
+    ):
+        """
+        Change timing and enabled clicks. Any parameter left as ``None`` keeps its current
+        value. All values are checked before any are applied, so a failed call leaves the
+        classifier unchanged. The deadlines of a click sequence in progress are recalculated
+        from the original press time.
+        """
+        enabled = {
+            self.DOUBLE: double_click_enable,
+            self.TRIPLE: triple_click_enable,
+            self.LONG: long_click_enable,
+        }
+        for click, value in self.click_enabled.items():
+            if enabled[click] is None:
+                enabled[click] = value
+        if not enabled[self.DOUBLE] and enabled[self.TRIPLE]:
+            raise ValueError("Must have double click enabled to use triple click")
+        if hold_thresholds is not None:
+            self._check_hold_thresholds(hold_thresholds)
+            self.hold_thresholds = tuple(hold_thresholds)
+        self.click_enabled = enabled
+        if double_click_max_duration is not None:
+            self.double_click_max_duration = double_click_max_duration
+        if long_click_min_duration is not None:
+            self.long_click_min_duration = long_click_min_duration
+        if exclusive_clicks is not None:
+            self.exclusive_clicks = exclusive_clicks
+        self._set_deadlines()
+        if self.last_click in enabled and not enabled[self.last_click]:
+            self.last_click = self.SINGLE
+
+    def _set_deadlines(self):
+        if self._press_time is None:
+            return
+        self._long_click_due = ticks_add(
+            self._press_time, int(self.long_click_min_duration * 1000)
+        )
+        self._dbl_clk_expires = ticks_add(
+            self._press_time, int(self.double_click_max_duration * 1000)
+        )
+        if self._hold_stage < len(self.hold_thresholds):
+            self._hold_due = ticks_add(
+                self._press_time, int(self.hold_thresholds[self._hold_stage] * 1000)
+            )
+
+    def update(self, pressed: bool, timestamp: int) -> int:
+        """
+        Process a press or release of the button
+
+        :param bool pressed: ``True`` if the button has been pressed, ``False`` if released
+        :param int timestamp: when this happened, in milliseconds
+        :return: the events that fired, as a bitmask
+        """
+        fired = self.advance(timestamp)
+        self.event_time = timestamp
+        if pressed:
+            fired |= self.PRESSED
+            if self._press_time is not None and ticks_less(
+                timestamp, self._dbl_clk_expires
+            ):
+                self.last_click = self.next_click(self.last_click, self.click_enabled)
+            else:
+                self.last_click = self.SINGLE
+            self.clicks = self._CLICK_COUNTS[self.last_click]
+            self.press_duration = 0
+            # any held back click has now been superseded by this one
+            self._pending_click = 0
+            self._hold_stage = 0
+            self._press_time = timestamp
+            self._set_deadlines()
+            self.pressed = True
+        else:
+            fired |= self.RELEASED
+            if self._press_time is not None:
+                self.press_duration = ticks_diff(timestamp, self._press_time)
+            if self.last_click == self.LONG or self._hold_stage:
+                # no click after a long click or a staged hold
+                self.last_click = self.SINGLE
+            elif (
+                self.exclusive_clicks
+                and self.next_click(self.last_click, self.click_enabled) != self.SINGLE
+                and ticks_less(timestamp, self._dbl_clk_expires)
+            ):
+                # another press could still upgrade this click, so hold it back
+                self._pending_click = self.last_click
+            else:
+                fired |= self.last_click
+            self.pressed = False
+        return fired
+
+    def advance(self, now: int) -> int:
+        """
+        Let time pass with no presses or releases
+
+        :param int now: the current time in milliseconds
+        :return: the events that fired, as a bitmask
+        """
+        fired = self._check_long(now) | self._check_hold(now)
+        if self._pending_click and not ticks_less(now, self._dbl_clk_expires):
+            fired |= self._pending_click
+            self._pending_click = 0
+            self.event_time = self._dbl_clk_expires
+        return fired
+
+    def _check_long(self, now: int) -> int:
+        if self.pressed and self.click_enabled[self.LONG]:
+            if self.last_click != self.LONG and ticks_less(self._long_click_due, now):
+                self.last_click = self.LONG
+                self.event_time = self._long_click_due
+                self.press_duration = ticks_diff(self._long_click_due, self._press_time)
+                return self.LONG
+        return 0
+
+    def _check_hold(self, now: int) -> int:
+        fired = 0
+        # only the next stage is ever compared with the time
+        while (
+            self.pressed
+            and self._hold_stage < len(self.hold_thresholds)
+            and ticks_less(self._hold_due, now)
+        ):
+            fired |= self.hold_event(self._hold_stage)
+            self.event_time = self._hold_due
+            self.press_duration = ticks_diff(self._hold_due, self._press_time)
+            self._hold_stage += 1
+            self._set_deadlines()
+        return fired
+
+    def in_gesture(self, now: int) -> bool:
+        """
+        Whether a gesture is in progress, so that a delay in handling the next press, release
+        or deadline could change how it is classified: the button is held down, or it was
+        released recently enough that another press would make a double or triple click.
+
+        :param int now: the current time in milliseconds
+        :return: ``True`` if a gesture is in progress
+        """
+        if self.pressed or self._pending_click:
+            return True
+        return (
+            self._press_time is not None
+            and self.next_click(self.last_click, self.click_enabled) != self.SINGLE
+            and ticks_less(now, self._dbl_clk_expires)
+        )
+
+    @property
+    def next_deadline(self):
+        """
+        The next time at which `advance` will fire an event, or ``None`` if nothing will
+        happen until the button is next pressed or released
+        """
+        if self._pending_click:
+            return self._dbl_clk_expires
+        deadline = None
+        if self.pressed:
+            if self.click_enabled[self.LONG] and self.last_click != self.LONG:
+                deadline = ticks_add(self._long_click_due, 1)
+            if self._hold_stage < len(self.hold_thresholds):
+                hold_deadline = ticks_add(self._hold_due, 1)
+                if deadline is None or ticks_less(hold_deadline, deadline):
+                    deadline = hold_deadline
+        return deadline
+
+    @staticmethod
+    def next_click(last_click: int, click_enabled: Dict[int, bool]) -> int:
+        """
+        The rule used to upgrade a click when the button is pressed again within
+        `double_click_max_duration`. This is also used by `async_button_analysis`, so that
+        offline classification always matches the button.
+
+        :param int last_click: the click type of the previous press
+        :param Dict[int,bool] click_enabled: whether `DOUBLE`, `TRIPLE` and `LONG` are enabled
+        :return: the click type of the new press
+        """
+        if (
+            last_click == ClickClassifier.SINGLE
+            and click_enabled[ClickClassifier.DOUBLE]
+        ):
+            return ClickClassifier.DOUBLE
+        if (
+            last_click == ClickClassifier.DOUBLE
+            and click_enabled[ClickClassifier.TRIPLE]
+        ):
+            return ClickClassifier.TRIPLE
+        return ClickClassifier.SINGLE
+
+
+class PolledButton:
+    """
+    A button that reports single, double, triple and long clicks, without needing asyncio.
+    Call `poll` regularly (e.g. every time round a ``while True:`` loop) to find out what
+    has happened.
+
+    :example:
+      .. code-block:: python
+
+        >>> button = PolledButton(board.D5, value_when_pressed=False)
+        >>> while True:
+        >>>     events = button.poll()
+        >>>     if events & Button.DOUBLE:
+        >>>         print("Double click")
+        >>>     time.sleep(0.02)
+    """
+
+    PRESSED = ClickClassifier.PRESSED  #: Button has been pressed
+    RELEASED = ClickClassifier.RELEASED  #: Button has been released
+    SINGLE = ClickClassifier.SINGLE  #: Single click
+    DOUBLE = ClickClassifier.DOUBLE  #: Double click
+    TRIPLE = ClickClassifier.TRIPLE  #: Triple click
+    LONG = ClickClassifier.LONG  #: Long click
+    HOLD = ClickClassifier.HOLD  #: First hold stage, see `hold_event`
+    MAX_HOLD_STAGES = (
+        ClickClassifier.MAX_HOLD_STAGES
+    )  #: Maximum number of ``hold_thresholds``
+    ANY_CLICK = (
+        SINGLE,
+        DOUBLE,
+        TRIPLE,
+        LONG,
+    )  #: Any of `SINGLE`, `DOUBLE`, `TRIPLE` or `LONG`
+    ALL_EVENTS = (PRESSED, RELEASED, SINGLE, DOUBLE, TRIPLE, LONG)  #: Any event
+    _ALL_EVENTS_MASK = PRESSED | RELEASED | SINGLE | DOUBLE | TRIPLE | LONG
+    _EDGES = PRESSED | RELEASED
+
+    next_click = staticmethod(ClickClassifier.next_click)
+    hold_event = staticmethod(ClickClassifier.hold_event)
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        pin: Pin,
+        value_when_pressed: bool,
+        *,
+        pull: bool = True,
+        interval: float = 0.020,
+        double_click_max_duration=0.5,
+        long_click_min_duration=2.0,
+        double_click_enable: bool = True,
+        triple_click_enable: bool = False,
+        long_click_enable: bool = False,
+        exclusive_clicks: bool = False,
+        hold_thresholds: Sequence[float] = (),
+        clock: Callable[[], int] = None,
+    ):
+        """
+        :param Pin pin: the pin to be monitored
+        :param bool value_when_pressed: ``True`` if the pin reads high when the key is pressed.
+          ``False`` if the pin reads low (is grounded) when the key is pressed.
+        :param bool pull: ``True`` if an internal pull-up or pull-down should be enabled on
+          the pin. A pull-up will be used if ``value_when_pressed`` is ``False``; a pull-down
+          will be used if it is True. If an external pull is already provided for the pins,
+          you can set pull to ``False``. However, enabling an internal pull when an external one
+          is already present is not a problem; it simply uses slightly more current. Default is
+          True.
+        :param float interval: How long we wait between checking the state of the button. Default is
+          0.02 (20 milliseconds), which is a good value for debouncing.
+        :param float double_click_max_duration: how long in seconds before a second click is
+          registered as a double click (this is also the value used for triple clicks.
+          Default is 0.5 seconds.
+        :param float long_click_min_duration: how long in seconds the button must be pressed before
+          a long_click is triggered. Default is 2 seconds.
+        :param bool double_click_enable: Whether double clicks are detected. Default is True.
+        :param bool triple_click_enable: Whether triple clicks are detected. Default is False.
+        :param bool long_click_enable: Whether long clicks are detected. Default is False.
+        :param bool exclusive_clicks: If ``True``, only one of `SINGLE`, `DOUBLE` or `TRIPLE`
+          is fired per gesture. A click that could still become a double or triple click is
+          held back until `double_click_max_duration` after its press has passed. Default is
+          False.
+        :param Sequence[float] hold_thresholds: times in seconds, in increasing order, at which
+          to fire `hold_event` for each stage while the button is held, e.g. ``(1, 3, 10)``.
+          If any stage fires, no click is fired on release. Default is no stages.
+        :param clock: Function returning the current time in milliseconds, in place of
+          `adafruit_ticks.ticks_ms`, e.g. `async_button_testing.VirtualTimeLoop.ticks_ms`.
+          Timestamps from `keypad.Event` are still used where available, so they must come
+          from the same clock. Default is `adafruit_ticks.ticks_ms`.
+        """
+        self.pin = pin
+        self.value_when_pressed = value_when_pressed
+        self.pull = pull
+        self.interval = interval
+        #: Function that returns the current time in milliseconds
+        self.clock = ticks_ms if clock is None else clock
+        #: The `ClickClassifier` that does the click detection for this button
+        self.classifier = ClickClassifier(
+            double_click_max_duration=double_click_max_duration,
+            long_click_min_duration=long_click_min_duration,
+            double_click_enable=double_click_enable,
+            triple_click_enable=triple_click_enable,
+            long_click_enable=long_click_enable,
+            exclusive_clicks=exclusive_clicks,
+            hold_thresholds=hold_thresholds,
+        )
+        self.keys = self._make_keys()
+        self._rebuild_pending = False
+        self._evt = keypad.Event(0, False)
+        self._unreported = 0  # events found while handling an edge, for the next poll
+
+    def _make_keys(self):
+        return keypad.Keys(
+            (self.pin,),
+            value_when_pressed=self.value_when_pressed,
+            pull=self.pull,
+            interval=self.interval,
+        )
+
+    @property
+    def double_click_max_duration(self) -> float:
+        """Maximum separation between two clicks to register as double in seconds"""
+        return self.classifier.double_click_max_duration
+
+    @double_click_max_duration.setter
+    def double_click_max_duration(self, value: float):
+        self.classifier.configure(double_click_max_duration=value)
+
+    @property
+    def long_click_min_duration(self) -> float:
+        """Minimum duration for a click to register as a long click in seconds"""
+        return self.classifier.long_click_min_duration
+
+    @long_click_min_duration.setter
+    def long_click_min_duration(self, value: float):
+        self.classifier.configure(long_click_min_duration=value)
+
+    @property
+    def click_enabled(self) -> Dict[int, bool]:
+        """Whether `DOUBLE`, `TRIPLE` and `LONG` clicks are detected"""
+        return self.classifier.click_enabled
+
+    @property
+    def last_click(self) -> int:
+        """Click type of the current or most recent press"""
+        return self.classifier.last_click
+
+    @property
+    def pressed(self) -> bool:
+        """``True`` if the button is currently held down"""
+        return self.classifier.pressed
+
+    def poll(self) -> int:
+        """
+        Check the button for a change in state. This handles at most one press or release,
+        so call it at least every `interval` seconds.
+
+        :return: the events that happened as a bitmask, e.g. ``Button.RELEASED |
+          Button.SINGLE``. This is zero if nothing happened.
+        """
+        evt = self._evt
+        if self.keys.events.get_into(evt):
+            fired = self._update(evt)
+        else:
+            fired = self.classifier.advance(self.clock())
+        fired |= self._unreported
+        self._unreported = 0
+        return fired
+
+    def _update(self, evt: keypad.Event) -> int:
+        # use now if timestamp not there
+        now = getattr(evt, "timestamp", self.clock())
+        # a long click or hold stage that fell due before this edge happened then, so it is
+        # reported on its own with its own time and duration
+        overdue = self.classifier.advance(now)
+        if overdue:
+            self._trigger(overdue)
+        fired = self.classifier.update(evt.pressed, now)
+        if self._rebuild_pending and not evt.pressed:
+            self._rebuild_keys()
+        return fired
+
+    def _trigger(self, fired: int):
+        self._unreported |= fired
+
+    def _rebuild_keys(self):
+        self._rebuild_pending = False
+        if self.keys is not None:
+            self.keys.deinit()
+        self.keys = self._make_keys()
+
+    def reconfigure(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        interval: float = None,
+        double_click_max_duration: float = None,
+        long_click_min_duration: float = None,
+        double_click_enable: bool = None,
+        triple_click_enable: bool = None,
+        long_click_enable: bool = None,
+        exclusive_clicks: bool = None,
+        hold_thresholds: Sequence[float] = None,
+    ):
+        """
+        Change the timing and enabled clicks of a running button, without recreating it. Any
+        parameter left as ``None`` keeps its current value. All values are checked before any
+        are applied, so a failed call leaves the button unchanged.
+
+        A click sequence that is in progress is carried over: the double click window and long
+        click deadline of the current press are recalculated from the original press time. The
+        underlying `keypad.Keys` scanner is only rebuilt if ``interval`` actually changes, and
+        if the button is held at the time, this is deferred until it is released.
+
+        :param float interval: How long we wait between checking the state of the button.
+        :param float double_click_max_duration: how long in seconds before a second click is
+          registered as a double click.
+        :param float long_click_min_duration: how long in seconds the button must be pressed
+          before a long_click is triggered.
+        :param bool double_click_enable: Whether double clicks are detected.
+        :param bool triple_click_enable: Whether triple clicks are detected.
+        :param bool long_click_enable: Whether long clicks are detected.
+        :param bool exclusive_clicks: Whether only one click event is fired per gesture.
+        :param Sequence[float] hold_thresholds: times in seconds for each stage of a staged
+          hold.
+
+        :example:
+          .. code-block:: python
+
+            >>> # switch to accessibility profile
+            >>> button.reconfigure(double_click_max_duration=1.0, long_click_min_duration=3.0)
+        """
+        self.classifier.configure(
+            double_click_max_duration=double_click_max_duration,
+            long_click_min_duration=long_click_min_duration,
+            double_click_enable=double_click_enable,
+            triple_click_enable=triple_click_enable,
+            long_click_enable=long_click_enable,
+            exclusive_clicks=exclusive_clicks,
+            hold_thresholds=hold_thresholds,
+        )
+        if interval is not None and interval != self.interval:
+            self.interval = interval
+            if self.pressed:
+                self._rebuild_pending = True
+            else:
+                self._rebuild_keys()
+
+    def deinit(self):
+        """
+        Deinitialise object and release the pin
+        """
+        if self.keys is not None:
+            self.keys.deinit()
+            self.keys = None
+
+
+class Button(PolledButton):
+    """
+    This object will monitor the specified pin for changes and will report
+    single, double, triple and long_clicks. It creates a background `asyncio` process
+    that will monitor the button. The `events` chapter in the documentation shows when the
+    various events are triggered
+
+    `async_button.Button` builds on this with event records, event sinks, lateness tracking
+    and deferred start.
+    """
+
+    def __init__(self, pin: Pin, value_when_pressed: bool, **kwargs):
+        """
+        Create the button object and start the background async process, this object must be
+        created only when the asyncio event loop is running. Parameters are as for
+        `PolledButton`.
+        """
+        super().__init__(pin, value_when_pressed, **kwargs)
+        #: The `asyncio.Event` for each event type (or bitmask of event types waited for
+        #: together) that has been waited for. Events are only created the first time they
+        #: are waited for
+        self.events: Dict[int, "asyncio.Event"] = {}
+        self._listening = 0  # bitmask of the event types in self.events
+        # for each of self.events: [types fired since its waiters last ran, whether they have,
+        # number of waiters]
+        self._fired: Dict[int, list] = {}
+        #: The background task, or ``None`` if the button has not been started
+        self.monitor_task = None
+        self._start_monitor()
+
+    def _start_monitor(self):
+        if self.monitor_task is None:
+            self.monitor_task = asyncio.create_task(self._monitor())
+
+    def _event(self, mask: int) -> "asyncio.Event":
+        evt = self.events.get(mask)
+        if evt is None:
+            valid = self._ALL_EVENTS_MASK | self.HOLD * (
+                (1 << len(self.classifier.hold_thresholds)) - 1
+            )
+            if not mask or mask & ~valid:
+                raise KeyError(mask)
+            evt = asyncio.Event()
+            self.events[mask] = evt
+            self._fired[mask] = [0, False, 0]
+            self._listening |= mask
+        return evt
+
+    async def _monitor(self):
+        """
+        This is the main background task that monitors key presses and releases
+        """
+        while True:
+            fired = self.poll()
+            if fired:
+                self._trigger(fired)
+            await asyncio.sleep(self._delay(self.clock()))
+
+    def _delay(self, now: int) -> float:
+        delay = self.interval
+        deadline = self.classifier.next_deadline
+        if deadline is not None:
+            # wake up in time for a deadline rather than at the next interval
+            delay = min(delay, max(ticks_diff(deadline, now), 0) / 1000)
+        return delay
+
+    def _trigger(self, fired: int):
+        if not fired & self._listening:
+            return
+        for event_type, evt in self.events.items():
+            if fired & event_type:
+                seen = self._fired[event_type]
+                if seen[1]:
+                    seen[0] = 0
+                    seen[1] = False
+                seen[0] |= fired & event_type
+                evt.set()
+                evt.clear()
+
+    async def wait(self, click_types: Union[int, Sequence[int]] = None):
+        """
+        Wait for the first of the specified events. This raises `ValueError` if the button
+        has been deinitialised.
+
+        :param (List[int] | int) click_types: List of events to listen for. You can also pass a
+          single event type in. Default is to listen for all events, see `ALL_EVENTS`.
+        :return: A list of the clicks that actually happened.
+
+        :example:
+          .. code-block:: python
+
+            >>> async def get_click():
+            >>>     # wait for a double or triple click
+            >>>     clicks = await button.wait((Button.DOUBLE, Button.TRIPLE))
+            >>>     if Button.DOUBLE in clicks:
+            >>>         # do something
+
+        """
+        if self.monitor_task is None:
+            raise ValueError("Object has been deinitialized")
+        if click_types is None:
+            click_types = self.ALL_EVENTS
+        if isinstance(click_types, int):
+            click_types = [click_types]
+        # one event is shared by everyone waiting for the same set of event types
+        mask = 0
+        for evt_type in click_types:
+            mask |= evt_type
+        evt = self._event(mask)
+        seen = self._fired[mask]
+        if not seen[2]:
+            # nothing that fired while nobody was waiting belongs to this waiter
+            seen[0] = 0
+            seen[1] = False
+        seen[2] += 1
+        try:
+            await evt.wait()
+        finally:
+            seen[2] -= 1
+        if len(click_types) == 1:
+            return [click_types[0]]
+        # everything that fired before this waiter ran, as if each type had its own event
+        seen[1] = True
+        return [evt_type for evt_type in click_types if seen[0] & evt_type]
+
+    async def wait_for_click(self):
+        """
+        Wait for any click and return it
+
+        :return: Which click happened i.e. one of `SINGLE`, `DOUBLE`, `TRIPLE` or `LONG`
+        """
+        clicks = await self.wait(self.ANY_CLICK)
+        return clicks[0]
+
+    def deinit(self):
+        """
+        Deinitialise object and stop the background task
+        """
+        if self.monitor_task is not None:
+            try:
+                self.monitor_task.cancel()
+            except KeyError:
+                # sometimes get a key error if deinited before asyncio starts
+                pass
+            self.monitor_task = None
+        super().deinit()
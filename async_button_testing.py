@@ -0,0 +1,601 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+`async_button_testing`
+================================================================================
+
+Tools for testing code that uses `async_button` on a host computer, without waiting in real
+time. These are not intended to be run on the microcontroller.
+
+`VirtualTimeLoop` is an `asyncio` event loop whose clock jumps straight to the next timer
+whenever there is nothing else to do, so ``await asyncio.sleep(3600)`` returns at once. Give
+its `VirtualTimeLoop.ticks_ms` to a button as the ``clock`` and click timing follows the
+virtual time too. `ScriptedKeys` stands in for a `keypad` scanner and replays a trace of
+presses and releases against that clock.
+
+`fuzz` generates random streams of presses and releases, including contact bounce and
+timings right at the double and long click thresholds, runs them through the reference
+click detection and one or more other engines side by side and reports the first place
+where they disagree. Run it with all the engines after changing any of them.
+
+* Author(s): Phil Underwood
+
+:example:
+  .. code-block:: python
+
+    >>> loop = VirtualTimeLoop()
+    >>> keys = ScriptedKeys(loop.ticks_ms, [(100, True), (2500, False)])
+    >>> async def main():
+    >>>     with patch("async_button.keypad.Keys", return_value=keys):
+    >>>         button = Button(board.D5, True, long_click_enable=True, clock=loop.ticks_ms)
+    >>>         record = await button.wait_record(Button.LONG)
+    >>>         return record.timestamp
+    >>> loop.run_until_complete(main())  # 2100, and takes no time at all
+"""
+
+import asyncio
+import random
+import selectors
+from array import array
+from unittest.mock import patch
+
+from adafruit_ticks import ticks_diff
+
+try:
+    from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Union
+except ImportError:
+    pass
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from async_button import Button, ClickClassifier, KeyMatrixClassifier
+from async_button_analysis import classify_edges
+
+_TICKS_PERIOD = 1 << 29
+
+
+class _VirtualSelector:
+    """
+    Wraps a real selector: checks for I/O without blocking, and if there was none, moves the
+    loop's clock on by however long the loop wanted to wait
+    """
+
+    def __init__(self, loop: "VirtualTimeLoop", selector: selectors.BaseSelector):
+        self._loop = loop
+        self._selector = selector
+
+    def select(self, timeout=None):
+        """Poll for I/O, then skip ahead by ``timeout`` if nothing was ready"""
+        ready = self._selector.select(0)
+        if not ready and timeout:
+            # pylint: disable=protected-access
+            self._loop._time += timeout
+        return ready
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    An `asyncio` event loop that runs in virtual time. The clock only moves when every task is
+    waiting, and then jumps straight to the next timer that is due.
+    """
+
+    def __init__(self, start_ms: int = 0):
+        """
+        :param int start_ms: the time to start at, in milliseconds. Use a value just below
+          ``2**29`` to test how your code copes with `adafruit_ticks.ticks_ms` wrapping around
+        """
+        self._time = start_ms / 1000
+        super().__init__(_VirtualSelector(self, selectors.DefaultSelector()))
+
+    def time(self) -> float:
+        """
+        :return: the virtual time in seconds
+        """
+        return self._time
+
+    def busy(self, seconds: float):
+        """
+        Pretend to do blocking work: move the clock on without letting any other task run.
+        Call this from a coroutine to simulate one that hogs the event loop.
+
+        :param float seconds: how long the work takes
+        """
+        self._time += seconds
+
+    def ticks_ms(self) -> int:
+        """
+        The virtual time in milliseconds, wrapping around in the same way as
+        `adafruit_ticks.ticks_ms`. Pass this as the ``clock`` of a button.
+        """
+        return round(self._time * 1000) % _TICKS_PERIOD
+
+
+def run_virtual(coro, *, start_ms: int = 0):
+    """
+    Run a coroutine to completion on a new `VirtualTimeLoop`, like `asyncio.run`
+
+    :param coro: The coroutine to run. It can find the loop's clock with
+      ``asyncio.get_running_loop().ticks_ms``
+    :param int start_ms: the time to start at, in milliseconds
+    :return: what the coroutine returned
+    """
+    loop = VirtualTimeLoop(start_ms)
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+class _ScriptedEvents:
+    def __init__(self, clock, edges):
+        self._clock = clock
+        self._edges = edges
+        self._index = 0
+
+    def get_into(self, event) -> bool:
+        """Store the next event in ``event`` if the clock has reached it"""
+        if self._index >= len(self._edges):
+            return False
+        timestamp, key_number, pressed = self._edges[self._index]
+        if ticks_diff(self._clock(), timestamp) < 0:
+            return False
+        self._index += 1
+        # same as keypad.EventQueue.get_into in Blinka
+        # pylint: disable=protected-access
+        event._key_number = key_number
+        event._pressed = pressed
+        event.timestamp = timestamp
+        return True
+
+    def clear(self):
+        """Drop any events that have not been reported yet"""
+        self._index = len(self._edges)
+
+    def __len__(self):
+        return len(self._edges) - self._index
+
+
+class ScriptedKeys:
+    """
+    A stand in for `keypad.Keys` or `keypad.KeyMatrix` that reports a scripted trace of key
+    presses and releases once the clock reaches each one. Each event is given its scripted
+    ``timestamp``, as `keypad` does on CircuitPython. Patch ``async_button.keypad.Keys``
+    to return this, or pass it straight to `async_button.ButtonMatrix`.
+    """
+
+    def __init__(
+        self,
+        clock: Callable[[], int],
+        trace: Iterable[Union[Tuple[int, bool], Tuple[int, int, bool]]],
+        *,
+        key_count: int = 1,
+    ):
+        """
+        :param clock: Function returning the current time in milliseconds, e.g.
+          `VirtualTimeLoop.ticks_ms`
+        :param trace: ``(timestamp, pressed)`` pairs for key 0, or
+          ``(timestamp, key_number, pressed)`` for any key, in time order
+        :param int key_count: Number of keys
+        """
+        edges = []
+        for edge in trace:
+            if len(edge) == 2:
+                edge = (edge[0], 0, edge[1])
+            edges.append(edge)
+        self.key_count = key_count
+        #: Reports the scripted events, like `keypad.EventQueue`
+        self.events = _ScriptedEvents(clock, edges)
+
+    def deinit(self):
+        """Does nothing, for compatibility with `keypad.Keys`"""
+
+
+def fuzz_trace(
+    rng: random.Random,
+    edges: int,
+    *,
+    double_ms: int = 500,
+    long_ms: int = 2000,
+    bounce: float = 0.1,
+    near: float = 0.1,
+    min_gap: int = 1,
+) -> Tuple[array, array]:
+    """
+    Make a random stream of alternating presses and releases, starting with a press. Most
+    gaps are typical of a person clicking, but some are contact bounce (a few milliseconds)
+    and some are within a millisecond of ``double_ms`` or ``long_ms``, where a mistake in
+    the click detection is most likely to show.
+
+    :param random.Random rng: Source of randomness, so the stream can be repeated
+    :param int edges: Number of edges to make
+    :param int double_ms: The double click window, in milliseconds
+    :param int long_ms: The long click threshold, in milliseconds
+    :param float bounce: Fraction of gaps that are contact bounce
+    :param float near: Fraction of gaps that are within a millisecond of a threshold
+    :param int min_gap: Shortest gap between edges, in milliseconds. Use at least two polls
+      (41 ms) with the ``"button"`` engine, which only sees one edge per poll.
+    :return: two arrays: the time of each edge in milliseconds, and whether it is a press
+    """
+    # pylint: disable=too-many-arguments
+    timestamps = array("q")
+    pressed = array("b")
+    # randint is several times slower than random, which matters at this many edges
+    uniform = rng.random
+    add_time = timestamps.append
+    add_edge = pressed.append
+    now = 0
+    press_time = 0
+    for index in range(edges):
+        is_press = not index & 1
+        choice = uniform()
+        if choice < bounce:
+            gap = 1 + int(uniform() * 5)
+        elif choice < bounce + near:
+            # just either side of a threshold
+            if is_press:
+                gap = press_time + double_ms + int(uniform() * 3) - 1 - now
+            else:
+                gap = long_ms + int(uniform() * 3) - 1
+        elif choice < bounce + near + 0.05 and not is_press:
+            gap = long_ms + int(uniform() * (long_ms + 1))
+        else:
+            high = double_ms if is_press else double_ms // 2
+            gap = 20 + int(uniform() * (high - 19))
+        now += max(gap, min_gap)
+        if is_press:
+            press_time = now
+        add_time(now)
+        add_edge(is_press)
+    return timestamps, pressed
+
+
+class _EventArrays:
+    """
+    The output of `classify_edges` as ``(time, event type)`` pairs, keeping the arrays so
+    that `fuzz` can compare them without making a pair for each event
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, events, times):
+        self.events = events
+        self.times = times
+
+    def __iter__(self):
+        return zip(self.times.tolist(), self.events.tolist())
+
+
+def _reference_engine(timestamps, pressed, end, **kwargs):
+    events, times = classify_edges(
+        timestamps, pressed, end=end, vectorise=False, **kwargs
+    )
+    return _EventArrays(events, times)
+
+
+def _vectorised_engine(timestamps, pressed, end, **kwargs):
+    try:
+        events, times = classify_edges(
+            timestamps, pressed, end=end, vectorise=True, **kwargs
+        )
+    except ValueError:
+        return None
+    return _EventArrays(events, times)
+
+
+def _classifier_engine(timestamps, pressed, end, **kwargs):
+    # as Button does: deadlines are handled when due, before any later edge
+    classifier = ClickClassifier(**kwargs)
+    result = []
+    append = result.append
+    for timestamp, edge in zip(timestamps, pressed):
+        deadline = classifier.next_deadline
+        while deadline is not None and deadline <= timestamp:
+            fired = classifier.advance(deadline)
+            append((classifier.event_time, fired))
+            deadline = classifier.next_deadline
+        append((timestamp, classifier.update(edge, timestamp)))
+    deadline = classifier.next_deadline
+    while deadline is not None and deadline <= end:
+        fired = classifier.advance(deadline)
+        append((classifier.event_time, fired))
+        deadline = classifier.next_deadline
+    return result
+
+
+def _matrix_engine(timestamps, pressed, end, **kwargs):
+    profile = ClickClassifier(**kwargs)
+    if profile.hold_thresholds:
+        return None
+    classifier = KeyMatrixClassifier(1, profiles=(profile,))
+    double_ms = int(profile.double_click_max_duration * 1000)
+    long_ms = int(profile.long_click_min_duration * 1000)
+    result = []
+    append = result.append
+    # only whether a deadline has passed is kept, so check each one as it falls due: a held
+    # back click fires when the window closes, a long click just after its threshold
+    due = ()
+    for timestamp, edge in zip(timestamps, pressed):
+        for check, event_time in due:
+            if check > timestamp:
+                break
+            if classifier.advance(check):
+                append((event_time, classifier.fired_events[0]))
+        append((timestamp, classifier.update(0, edge, timestamp)))
+        if edge:
+            due = sorted(
+                (
+                    (timestamp + double_ms, timestamp + double_ms),
+                    (timestamp + long_ms + 1, timestamp + long_ms),
+                )
+            )
+    for check, event_time in due:
+        if check <= end and classifier.advance(check):
+            append((event_time, classifier.fired_events[0]))
+    return result
+
+
+class _ListSink:
+    def __init__(self):
+        self.records = []
+
+    def add(self, _source, record):
+        """Keep the events and time of a record"""
+        self.records.append((record.timestamp, record.events))
+
+    def service(self, now):
+        """Does nothing"""
+
+    def flush(self):
+        """Does nothing"""
+
+
+def _button_engine(timestamps, pressed, end, **kwargs):
+    async def run():
+        loop = asyncio.get_running_loop()
+        keys = ScriptedKeys(loop.ticks_ms, zip(timestamps, pressed))
+        sink = _ListSink()
+        with patch("async_button.keypad.Keys", return_value=keys):
+            button = Button(0, True, clock=loop.ticks_ms, sink=sink, **kwargs)
+            await asyncio.sleep((end + 100) / 1000)
+            button.deinit()
+        return sink.records
+
+    return run_virtual(run())
+
+
+#: The click detection engines that `fuzz` can compare. Each is called with the timestamps
+#: and presses of a stream, the end time and the click settings, and returns ``(time,
+#: events)`` pairs, or ``None`` if it cannot handle those settings. ``"button"`` runs a real
+#: `async_button.Button` in virtual time, so is much slower than the others.
+ENGINES = {
+    "reference": _reference_engine,
+    "vectorised": _vectorised_engine,
+    "classifier": _classifier_engine,
+    "matrix": _matrix_engine,
+    "button": _button_engine,
+}
+
+_EVENT_NAMES = {
+    Button.PRESSED: "PRESSED",
+    Button.RELEASED: "RELEASED",
+    Button.SINGLE: "SINGLE",
+    Button.DOUBLE: "DOUBLE",
+    Button.TRIPLE: "TRIPLE",
+    Button.LONG: "LONG",
+}
+
+
+def _expand(pairs) -> List[Tuple[int, int]]:
+    """One ``(time, event type)`` per event fired, sorted"""
+    result = []
+    append = result.append
+    for timestamp, events in pairs:
+        if not events & (events - 1):
+            if events:
+                append((timestamp, events))
+            continue
+        bit = 1
+        while bit <= events:
+            if events & bit:
+                append((timestamp, bit))
+            bit <<= 1
+    result.sort()
+    return result
+
+
+def _event_rows(result):
+    """
+    One ``(time, event type)`` row per event fired, sorted: an array with a row for each
+    if NumPy is available, so that outputs of `classify_edges` are compared without making
+    a pair for each event, otherwise a list
+    """
+    if np is None:
+        return _expand(result)
+    if isinstance(result, _EventArrays):
+        # classify_edges gives one event type per entry, so only the order can differ
+        rows = np.column_stack(
+            (
+                np.asarray(result.times, dtype=np.int64),
+                np.asarray(result.events, dtype=np.int64),
+            )
+        )
+        return rows[np.lexsort((rows[:, 1], rows[:, 0]))]
+    return np.array(_expand(result), dtype=np.int64).reshape(-1, 2)
+
+
+def _first_difference(expected, actual) -> Optional[int]:
+    """Position of the first row that differs between two `_event_rows`, or ``None``"""
+    count = min(len(expected), len(actual))
+    if np is None:
+        if expected == actual:
+            return None
+        index = 0
+        while index < count and actual[index] == expected[index]:
+            index += 1
+        return index
+    differs = np.flatnonzero(np.any(expected[:count] != actual[:count], axis=1))
+    if len(differs):
+        return int(differs[0])
+    return None if len(expected) == len(actual) else count
+
+
+def _row(rows, index) -> Optional[Tuple[int, int]]:
+    if index >= len(rows):
+        return None
+    return tuple(int(value) for value in rows[index])
+
+
+class Divergence:
+    """
+    The first place where an engine disagreed with the reference engine in `fuzz`
+    """
+
+    # pylint: disable=too-few-public-methods,too-many-arguments
+
+    def __init__(self, engine, index, expected, actual, timestamps, pressed, settings):
+        #: Name of the engine that disagreed
+        self.engine = engine
+        #: Position of the first differing event, in time order
+        self.index = index
+        #: ``(time, event type)`` from the reference engine, or ``None`` if it had no more
+        self.expected = expected
+        #: ``(time, event type)`` from ``engine``, or ``None`` if it had no more
+        self.actual = actual
+        #: The stream of edges that showed the difference
+        self.timestamps = timestamps
+        #: Whether each edge was a press
+        self.pressed = pressed
+        #: The click settings used
+        self.settings = settings
+
+    @staticmethod
+    def _describe(event):
+        if event is None:
+            return "nothing"
+        return "{} at {}".format(_EVENT_NAMES.get(event[1], event[1]), event[0])
+
+    def __str__(self):
+        near = self.expected or self.actual
+        edges = [
+            "{}{}".format("v" if edge else "^", timestamp)
+            for timestamp, edge in zip(self.timestamps, self.pressed)
+            if abs(timestamp - near[0]) < 5000
+        ]
+        return "{} gave {} where reference gave {} (event {}, {}), edges: {}".format(
+            self.engine,
+            self._describe(self.actual),
+            self._describe(self.expected),
+            self.index,
+            self.settings,
+            " ".join(edges),
+        )
+
+
+def compare_engines(
+    timestamps: Sequence[int],
+    pressed: Sequence[bool],
+    *,
+    engines: Optional[Sequence[str]] = None,
+    **kwargs,
+) -> Optional[Divergence]:
+    """
+    Run one stream of edges through the reference engine and each of ``engines``, and
+    compare the events and their times
+
+    :param Sequence[int] timestamps: Time of each edge in milliseconds
+    :param Sequence[bool] pressed: Whether each edge is a press
+    :param Sequence[str] engines: Names from `ENGINES` to compare with ``"reference"``.
+      ``None`` (the default) compares with ``"vectorised"``, the fastest, or with
+      ``"classifier"`` if that cannot handle the edges or settings.
+    :param kwargs: Click settings, as for `async_button.Button`
+    :return: The first difference found, or ``None`` if the engines agree
+    """
+    settings = ClickClassifier(**kwargs)
+    end = timestamps[-1] + int(
+        max(settings.long_click_min_duration, settings.double_click_max_duration) * 1000
+    )
+    expected = _event_rows(_reference_engine(timestamps, pressed, end, **kwargs))
+    for name in engines or ("vectorised", "classifier"):
+        result = ENGINES[name](timestamps, pressed, end, **kwargs)
+        if result is None:
+            continue
+        actual = _event_rows(result)
+        index = _first_difference(expected, actual)
+        if index is not None:
+            return Divergence(
+                name,
+                index,
+                _row(expected, index),
+                _row(actual, index),
+                timestamps,
+                pressed,
+                kwargs,
+            )
+        if engines is None:
+            # the default is just the first engine that could run
+            break
+    return None
+
+
+def fuzz(
+    seed: int = 0,
+    *,
+    edges: int = 100000,
+    chunk: int = 1000,
+    engines: Optional[Sequence[str]] = None,
+    bounce: float = 0.1,
+    near: float = 0.1,
+    min_gap: int = 1,
+    **kwargs,
+) -> Optional[Divergence]:
+    """
+    Compare click detection engines on random streams of edges (see `fuzz_trace`), a
+    ``chunk`` at a time so that any difference is reported with a short stream.
+
+    :param int seed: Seed for the random streams; the same seed gives the same streams
+    :param int edges: Total number of edges to try
+    :param int chunk: Number of edges in each stream
+    :param Sequence[str] engines: Names from `ENGINES` to compare with ``"reference"``, as
+      for `compare_engines`. The default handles a couple of hundred thousand edges per
+      second; each of the other engines takes about as long again as the reference.
+    :param float bounce: Fraction of gaps that are contact bounce
+    :param float near: Fraction of gaps that are within a millisecond of a threshold
+    :param int min_gap: Shortest gap between edges, in milliseconds
+    :param kwargs: Click settings, as for `async_button.Button`
+    :return: The first difference found, or ``None`` if the engines agree
+    :example:
+      .. code-block:: python
+
+        >>> for settings in ({}, {"exclusive_clicks": True, "triple_click_enable": True}):
+        >>>     divergence = fuzz(1, long_click_enable=True, **settings)
+        >>>     if divergence:
+        >>>         print(divergence)
+    """
+    # pylint: disable=too-many-arguments
+    rng = random.Random(seed)
+    settings = ClickClassifier(**kwargs)
+    double_ms = int(settings.double_click_max_duration * 1000)
+    long_ms = int(settings.long_click_min_duration * 1000)
+    for _ in range(0, edges, chunk):
+        timestamps, pressed = fuzz_trace(
+            rng,
+            chunk,
+            double_ms=double_ms,
+            long_ms=long_ms,
+            bounce=bounce,
+            near=near,
+            min_gap=min_gap,
+        )
+        divergence = compare_engines(timestamps, pressed, engines=engines, **kwargs)
+        if divergence is not None:
+            return divergence
+    return None
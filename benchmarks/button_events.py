@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Measure what `Button` saves by only creating the `asyncio.Event` objects that are waited for.
+
+Run on a host computer from the top directory with ``python -m benchmarks.button_events``.
+Compares buttons nobody waits on, buttons waited on for clicks only, and buttons with all six
+event types subscribed (which is what every button used to allocate), both for heap use and
+for the time taken to dispatch each edge.
+"""
+import asyncio
+import time
+from functools import partial
+from unittest.mock import patch
+
+from benchmarks.matrix_memory import FakeKeys, measure
+
+# pylint: disable=wrong-import-position,wrong-import-order
+import async_button
+
+Button = async_button.Button
+SUBSCRIPTIONS = (
+    ("no listeners", ()),
+    ("clicks only", Button.ANY_CLICK),
+    ("all events", Button.ALL_EVENTS),
+)
+
+
+def build(button_count, event_types):
+    """Create buttons, each waited on for ``event_types``"""
+    buttons = [Button(i, False) for i in range(button_count)]
+    for button in buttons:
+        for event_type in event_types:
+            button._event(event_type)  # pylint: disable=protected-access
+    return buttons
+
+
+def time_trigger(button, repeats):
+    """Return the mean time taken to dispatch one edge"""
+    # alternate press and release | single click, as a real button would
+    edges = (Button.PRESSED, Button.RELEASED | Button.SINGLE) * (repeats // 2)
+    trigger = button._trigger  # pylint: disable=protected-access
+    start = time.perf_counter()
+    for fired in edges:
+        trigger(fired)
+    return (time.perf_counter() - start) / len(edges)
+
+
+async def main(button_count=30, repeats=200000):
+    """Print heap and dispatch time for each kind of subscription"""
+    with patch("async_button.keypad.Keys", FakeKeys):
+        for name, event_types in SUBSCRIPTIONS:
+            used, buttons = measure(partial(build, button_count, event_types))
+            per_edge = time_trigger(buttons[0], repeats)
+            print(
+                "{:12s}: {:7d} bytes for {} buttons, {:5.2f} us per edge".format(
+                    name, used, button_count, per_edge * 1e6
+                )
+            )
+            await asyncio.sleep(0)
+            for button in buttons:
+                button.deinit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
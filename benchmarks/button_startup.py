@@ -0,0 +1,113 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Compare starting 40 buttons one at a time inside the event loop with declaring them up
+front (``start=False``) and starting them as a group with `MultiButton.start`.
+
+Run on a host computer from the top directory with ``python -m benchmarks.button_startup``.
+For each, this reports the time from entering the event loop until every button has
+polled its pin once (boot to first input), and the peak heap while doing so.
+"""
+import asyncio
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from benchmarks.matrix_memory import FakeKeys
+
+# pylint: disable=wrong-import-position,wrong-import-order
+import async_button
+
+BUTTON_COUNT = 40
+
+
+class CountingKeys(FakeKeys):
+    """Counts how many scanners have been polled at least once"""
+
+    polled = set()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.events = self
+
+    def get_into(self, _event):
+        """Note that this scanner has been polled"""
+        CountingKeys.polled.add(id(self))
+        return False
+
+
+async def first_input(count):
+    """Wait until ``count`` scanners have been polled"""
+    while len(CountingKeys.polled) < count:
+        await asyncio.sleep(0)
+
+
+async def eager():
+    """Create and start every button inside the event loop"""
+    buttons = [async_button.Button(i, False) for i in range(BUTTON_COUNT)]
+    await first_input(BUTTON_COUNT)
+    return buttons
+
+
+def declare():
+    """Declare every button without starting it, as at boot time"""
+    return async_button.MultiButton(
+        **{
+            "b{}".format(i): async_button.Button(i, False, start=False)
+            for i in range(BUTTON_COUNT)
+        }
+    )
+
+
+async def deferred(group):
+    """Start a group of declared buttons"""
+    group.start()
+    await first_input(BUTTON_COUNT)
+    return list(group.buttons.values())
+
+
+def run(name, coro):
+    """Run ``coro`` in a new event loop and print its timing and peak heap"""
+    CountingKeys.polled.clear()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    asyncio.run(_run_and_deinit(coro))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    print(
+        "{:24s}: {:6.2f} ms to first input, peak heap {:7d} bytes".format(
+            name, elapsed * 1000, peak
+        )
+    )
+
+
+async def _run_and_deinit(coro):
+    """Run ``coro`` and deinit the buttons it returns"""
+    buttons = await coro
+    for button in buttons:
+        button.deinit()
+
+
+def main():
+    """Print the startup cost of each approach"""
+    with patch("async_button.keypad.Keys", CountingKeys):
+        run("created in loop", eager())
+        tracemalloc.start()
+        start = time.perf_counter()
+        group = declare()
+        declared = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(
+            "{:24s}: {:6.2f} ms, {:7d} bytes held before the loop starts".format(
+                "declared at boot", (time.perf_counter() - start) * 1000, declared
+            )
+        )
+        run("declared, group start", deferred(group))
+
+
+if __name__ == "__main__":
+    main()
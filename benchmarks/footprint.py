@@ -0,0 +1,135 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Report the RAM used by `async_button_core` and `async_button`: after import, per `Button`,
+and per `Button.wait` or `MultiButton.wait` in progress.
+
+Run on a host computer from the top directory with ``python -m benchmarks.footprint``.
+Memory is measured like ``gc.mem_alloc`` on a board, as the bytes in use before and after
+each step, with `tracemalloc` standing in on CPython. Each import is measured in a fresh
+interpreter, with Blinka and `typing` already imported so that only this library is counted.
+CPython objects are larger than CircuitPython ones, so compare the numbers with each other
+rather than with a board's free memory. The import cost of `async_button` as first released,
+before the core was split out, is printed for comparison.
+"""
+import asyncio
+import gc
+import subprocess
+import sys
+import tracemalloc
+from unittest.mock import patch
+
+from benchmarks.matrix_memory import FakeKeys
+
+# pylint: disable=wrong-import-position,wrong-import-order
+import async_button
+import async_button_core
+
+#: Bytes used by importing the first release of ``async_button.py``, measured by
+#: `import_cost` with CPython 3.11
+BASELINE_IMPORT = 48648
+
+IMPORT_PROBE = """
+import gc, sys, tracemalloc, typing
+from unittest.mock import MagicMock
+sys.modules.setdefault("countio", MagicMock())
+import adafruit_ticks, digitalio, keypad, microcontroller
+try:
+    import asyncio
+    import numpy
+except ImportError:
+    pass
+gc.collect()
+tracemalloc.start()
+before = tracemalloc.get_traced_memory()[0]
+import {module}
+gc.collect()
+print(tracemalloc.get_traced_memory()[0] - before)
+"""
+
+
+def mem_alloc():
+    """Bytes in use, like ``gc.mem_alloc``"""
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def import_cost(module):
+    """Bytes used by importing ``module`` into a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE.format(module=module)],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return int(result.stdout.split()[-1])
+
+
+async def wait_cost(count, make_wait):
+    """Bytes used per coroutine made by ``make_wait``, while ``count`` are waiting"""
+    before = mem_alloc()
+    tasks = [asyncio.create_task(make_wait()) for _ in range(count)]
+    await asyncio.sleep(0)
+    used = mem_alloc() - before
+    for task in tasks:
+        task.cancel()
+    await asyncio.sleep(0)
+    return used / count
+
+
+async def measure_objects(count=50):
+    """Print the bytes used per button and per wait in progress"""
+    tracemalloc.start()
+    with patch("async_button.keypad.Keys", FakeKeys):
+        for name, button_class in (
+            ("core Button", async_button_core.Button),
+            ("Button", async_button.Button),
+        ):
+            # the first button of each class creates shared objects, so measure later ones
+            button_class(count, False).deinit()
+            await asyncio.sleep(0)
+            before = mem_alloc()
+            buttons = [button_class(i, False) for i in range(count)]
+            await asyncio.sleep(0)
+            print(
+                "per {:22s}{:6.0f}".format(name + ":", (mem_alloc() - before) / count)
+            )
+            if button_class is async_button_core.Button:
+                for button in buttons:
+                    button.deinit()
+                buttons = None
+                await asyncio.sleep(0)
+        button = buttons[0]
+        multi = async_button.MultiButton(a=buttons[0], b=buttons[1])
+        waits = (
+            ("Button.wait(SINGLE)", lambda: button.wait(button.SINGLE)),
+            ("Button.wait(ANY_CLICK)", lambda: button.wait(button.ANY_CLICK)),
+            (
+                "MultiButton.wait(a, b)",
+                lambda: multi.wait(a=button.SINGLE, b=button.DOUBLE),
+            ),
+        )
+        for name, make_wait in waits:
+            # first wait creates the shared asyncio.Event, so measure later ones
+            await wait_cost(1, make_wait)
+            print(
+                "per {:22s}{:6.0f}".format(
+                    name + ":", await wait_cost(count, make_wait)
+                )
+            )
+        for button in buttons:
+            button.deinit()
+    tracemalloc.stop()
+
+
+def main():
+    """Print the footprint report"""
+    print("import {:19s}{:6d}".format("baseline:", BASELINE_IMPORT))
+    for module in ("async_button_core", "async_button"):
+        print("import {:19s}{:6d}".format(module + ":", import_cost(module)))
+    asyncio.run(measure_objects())
+
+
+if __name__ == "__main__":
+    main()
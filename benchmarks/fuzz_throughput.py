@@ -0,0 +1,55 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Measure how many edges per second each click detection engine in
+`async_button_testing.ENGINES` handles, and how fast `async_button_testing.fuzz` compares
+them, both with its default engine and with all of them.
+
+Run on a host computer from the top directory with ``python -m benchmarks.fuzz_throughput``.
+"""
+import random
+import time
+
+# pylint: disable=wrong-import-position,wrong-import-order
+from async_button_testing import ENGINES, fuzz, fuzz_trace
+
+EDGES = 200000
+SETTINGS = {"long_click_enable": True, "triple_click_enable": True}
+
+
+def main():
+    """Print edges per second for each engine, and for the whole comparison"""
+    start = time.perf_counter()
+    timestamps, pressed = fuzz_trace(random.Random(1), EDGES)
+    print(
+        "{:12s}: {:9.0f} edges/s".format(
+            "generate", EDGES / (time.perf_counter() - start)
+        )
+    )
+    end = timestamps[-1] + 3000
+    for name, engine in ENGINES.items():
+        if name == "button":
+            continue
+        start = time.perf_counter()
+        list(engine(timestamps, pressed, end, **SETTINGS))
+        print(
+            "{:12s}: {:9.0f} edges/s".format(
+                name, EDGES / (time.perf_counter() - start)
+            )
+        )
+    for label, engines in (
+        ("default", None),
+        ("all", ("vectorised", "classifier", "matrix")),
+    ):
+        start = time.perf_counter()
+        fuzz(1, edges=EDGES, engines=engines, **SETTINGS)
+        print(
+            "{:12s}: {:9.0f} edges/s through {} engines".format(
+                "fuzz", EDGES / (time.perf_counter() - start), label
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
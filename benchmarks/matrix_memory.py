@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Compare the heap used by one `Button` per key with a single `ButtonMatrix`.
+
+Run on a host computer from the top directory with ``python -m benchmarks.matrix_memory``.
+The scanner is replaced by a minimal stand-in, so only the memory used by this library is
+counted.
+"""
+import asyncio
+import gc
+import sys
+import tracemalloc
+from unittest.mock import patch, MagicMock
+
+sys.modules.setdefault("countio", MagicMock())
+
+# pylint: disable=wrong-import-position
+import async_button
+
+
+class FakeEvents:
+    """Stand in for keypad.EventQueue that never has any events"""
+
+    # pylint: disable=too-few-public-methods
+    @staticmethod
+    def get_into(_event):
+        """Report that there are no events"""
+        return False
+
+
+class FakeKeys:
+    """Stand in for keypad.Keys / keypad.KeyMatrix"""
+
+    def __init__(self, *_args, key_count=1, **_kwargs):
+        self.key_count = key_count
+        self.events = FakeEvents()
+
+    def deinit(self):
+        """Nothing to release"""
+
+
+def measure(build):
+    """Return the heap allocated and kept by ``build()``, and its result"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used, result
+
+
+async def main(key_count=100):
+    """Print the heap used for ``key_count`` keys by each approach"""
+    with patch("async_button.keypad.Keys", FakeKeys):
+        used, buttons = measure(
+            lambda: [async_button.Button(i, False) for i in range(key_count)]
+        )
+        print(
+            "{} x Button:        {:8d} bytes ({:.0f} per key)".format(
+                key_count, used, used / key_count
+            )
+        )
+        await asyncio.sleep(0)
+        for button in buttons:
+            button.deinit()
+        del buttons
+
+    used, matrix = measure(
+        lambda: async_button.ButtonMatrix(FakeKeys(key_count=key_count))
+    )
+    print(
+        "1 x ButtonMatrix:    {:8d} bytes ({:.0f} per key)".format(
+            used, used / key_count
+        )
+    )
+    await asyncio.sleep(0)
+    matrix.deinit()
+
+    used, _ = measure(
+        lambda: [async_button.ClickClassifier() for _ in range(key_count)]
+    )
+    print(
+        "{} x ClickClassifier: {:6d} bytes ({:.0f} per key)".format(
+            key_count, used, used / key_count
+        )
+    )
+    used, _ = measure(lambda: async_button.KeyMatrixClassifier(key_count))
+    print(
+        "1 x KeyMatrixClassifier: {:4d} bytes ({:.0f} per key)".format(
+            used, used / key_count
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
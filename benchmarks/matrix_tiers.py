@@ -0,0 +1,101 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Show how long a critical key on a busy `ButtonMatrix` takes to be reported, with and without
+priority tiers.
+
+Run on a host computer from the top directory with ``python -m benchmarks.matrix_tiers``.
+Each run plays 10 s of virtual time in which key 0 (the critical key) is pressed every 250 ms,
+while the other 31 keys are pressed at random, and every event on them takes its handler 6 ms
+of (virtual) CPU time. This reports the worst delay between each key being pressed and its
+waiter being woken, and `ButtonMatrix.tier_max_latency` for each tier.
+"""
+import asyncio
+import random
+
+# pylint: disable=wrong-import-position,wrong-import-order
+from async_button import Button, ButtonMatrix
+from async_button_testing import ScriptedKeys, run_virtual
+
+KEY_COUNT = 32
+RUN_MS = 10000
+CRITICAL_EVERY_MS = 250
+HANDLER_MS = 6
+CONFIGS = (
+    ("1 tier, 20 ms", {}),
+    ("1 tier, 5 ms", {"interval": 0.005}),
+    (
+        "2 tiers, 5/50 ms",
+        {
+            "key_tiers": [0] + [1] * (KEY_COUNT - 1),
+            "tier_intervals": (0.005, 0.05),
+        },
+    ),
+)
+
+
+def make_trace(seed):
+    """Return a time ordered trace of ``(timestamp, key, pressed)`` for every key"""
+    rng = random.Random(seed)
+    trace = []
+    for press in range(100, RUN_MS, CRITICAL_EVERY_MS):
+        trace += [(press, 0, True), (press + 50, 0, False)]
+    for key in range(1, KEY_COUNT):
+        now = rng.randint(0, 200)
+        while now < RUN_MS:
+            release = now + rng.randint(30, 150)
+            trace += [(now, key, True), (release, key, False)]
+            now = release + rng.randint(30, 300)
+    trace.sort()
+    return trace
+
+
+async def run(settings, trace):
+    """Return the worst critical and other key delays, and the tier latencies"""
+    loop = asyncio.get_running_loop()
+    matrix = ButtonMatrix(
+        ScriptedKeys(loop.ticks_ms, trace, key_count=KEY_COUNT),
+        clock=loop.ticks_ms,
+        **settings
+    )
+    press_times = {}
+    for timestamp, key, pressed in trace:
+        if pressed:
+            press_times.setdefault(key, []).append(timestamp)
+    worst = [0, 0]
+
+    async def watch(keys, index, handler_ms):
+        seen = {key: 0 for key in keys}
+        while True:
+            key, _ = await matrix.wait(Button.PRESSED, keys=keys)
+            delay = loop.ticks_ms() - press_times[key][seen[key]]
+            seen[key] += 1
+            worst[index] = max(worst[index], delay)
+            loop.busy(handler_ms / 1000)
+
+    tasks = [
+        asyncio.create_task(watch((0,), 0, 0)),
+        asyncio.create_task(watch(range(1, KEY_COUNT), 1, HANDLER_MS)),
+    ]
+    await asyncio.sleep(RUN_MS / 1000 + 1)
+    for task in tasks:
+        task.cancel()
+    matrix.deinit()
+    return worst, list(matrix.tier_max_latency)
+
+
+def main():
+    """Print the worst delays for each configuration"""
+    trace = make_trace(1)
+    for name, settings in CONFIGS:
+        worst, tiers = run_virtual(run(settings, trace))
+        print(
+            "{:17s}: critical key {:4d} ms, other keys {:4d} ms, tier_max_latency {}".format(
+                name, worst[0], worst[1], tiers
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Compare waiting for the first of several `SimpleButton` objects with one `pressed` task per
+button against one `SimpleButton.wait_any` loop.
+
+Run on a host computer from the top directory with ``python -m benchmarks.simple_wait_any``.
+Each run waits in virtual time for 10 s, with every button checked every 50 ms, until the
+last button is pressed. This reports how many times a coroutine woke up to check its pins,
+and the host CPU time taken.
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# pylint: disable=wrong-import-position,wrong-import-order
+import async_button
+from async_button_testing import run_virtual
+
+PRESS_MS = 10000
+BUTTON_COUNTS = (1, 4, 16, 64)
+
+
+class FakeCounter:
+    """A `countio.Counter` for pin ``pin``, which counts one edge once the last pin is pressed"""
+
+    last_pin = None
+
+    def __init__(self, pin, *, edge, pull):
+        # pylint: disable=unused-argument
+        self.fires = pin == FakeCounter.last_pin
+        self.clock = asyncio.get_running_loop().ticks_ms
+
+    @property
+    def count(self):
+        """Edges counted so far"""
+        return int(self.fires and self.clock() >= PRESS_MS)
+
+    def deinit(self):
+        """Release the pin"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
+
+
+class CountingAsyncio:
+    """Stands in for `asyncio` in `async_button`, counting calls to ``sleep``"""
+
+    def __init__(self):
+        self.wakeups = 0
+
+    async def sleep(self, delay):
+        """Count this wakeup, then sleep"""
+        self.wakeups += 1
+        await asyncio.sleep(delay)
+
+
+async def separate(buttons):
+    """Wait for the first of one `SimpleButton.pressed` task per button"""
+    tasks = [asyncio.create_task(button.pressed()) for button in buttons]
+    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    for task in tasks:
+        task.cancel()
+
+
+async def grouped(buttons):
+    """Wait for the first button with `SimpleButton.wait_any`"""
+    await async_button.SimpleButton.wait_any(buttons)
+
+
+def run(strategy, count):
+    """Return the wakeups and CPU seconds taken by ``strategy`` with ``count`` buttons"""
+    counting = CountingAsyncio()
+    countio = SimpleNamespace(Counter=FakeCounter, Edge=MagicMock())
+    buttons = [async_button.SimpleButton(i, False) for i in range(count)]
+    FakeCounter.last_pin = count - 1
+    with patch("async_button_core.countio", countio), patch(
+        "async_button_core.asyncio", counting
+    ), patch("async_button.countio", countio), patch("async_button.asyncio", counting):
+        start = time.process_time()
+        run_virtual(strategy(buttons))
+        elapsed = time.process_time() - start
+    return counting.wakeups, elapsed
+
+
+def main():
+    """Print wakeups and CPU time for each number of buttons"""
+    for count in BUTTON_COUNTS:
+        for name, strategy in (("separate", separate), ("wait_any", grouped)):
+            wakeups, elapsed = run(strategy, count)
+            print(
+                "{:3d} buttons, {:8s}: {:6d} wakeups, {:7.2f} ms CPU".format(
+                    count, name, wakeups, elapsed * 1000
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,9 @@ render_using_wavedrompy = True
 autodoc_mock_imports = [
     "microcontroller",
     "countio",
+    "rotaryio",
+    "touchio",
+    "analogio",
     "keypad",
     "asyncio",
     "adafruit_ticks",
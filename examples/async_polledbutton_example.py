@@ -0,0 +1,30 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: Unlicense
+import time
+
+import board
+
+from async_button import PolledButton
+
+CLICK_NAMES = {
+    PolledButton.SINGLE: "Single click",
+    PolledButton.DOUBLE: "Double click",
+    PolledButton.TRIPLE: "Triple click",
+    PolledButton.LONG: "Long click",
+}
+
+# PolledButton does not need asyncio, so can be used in a simple loop
+button = PolledButton(
+    board.D5,
+    value_when_pressed=False,
+    triple_click_enable=True,
+    long_click_enable=True,
+)
+
+while True:
+    events = button.poll()
+    for click, name in CLICK_NAMES.items():
+        if events & click:
+            print(f"{name} seen")
+    time.sleep(button.interval)
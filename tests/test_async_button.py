@@ -1,6 +1,7 @@
 # SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
 #
 # SPDX-License-Identifier: MIT
+import io
 from unittest import IsolatedAsyncioTestCase
 from unittest.mock import patch, MagicMock
 import sys
@@ -11,21 +12,18 @@ import keypad
 
 sys.modules["countio"] = MagicMock()
 
-import async_button  # pylint: disable=wrong-import-position
-
-
-# this class sets the sleep interval in the monitor task to zero so tests finish quickly
-class FastButton(async_button.Button):
-    def __init__(self, pin, value_when_pressed, *, interval=0, **kwargs):
-        super().__init__(
-            pin, value_when_pressed=value_when_pressed, interval=interval, **kwargs
-        )
+# pylint: disable=wrong-import-position
+import async_button
+import async_button_core
+from async_button_analysis import decode_events
 
 
 class TestButton(IsolatedAsyncioTestCase):
     # pylint: disable=invalid-name, too-many-public-methods
+    button_class = async_button.Button
+
     def setUp(self) -> None:
-        self.patch1 = patch("async_button.ticks_ms", new=self.new_ticks_ms)
+        self.patch1 = patch("async_button_core.ticks_ms", new=self.new_ticks_ms)
         self.patch1.start()
         self.keypad_keys = MagicMock()
         self.patch2 = patch("async_button.keypad.Keys", new=self.keypad_keys)
@@ -48,6 +46,16 @@ class TestButton(IsolatedAsyncioTestCase):
             self.button.deinit()
             await asyncio.sleep(0)
 
+    def fast_button(self, pin, value_when_pressed, *, interval=0, **kwargs):
+        # sets the sleep interval in the monitor task to zero so tests finish quickly
+        return self.button_class(
+            pin, value_when_pressed=value_when_pressed, interval=interval, **kwargs
+        )
+
+    def needs_extras(self):
+        if self.button_class is async_button_core.Button:
+            self.skipTest("only in async_button.Button")
+
     def new_ticks_ms(self) -> float:
         return int(self.time_count * 1000)
 
@@ -79,80 +87,80 @@ class TestButton(IsolatedAsyncioTestCase):
             button_wait.cancel()
 
     async def test_create_active_high(self):
-        self.button = async_button.Button(self.pin, True)
+        self.button = self.button_class(self.pin, True)
         self.keypad_keys.assert_called_once_with(
             (self.pin,), value_when_pressed=True, pull=True, interval=0.02
         )
 
     async def test_create_active_low(self):
-        self.button = async_button.Button(self.pin, False)
+        self.button = self.button_class(self.pin, False)
         self.keypad_keys.assert_called_once_with(
             (self.pin,), value_when_pressed=False, pull=True, interval=0.02
         )
 
     async def test_create_pull_false(self):
-        self.button = async_button.Button(self.pin, True, pull=False)
+        self.button = self.button_class(self.pin, True, pull=False)
         self.keypad_keys.assert_called_once_with(
             (self.pin,), value_when_pressed=True, pull=False, interval=0.02
         )
 
     async def test_create_with_triple_but_no_double_fails(self):
         with self.assertRaises(ValueError):
-            self.button = FastButton(
+            self.button = self.fast_button(
                 self.pin, False, double_click_enable=False, triple_click_enable=True
             )
 
     async def test_button_pressed(self):
-        self.button = FastButton(self.pin, True)
+        self.button = self.fast_button(self.pin, True)
         self.button_timings = [0.10]
         await self.wait_event_with_timeout([async_button.Button.PRESSED])
         self.assertAlmostEqual(self.time_count, 0.10, delta=0.1)
 
     async def test_button_released(self):
-        self.button = FastButton(self.pin, True)
+        self.button = self.fast_button(self.pin, True)
         self.button_timings = [0.10, 0.20]
         await self.wait_event_with_timeout([async_button.Button.RELEASED])
         self.assertAlmostEqual(self.time_count, 0.20, delta=0.1)
 
     async def test_single_click(self):
-        self.button = FastButton(self.pin, True)
+        self.button = self.fast_button(self.pin, True)
         self.button_timings = [0.10, 0.20]
         await self.wait_event_with_timeout([async_button.Button.SINGLE])
         self.assertAlmostEqual(self.time_count, 0.20, delta=0.1)
 
     async def test_single_click_specified_without_list(self):
-        self.button = FastButton(self.pin, True)
+        self.button = self.fast_button(self.pin, True)
         self.button_timings = [0.10, 0.20]
         await self.wait_event_with_timeout(async_button.Button.SINGLE)
         self.assertAlmostEqual(self.time_count, 0.20, delta=0.1)
 
     async def test_double_click(self):
-        self.button = FastButton(self.pin, True)
+        self.button = self.fast_button(self.pin, True)
         self.button_timings = [0.10, 0.30, 0.5, 0.7]
         await self.wait_event_with_timeout([async_button.Button.DOUBLE])
         self.assertAlmostEqual(self.time_count, 0.70, delta=0.1)
 
     async def test_double_click_not_when_disabled(self):
-        self.button = FastButton(self.pin, True, double_click_enable=False)
+        self.button = self.fast_button(self.pin, True, double_click_enable=False)
         self.button_timings = [0.10, 0.30, 0.5, 0.7]
         with self.assertRaises(TimeoutError):
             await self.wait_event_with_timeout([async_button.Button.DOUBLE])
 
     async def test_double_click_not_when_too_slow(self):
-        self.button = FastButton(self.pin, True)
+        self.button = self.fast_button(self.pin, True)
         self.button_timings = [0.10, 0.30, 1.1, 1.3]
         with self.assertRaises(TimeoutError):
             await self.wait_event_with_timeout([async_button.Button.DOUBLE])
 
     async def test_double_click_goes_back_to_single_after_gap(self):
-        self.button = FastButton(self.pin, True)
+        self.button = self.fast_button(self.pin, True)
         self.button_timings = [0.10, 0.30, 0.5, 0.7, 1.5, 1.7]
         await self.wait_event_with_timeout([async_button.Button.DOUBLE])
         self.assertAlmostEqual(self.time_count, 0.70, delta=0.1)
         await self.wait_event_with_timeout([async_button.Button.SINGLE])
 
     async def test_two_singles_when_too_slow(self):
-        self.button = FastButton(
+        self.button = self.fast_button(
             self.pin,
             True,
         )
@@ -161,37 +169,37 @@ class TestButton(IsolatedAsyncioTestCase):
         await self.wait_event_with_timeout([async_button.Button.SINGLE])
 
     async def test_double_click_not_when_too_slow_with_different_time(self):
-        self.button = FastButton(self.pin, True, double_click_max_duration=0.1)
+        self.button = self.fast_button(self.pin, True, double_click_max_duration=0.1)
         self.button_timings = [0.10, 0.30, 0.5, 0.7]
         with self.assertRaises(TimeoutError):
             await self.wait_event_with_timeout([async_button.Button.DOUBLE])
 
     async def test_triple_click(self):
-        self.button = FastButton(self.pin, True, triple_click_enable=True)
+        self.button = self.fast_button(self.pin, True, triple_click_enable=True)
         self.button_timings = [0.10, 0.30, 0.5, 0.7, 0.9, 1.1]
         await self.wait_event_with_timeout([async_button.Button.TRIPLE])
         self.assertAlmostEqual(self.time_count, 1.1, delta=0.1)
 
     async def test_triple_click_not_when_disabled(self):
-        self.button = FastButton(self.pin, True)
+        self.button = self.fast_button(self.pin, True)
         self.button_timings = [0.10, 0.30, 0.5, 0.7, 0.9, 1.1]
         with self.assertRaises(TimeoutError):
             await self.wait_event_with_timeout([async_button.Button.TRIPLE])
 
     async def test_long_click(self):
-        self.button = FastButton(self.pin, True, long_click_enable=True)
+        self.button = self.fast_button(self.pin, True, long_click_enable=True)
         self.button_timings = [0.10, 3.30]
         await self.wait_event_with_timeout([async_button.Button.LONG])
         self.assertAlmostEqual(self.time_count, 2.1, delta=0.1)
 
     async def test_long_click_not_when_disabled(self):
-        self.button = FastButton(self.pin, True, long_click_enable=False)
+        self.button = self.fast_button(self.pin, True, long_click_enable=False)
         self.button_timings = [0.10, 2.30]
         with self.assertRaises(TimeoutError):
             await self.wait_event_with_timeout([async_button.Button.LONG])
 
     async def test_long_click_does_not_produce_single_or_long_click_at_end(self):
-        self.button = FastButton(self.pin, True, long_click_enable=True)
+        self.button = self.fast_button(self.pin, True, long_click_enable=True)
         self.button_timings = [0.10, 2.30]
         await self.wait_event_with_timeout([async_button.Button.LONG])
         with self.assertRaises(TimeoutError):
@@ -200,7 +208,7 @@ class TestButton(IsolatedAsyncioTestCase):
             )
 
     async def test_single_then_double_then_triple_works(self):
-        self.button = FastButton(self.pin, True, triple_click_enable=True)
+        self.button = self.fast_button(self.pin, True, triple_click_enable=True)
         self.button_timings = [0.10, 0.30, 0.5, 0.7, 0.9, 1.1]
         await self.wait_event_with_timeout([async_button.Button.SINGLE])
         await self.wait_event_with_timeout([async_button.Button.DOUBLE])
@@ -208,7 +216,7 @@ class TestButton(IsolatedAsyncioTestCase):
         self.assertAlmostEqual(self.time_count, 1.10, delta=0.1)
 
     async def test_wait_for_clicks(self):
-        self.button = FastButton(self.pin, True, triple_click_enable=True)
+        self.button = self.fast_button(self.pin, True, triple_click_enable=True)
         self.button_timings = [0.10, 0.30, 0.5, 0.7, 0.9, 1.1]
         self.assertEqual(await self.button.wait_for_click(), self.button.SINGLE)
         self.assertEqual(await self.button.wait_for_click(), self.button.DOUBLE)
@@ -216,7 +224,7 @@ class TestButton(IsolatedAsyncioTestCase):
         self.assertAlmostEqual(self.time_count, 1.10, delta=0.1)
 
     async def test_wait_for_clicks_goes_back_to_single(self):
-        self.button = FastButton(self.pin, True)
+        self.button = self.fast_button(self.pin, True)
         self.button_timings = [0.10, 0.30, 0.5, 0.7, 0.9, 1.1]
         self.assertEqual(await self.button.wait_for_click(), self.button.SINGLE)
         self.assertEqual(await self.button.wait_for_click(), self.button.DOUBLE)
@@ -224,7 +232,7 @@ class TestButton(IsolatedAsyncioTestCase):
         self.assertAlmostEqual(self.time_count, 1.10, delta=0.1)
 
     async def test_wait_selection(self):
-        self.button = FastButton(self.pin, True)
+        self.button = self.fast_button(self.pin, True)
         selection = (self.button.SINGLE, self.button.PRESSED)
         self.button_timings = [0.10, 0.30, 0.5, 0.7, 0.9, 1.1]
         self.assertSequenceEqual(
@@ -245,7 +253,7 @@ class TestButton(IsolatedAsyncioTestCase):
         self.assertAlmostEqual(self.time_count, 1.10, delta=0.1)
 
     async def test_wait_all(self):
-        self.button = FastButton(self.pin, True, triple_click_enable=True)
+        self.button = self.fast_button(self.pin, True, triple_click_enable=True)
         self.button_timings = [0.10, 0.30, 0.5, 0.7, 0.9, 1.1]
         self.assertSequenceEqual(await self.button.wait(), (self.button.PRESSED,))
         self.assertSequenceEqual(
@@ -261,6 +269,258 @@ class TestButton(IsolatedAsyncioTestCase):
         )
         self.assertAlmostEqual(self.time_count, 1.10, delta=0.1)
 
+    async def test_wait_ignores_unwatched_events(self):
+        self.button = self.fast_button(self.pin, True)
+        self.button_timings = [0.10, 0.20, 0.30, 0.40, 0.60]
+        edges = (self.button.PRESSED, self.button.RELEASED)
+        self.assertSequenceEqual(await self.button.wait(edges), (self.button.PRESSED,))
+        while self.time_count < 0.5:
+            await asyncio.sleep(0)
+        self.assertSequenceEqual(await self.button.wait(edges), (self.button.PRESSED,))
+
+    async def test_reconfigure_interval_rebuilds_keys(self):
+        self.button = self.button_class(self.pin, True)
+        self.button.reconfigure(interval=0.01)
+        self.assertEqual(self.keypad_keys.call_count, 2)
+        self.keypad_keys.assert_called_with(
+            (self.pin,), value_when_pressed=True, pull=True, interval=0.01
+        )
+        self.keys.deinit.assert_called_once()
+
+    async def test_reconfigure_same_interval_keeps_keys(self):
+        self.button = self.button_class(self.pin, True)
+        self.button.reconfigure(interval=0.02, double_click_max_duration=1.0)
+        self.keypad_keys.assert_called_once()
+        self.keys.deinit.assert_not_called()
+
+    async def test_reconfigure_interval_deferred_while_pressed(self):
+        self.button = self.fast_button(self.pin, True)
+        self.button_timings = [0.10, 0.30]
+        await self.wait_event_with_timeout([async_button.Button.PRESSED])
+        self.button.reconfigure(interval=0.01)
+        self.keypad_keys.assert_called_once()
+        await self.wait_event_with_timeout([async_button.Button.RELEASED])
+        await asyncio.sleep(0)
+        self.assertEqual(self.keypad_keys.call_count, 2)
+
+    async def test_reconfigure_invalid_leaves_button_unchanged(self):
+        self.button = self.fast_button(self.pin, True)
+        with self.assertRaises(ValueError):
+            self.button.reconfigure(
+                double_click_enable=False,
+                triple_click_enable=True,
+                double_click_max_duration=1.0,
+            )
+        self.assertEqual(self.button.double_click_max_duration, 0.5)
+        self.assertTrue(self.button.click_enabled[async_button.Button.DOUBLE])
+
+    async def test_reconfigure_double_click_duration(self):
+        self.button = self.fast_button(self.pin, True)
+        self.button.reconfigure(double_click_max_duration=1.5)
+        self.button_timings = [0.10, 0.30, 1.1, 1.3]
+        await self.wait_event_with_timeout([async_button.Button.DOUBLE])
+        self.assertAlmostEqual(self.time_count, 1.3, delta=0.1)
+
+    async def test_reconfigure_during_press_uses_original_press_time(self):
+        self.button = self.fast_button(self.pin, True)
+        self.button_timings = [0.10, 0.30, 1.1, 1.3]
+        await self.wait_event_with_timeout([async_button.Button.PRESSED])
+        self.button.reconfigure(double_click_max_duration=1.5)
+        await self.wait_event_with_timeout([async_button.Button.DOUBLE])
+        self.assertAlmostEqual(self.time_count, 1.3, delta=0.1)
+
+    async def test_reconfigure_enables_long_click(self):
+        self.button = self.fast_button(self.pin, True)
+        self.button_timings = [0.10, 3.30]
+        await self.wait_event_with_timeout([async_button.Button.PRESSED])
+        self.button.reconfigure(long_click_enable=True, long_click_min_duration=1.0)
+        await self.wait_event_with_timeout([async_button.Button.LONG])
+        self.assertAlmostEqual(self.time_count, 1.1, delta=0.1)
+
+    async def test_exclusive_double_click_has_no_single(self):
+        self.button = self.fast_button(self.pin, True, exclusive_clicks=True)
+        self.button_timings = [0.10, 0.30, 0.5, 0.7]
+        self.assertEqual(await self.button.wait_for_click(), self.button.DOUBLE)
+        self.assertAlmostEqual(self.time_count, 0.70, delta=0.1)
+
+    async def test_exclusive_single_click_after_window(self):
+        self.button = self.fast_button(self.pin, True, exclusive_clicks=True)
+        self.button_timings = [0.10, 0.20]
+        self.assertEqual(await self.button.wait_for_click(), self.button.SINGLE)
+        self.assertAlmostEqual(self.time_count, 0.60, delta=0.05)
+
+    async def test_wait_record_single_click(self):
+        self.needs_extras()
+        self.button = self.fast_button(self.pin, True)
+        self.button_timings = [0.10, 0.30]
+        record = await self.button.wait_record(async_button.Button.SINGLE)
+        self.assertIs(record.button, self.button)
+        self.assertEqual(
+            record.events, async_button.Button.RELEASED | async_button.Button.SINGLE
+        )
+        self.assertAlmostEqual(record.timestamp, 300, delta=30)
+        self.assertAlmostEqual(record.duration, 200, delta=30)
+        self.assertEqual(record.clicks, 1)
+
+    async def test_wait_record_double_click(self):
+        self.needs_extras()
+        self.button = self.fast_button(self.pin, True)
+        self.button_timings = [0.10, 0.30, 0.5, 0.7]
+        record = await self.button.wait_record(async_button.Button.DOUBLE)
+        self.assertEqual(record.clicks, 2)
+        self.assertAlmostEqual(record.duration, 200, delta=30)
+
+    async def test_wait_record_long_click(self):
+        self.needs_extras()
+        self.button = self.fast_button(self.pin, True, long_click_enable=True)
+        self.button_timings = [0.10, 3.0]
+        record = await self.button.wait_record(async_button.Button.LONG)
+        self.assertEqual(record.duration, 2000)
+        self.assertAlmostEqual(record.timestamp, 2100, delta=30)
+
+    async def test_records_are_reused(self):
+        self.needs_extras()
+        self.button = self.fast_button(self.pin, True)
+        self.button_timings = [0.10, 0.30, 1.0, 1.2, 2.0, 2.2]
+        records = set()
+        for _ in range(6):
+            records.add(id(await self.button.wait_record()))
+        self.assertEqual(len(records), async_button.Button.record_pool_size)
+
+    async def test_hold_stages(self):
+        self.button = self.fast_button(self.pin, True, hold_thresholds=(1.0, 3.0))
+        self.button_timings = [0.10, 4.0]
+        stage_0 = self.button.hold_event(0)
+        stage_1 = self.button.hold_event(1)
+        self.assertSequenceEqual(
+            await self.wait_event_with_timeout([stage_0, stage_1]), [stage_0]
+        )
+        self.assertAlmostEqual(self.time_count, 1.1, delta=0.15)
+        self.assertSequenceEqual(
+            await self.wait_event_with_timeout([stage_0, stage_1]), [stage_1]
+        )
+        self.assertAlmostEqual(self.time_count, 3.1, delta=0.15)
+
+    async def test_hold_stages_added_by_reconfigure(self):
+        self.button = self.fast_button(self.pin, True)
+        self.button.reconfigure(hold_thresholds=(0.5,))
+        self.button_timings = [0.10, 1.0]
+        await self.wait_event_with_timeout([self.button.hold_event(0)])
+        self.assertAlmostEqual(self.time_count, 0.6, delta=0.1)
+
+    async def test_events_recorded_in_sink(self):
+        self.needs_extras()
+        stream = io.BytesIO()
+        sink = async_button.EventSink(stream, flush_interval=10)
+        self.button = self.fast_button(self.pin, True, sink=sink, sink_source=7)
+        self.button_timings = [0.10, 0.20]
+        await self.wait_event_with_timeout([async_button.Button.SINGLE])
+        self.assertEqual(len(sink), 2)
+        self.button.deinit()
+        self.button = None
+        records = decode_events(stream.getvalue())
+        self.assertEqual([x[0] for x in records], [7, 7])
+        self.assertEqual(
+            [x[1] for x in records],
+            [
+                async_button.Button.PRESSED,
+                async_button.Button.RELEASED | async_button.Button.SINGLE,
+            ],
+        )
+
+    async def test_events_created_on_first_wait(self):
+        self.button = self.fast_button(self.pin, True)
+        self.assertEqual(self.button.events, {})
+        self.button_timings = [0.10, 0.20]
+        await self.wait_event_with_timeout([async_button.Button.SINGLE])
+        self.assertEqual(list(self.button.events), [async_button.Button.SINGLE])
+
+    async def test_unknown_event_type(self):
+        self.button = self.fast_button(self.pin, True, hold_thresholds=(1,))
+        with self.assertRaises(KeyError):
+            await self.button.wait(self.button.hold_event(1))
+
+    async def test_deferred_start(self):
+        self.needs_extras()
+        self.button = self.fast_button(self.pin, True, start=False)
+        self.keypad_keys.assert_not_called()
+        self.assertIsNone(self.button.monitor_task)
+        self.button_timings = [0.10, 0.20]
+        await self.wait_event_with_timeout([async_button.Button.SINGLE])
+        self.keypad_keys.assert_called_once()
+        self.assertIsNotNone(self.button.monitor_task)
+
+    async def test_deinit_before_start(self):
+        self.needs_extras()
+        button = self.fast_button(self.pin, True, start=False)
+        button.deinit()
+        self.keypad_keys.assert_not_called()
+
+    async def test_wait_after_deinit(self):
+        button = self.fast_button(self.pin, True)
+        button.deinit()
+        with self.assertRaises(ValueError):
+            await button.wait(button.SINGLE)
+        self.keypad_keys.assert_called_once()
+        self.assertIsNone(button.monitor_task)
+
+    async def test_start_after_deinit(self):
+        self.needs_extras()
+        buttons = [self.fast_button(self.pin, True, start=False) for _ in range(2)]
+        buttons[1].deinit()
+        with self.assertRaises(ValueError):
+            buttons[1].start()
+        with self.assertRaises(ValueError):
+            async_button.MultiButton(a=buttons[0], b=buttons[1]).start()
+        self.keypad_keys.assert_not_called()
+        self.assertIsNone(buttons[0].monitor_task)
+
+    async def test_group_start(self):
+        self.needs_extras()
+        buttons = [self.fast_button(self.pin, True, start=False) for _ in range(3)]
+        multi = async_button.MultiButton(a=buttons[0], b=buttons[1], c=buttons[2])
+        multi.start()
+        self.assertEqual(self.keypad_keys.call_count, 3)
+        for button in buttons:
+            self.assertIsNotNone(button.monitor_task)
+            button.deinit()
+
+    async def test_group_start_releases_pins_on_failure(self):
+        self.needs_extras()
+        good = MagicMock()
+        self.keypad_keys.side_effect = [good, ValueError("pin in use")]
+        buttons = [self.fast_button(self.pin, True, start=False) for _ in range(2)]
+        multi = async_button.MultiButton(a=buttons[0], b=buttons[1])
+        with self.assertRaises(ValueError):
+            multi.start()
+        good.deinit.assert_called_once()
+        for button in buttons:
+            self.assertIsNone(button.keys)
+            self.assertIsNone(button.monitor_task)
+
+    async def test_poll_without_monitor(self):
+        button = async_button.PolledButton(self.pin, True)
+        self.button_timings = [0.10, 0.20]
+        seen = 0
+        while self.button_timings:
+            seen |= button.poll()
+        self.assertEqual(
+            seen,
+            async_button.Button.PRESSED
+            | async_button.Button.RELEASED
+            | async_button.Button.SINGLE,
+        )
+        button.deinit()
+        self.keys.deinit.assert_called_once()
+
+    async def test_poll_long_click(self):
+        button = async_button.PolledButton(self.pin, True, long_click_enable=True)
+        self.button_timings = [0.10, 3.0]
+        while not button.poll() & async_button.Button.LONG:
+            pass
+        self.assertAlmostEqual(self.time_count, 2.1, delta=0.1)
+        self.assertTrue(button.pressed)
+
 
 class TestButtonWithTimestamp(TestButton):
     """
@@ -272,3 +532,11 @@ class TestButtonWithTimestamp(TestButton):
         if result:
             event.timestamp = self.new_ticks_ms()
         return result
+
+
+class TestCoreButton(TestButton):
+    """
+    The same tests for the `async_button_core.Button` that `async_button.Button` extends
+    """
+
+    button_class = async_button_core.Button
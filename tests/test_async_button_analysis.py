@@ -0,0 +1,312 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for the offline analysis tools
+"""
+import asyncio
+import random
+from functools import partial
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import microcontroller
+
+import async_button
+import async_button_analysis
+
+PRESSED = async_button.Button.PRESSED
+RELEASED = async_button.Button.RELEASED
+SINGLE = async_button.Button.SINGLE
+DOUBLE = async_button.Button.DOUBLE
+TRIPLE = async_button.Button.TRIPLE
+LONG = async_button.Button.LONG
+
+
+def make_trace(seed, gestures=40, double_gap=250, hold=120, long_hold=1500):
+    """
+    Make a trace of single clicks, double clicks and long holds
+    """
+    rng = random.Random(seed)
+    trace = []
+    now = 1000
+    for _ in range(gestures):
+        kind = rng.choice(("single", "double", "long"))
+        presses = 2 if kind == "double" else 1
+        for _ in range(presses):
+            trace.append((now, True))
+            length = long_hold if kind == "long" else hold
+            now += int(rng.gauss(length, length * 0.15))
+            trace.append((now, False))
+            now += int(rng.gauss(double_gap - hold, 20))
+        now += rng.randint(1500, 4000)
+    return trace
+
+
+class TestTraceIntervals(TestCase):
+    def test_intervals(self):
+        trace = [(100, True), (200, False), (400, True), (450, False)]
+        gaps, holds = async_button_analysis.trace_intervals(trace)
+        self.assertSequenceEqual(gaps, [300])
+        self.assertSequenceEqual(holds, [100, 50])
+
+    def test_leading_release_ignored(self):
+        trace = [(50, False), (100, True), (150, True), (200, False)]
+        gaps, holds = async_button_analysis.trace_intervals(trace)
+        self.assertSequenceEqual(gaps, [])
+        self.assertSequenceEqual(holds, [100])
+
+    def test_ticks_wraparound(self):
+        period = 1 << 29
+        trace = [(period - 50, True), (20, False), (100, True), (150, False)]
+        gaps, holds = async_button_analysis.trace_intervals(trace)
+        self.assertSequenceEqual(gaps, [150])
+        self.assertSequenceEqual(holds, [70, 50])
+
+
+class TestRecommendTiming(TestCase):
+    def test_recommends_between(self):
+        traces = [make_trace(seed) for seed in range(5)]
+        result = async_button_analysis.recommend_timing(
+            traces, max_long_click_latency=3.0
+        )
+        self.assertGreater(result.double_click_max_duration, 0.3)
+        self.assertLess(result.double_click_max_duration, 0.5)
+        self.assertGreater(result.long_click_min_duration, 0.15)
+        self.assertLess(result.long_click_min_duration, 1.3)
+        self.assertLess(result.double_click_error, 0.01)
+        self.assertLess(result.long_click_error, 0.01)
+
+    def test_slow_user_longer_double(self):
+        fast = async_button_analysis.recommend_timing(
+            [make_trace(1, double_gap=200)], max_double_click_latency=1.5
+        )
+        slow = async_button_analysis.recommend_timing(
+            [make_trace(1, double_gap=600)], max_double_click_latency=1.5
+        )
+        self.assertGreater(
+            slow.double_click_max_duration, fast.double_click_max_duration
+        )
+
+    def test_latency_cap_is_respected(self):
+        result = async_button_analysis.recommend_timing(
+            [make_trace(2, double_gap=600)], max_double_click_latency=0.4
+        )
+        self.assertLessEqual(result.double_click_max_duration, 0.4)
+        self.assertGreater(result.double_click_error, 0.1)
+
+    def test_defaults_without_data(self):
+        result = async_button_analysis.recommend_timing([[(0, True), (100, False)]])
+        self.assertEqual(result.double_click_max_duration, 0.5)
+        self.assertEqual(result.long_click_min_duration, 2.0)
+        self.assertIsNone(result.double_click_error)
+        self.assertIsNone(result.long_click_error)
+
+    def test_as_kwargs(self):
+        result = async_button_analysis.recommend_timing([])
+        self.assertEqual(
+            result.as_kwargs(),
+            {"double_click_max_duration": 0.5, "long_click_min_duration": 2.0},
+        )
+
+    def test_many_users(self):
+        traces = {
+            "user{}".format(i): [make_trace(i * 10 + j) for j in range(3)]
+            for i in range(20)
+        }
+        results = async_button_analysis.recommend_timings(traces)
+        self.assertEqual(set(results), set(traces))
+        for result in results.values():
+            self.assertLess(result.double_click_max_duration, 0.5)
+
+
+def random_edges(seed, count=400, max_gap=700):
+    rng = random.Random(seed)
+    timestamps = []
+    now = 100
+    for _ in range(count):
+        now += rng.randint(1, max_gap) if rng.random() < 0.9 else rng.randint(1, 3000)
+        timestamps.append(now)
+    pressed = [i % 2 == 0 for i in range(count)]
+    return timestamps, pressed
+
+
+SETTINGS = (
+    {},
+    {"double_click_enable": False},
+    {"triple_click_enable": True},
+    {"triple_click_enable": True, "long_click_enable": True},
+    {"long_click_enable": True, "long_click_min_duration": 0.3},
+    {
+        "triple_click_enable": True,
+        "long_click_enable": True,
+        "long_click_min_duration": 0.2,
+        "double_click_max_duration": 0.6,
+    },
+    {"exclusive_clicks": True},
+    {"exclusive_clicks": True, "triple_click_enable": True},
+    {
+        "exclusive_clicks": True,
+        "triple_click_enable": True,
+        "long_click_enable": True,
+        "long_click_min_duration": 0.2,
+    },
+)
+
+
+class TestClassifyEdges(TestCase):
+    def test_simple_double_click(self):
+        events, times = async_button_analysis.classify_edges(
+            [100, 200, 300, 400], [True, False, True, False]
+        )
+        self.assertSequenceEqual(
+            list(events), [PRESSED, RELEASED, SINGLE, PRESSED, RELEASED, DOUBLE]
+        )
+        self.assertSequenceEqual(list(times), [100, 200, 200, 300, 400, 400])
+
+    def test_long_click(self):
+        events, times = async_button_analysis.classify_edges(
+            [100, 2500], [True, False], long_click_enable=True
+        )
+        self.assertSequenceEqual(list(events), [PRESSED, LONG, RELEASED])
+        self.assertSequenceEqual(list(times), [100, 2100, 2500])
+
+    def test_long_click_still_held(self):
+        events, _ = async_button_analysis.classify_edges(
+            [100], [True], long_click_enable=True
+        )
+        self.assertSequenceEqual(list(events), [PRESSED])
+        events, times = async_button_analysis.classify_edges(
+            [100], [True], long_click_enable=True, end=5000
+        )
+        self.assertSequenceEqual(list(events), [PRESSED, LONG])
+        self.assertSequenceEqual(list(times), [100, 2100])
+
+    def test_triple_needs_double(self):
+        with self.assertRaises(ValueError):
+            async_button_analysis.classify_edges(
+                [], [], double_click_enable=False, triple_click_enable=True
+            )
+
+    def test_vectorised_matches(self):
+        for seed in range(10):
+            timestamps, pressed = random_edges(seed)
+            for kwargs in SETTINGS:
+                settings = (
+                    async_button_analysis._Settings(  # pylint: disable=protected-access
+                        **kwargs
+                    )
+                )
+                expected = async_button_analysis._classify_reference(  # pylint: disable=protected-access
+                    timestamps, pressed, settings, 100000000
+                )
+                result = async_button_analysis.classify_edges(
+                    timestamps, pressed, end=100000000, **kwargs
+                )
+                self.assertSequenceEqual(list(result[0]), list(expected[0]))
+                self.assertSequenceEqual(list(result[1]), list(expected[1]))
+
+    def test_exclusive_double_click(self):
+        events, times = async_button_analysis.classify_edges(
+            [100, 200, 300, 400, 1000, 1100],
+            [True, False, True, False, True, False],
+            exclusive_clicks=True,
+            end=2000,
+        )
+        self.assertSequenceEqual(
+            list(events),
+            [PRESSED, RELEASED, PRESSED, RELEASED, DOUBLE, PRESSED, RELEASED, SINGLE],
+        )
+        self.assertSequenceEqual(
+            list(times), [100, 200, 300, 400, 400, 1000, 1100, 1500]
+        )
+
+    def test_exclusive_click_needs_end(self):
+        events, _ = async_button_analysis.classify_edges(
+            [100, 200], [True, False], exclusive_clicks=True
+        )
+        self.assertSequenceEqual(list(events), [PRESSED, RELEASED])
+
+    def test_hold_stages(self):
+        hold_0 = async_button.ClickClassifier.hold_event(0)
+        hold_1 = async_button.ClickClassifier.hold_event(1)
+        events, times = async_button_analysis.classify_edges(
+            [100, 2500, 3000, 3100],
+            [True, False, True, False],
+            hold_thresholds=(0.5, 1.0),
+            long_click_enable=True,
+        )
+        self.assertSequenceEqual(
+            list(events),
+            [PRESSED, hold_0, hold_1, LONG, RELEASED, PRESSED, RELEASED, SINGLE],
+        )
+        self.assertSequenceEqual(
+            list(times), [100, 600, 1100, 2100, 2500, 3000, 3100, 3100]
+        )
+
+    def test_irregular_edges(self):
+        events, _ = async_button_analysis.classify_edges(
+            [50, 100, 150, 200], [False, True, True, False]
+        )
+        self.assertSequenceEqual(
+            list(events), [RELEASED, SINGLE, PRESSED, PRESSED, RELEASED, DOUBLE]
+        )
+
+    def test_unwrap_ticks(self):
+        period = 1 << 29
+        result = async_button_analysis.unwrap_ticks([period - 100, period - 10, 20, 50])
+        self.assertSequenceEqual(list(result), [0, 90, 120, 150])
+
+    def test_matches_button(self):
+        for kwargs in SETTINGS:
+            timestamps, pressed = random_edges(3, count=60, max_gap=900)
+            # keep holds well away from the long click threshold, as Button only checks
+            # this every interval
+            long_ms = kwargs.get("long_click_min_duration", 2.0) * 1000
+            for i in range(1, len(timestamps), 2):
+                if abs(timestamps[i] - timestamps[i - 1] - long_ms) < 50:
+                    timestamps[i] = timestamps[i - 1] + long_ms + 50
+                    for j in range(i + 1, len(timestamps)):
+                        timestamps[j] = max(timestamps[j], timestamps[j - 1] + 1)
+            expected = asyncio.run(replay_button(timestamps, pressed, kwargs))
+            events, _ = async_button_analysis.classify_edges(
+                timestamps, pressed, **kwargs
+            )
+            self.assertSequenceEqual(list(events), expected)
+
+
+def expand_events(seen, fired):
+    for event_type in (PRESSED, LONG, RELEASED, SINGLE, DOUBLE, TRIPLE):
+        if fired & event_type:
+            seen.append(event_type)
+
+
+async def replay_button(timestamps, pressed, kwargs):
+    """
+    Run the edges through a real Button, with a fake clock that advances 10ms per check
+    """
+    clock = [0]
+    edges = list(zip(timestamps, pressed))
+    seen = []
+
+    def get_into(event):
+        clock[0] += 10
+        if edges and edges[0][0] <= clock[0]:
+            # pylint: disable=protected-access
+            event._pressed = edges.pop(0)[1]
+            return True
+        return False
+
+    keys = MagicMock()
+    keys.events.get_into = get_into
+    with patch("async_button.keypad.Keys", return_value=keys), patch(
+        "async_button_core.ticks_ms", new=lambda: clock[0]
+    ):
+        button = async_button.Button(microcontroller.Pin(0), True, interval=0, **kwargs)
+        button._trigger = partial(  # pylint: disable=protected-access
+            expand_events, seen
+        )
+        while edges or button.pressed and clock[0] < timestamps[-1] + 3000:
+            await asyncio.sleep(0)
+        button.deinit()
+    return seen
@@ -0,0 +1,80 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for the split between async_button_core and async_button. The behaviour of the core
+classes is mostly tested through async_button, which re-exports or extends them.
+"""
+import asyncio
+import subprocess
+import sys
+from unittest import TestCase
+from unittest.mock import patch
+
+import async_button
+import async_button_core
+from async_button_testing import ScriptedKeys, run_virtual
+
+SHARED_CLASSES = ("ClickClassifier", "PolledButton")
+EXTENDED_CLASSES = ("SimpleButton", "Button")
+
+PROBE = """
+import sys
+from unittest.mock import MagicMock
+sys.modules.setdefault("countio", MagicMock())
+import async_button_core
+print(sorted(name for name in sys.modules if name.startswith("async_button")))
+"""
+
+
+class TestCoreSplit(TestCase):
+    def test_same_classes(self):
+        for name in SHARED_CLASSES:
+            self.assertIs(getattr(async_button, name), getattr(async_button_core, name))
+
+    def test_extended_classes(self):
+        for name in EXTENDED_CLASSES:
+            self.assertTrue(
+                issubclass(
+                    getattr(async_button, name), getattr(async_button_core, name)
+                )
+            )
+
+    def test_extras_not_in_core(self):
+        for name in (
+            "TaskWrapper",
+            "MultiButton",
+            "ButtonMatrix",
+            "EventSink",
+            "EventRecord",
+        ):
+            self.assertFalse(hasattr(async_button_core, name), name)
+        self.assertFalse(hasattr(async_button_core.SimpleButton, "wait_any"))
+        for name in ("start", "wait_record", "sink", "lateness_budget"):
+            self.assertFalse(hasattr(async_button_core.Button, name), name)
+
+    def test_core_imports_alone(self):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        self.assertEqual(result.stdout.split("\n")[-2], "['async_button_core']")
+
+    def test_core_button_clicks(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            trace = [(100, True), (200, False), (300, True), (400, False)]
+            keys = ScriptedKeys(loop.ticks_ms, trace)
+            with patch("async_button_core.keypad.Keys", return_value=keys):
+                button = async_button_core.Button(0, True, clock=loop.ticks_ms)
+                clicks = await button.wait((button.SINGLE, button.DOUBLE))
+                clicks += await button.wait((button.SINGLE, button.DOUBLE))
+                button.deinit()
+            return clicks
+
+        self.assertEqual(
+            run_virtual(main()),
+            [async_button.Button.SINGLE, async_button.Button.DOUBLE],
+        )
@@ -23,15 +23,25 @@ async def wait_and_return(delay: float, click_type):
     return click_type
 
 
+async def wait_for_event(event: asyncio.Event, click_type):
+    await event.wait()
+    if isinstance(click_type, int):
+        click_type = [click_type]
+    return click_type
+
+
 class TestButton(IsolatedAsyncioTestCase):
     # pylint: disable=invalid-name, too-many-public-methods
     def setUp(self) -> None:
         self.button_a = MagicMock(async_button.Button)
         self.button_a.wait = AsyncMock()
+        self.button_a.pressed_states = []
         self.button_b = MagicMock(async_button.Button)
         self.button_b.wait = AsyncMock()
+        self.button_b.pressed_states = []
         self.button_c = MagicMock(async_button.Button)
         self.button_c.wait = AsyncMock()
+        self.button_c.pressed_states = []
 
     def testInitialise(self):
         async_button.MultiButton(a=self.button_a, b=self.button_b, c=self.button_c)
@@ -72,3 +82,76 @@ class TestButton(IsolatedAsyncioTestCase):
         self.assertEqual(("a", DOUBLE), result)
         self.button_a.wait.assert_awaited_once()
         self.button_a.wait.assert_called_with([SINGLE, DOUBLE])
+
+    async def testWaitRecord(self):
+        multi = async_button.MultiButton(a=self.button_a, b=self.button_b)
+        self.button_a.wait = partial(wait_and_return, 0.2)
+        self.button_b.wait = partial(wait_and_return, 0.1)
+        self.button_b.last_record = MagicMock(async_button.EventRecord)
+        result = await multi.wait_record(a=SINGLE, b=DOUBLE)
+        self.assertIs(result, self.button_b.last_record)
+
+    def testAttachSink(self):
+        multi = async_button.MultiButton(a=self.button_a, b=self.button_b)
+        sink = MagicMock(async_button.EventSink)
+        self.assertEqual(["a", "b"], multi.attach_sink(sink))
+        self.assertIs(self.button_a.sink, sink)
+        self.assertIs(self.button_b.sink, sink)
+        self.assertEqual(0, self.button_a.sink_source)
+        self.assertEqual(1, self.button_b.sink_source)
+
+    def set_bursts(self, **timestamps):
+        # the named buttons all fire together, with a record at the given timestamp
+        burst = asyncio.Event()
+        for name, timestamp in timestamps.items():
+            button = getattr(self, "button_" + name)
+            button.wait = partial(wait_for_event, burst)
+            button.last_record = MagicMock(timestamp=timestamp)
+        asyncio.get_running_loop().call_later(0.05, burst.set)
+
+    async def testSimultaneousClicksAreQueued(self):
+        multi = async_button.MultiButton(
+            a=self.button_a, b=self.button_b, c=self.button_c
+        )
+        self.set_bursts(a=100, b=100, c=100)
+        results = [await multi.wait(a=SINGLE, b=DOUBLE, c=LONG) for _ in range(3)]
+        self.assertEqual([("a", SINGLE), ("b", DOUBLE), ("c", LONG)], results)
+
+    async def testTimestampOrder(self):
+        multi = async_button.MultiButton(
+            a=self.button_a, b=self.button_b, c=self.button_c
+        )
+        self.set_bursts(a=300, b=100, c=200)
+        result = await multi.wait_many(a=SINGLE, b=SINGLE, c=SINGLE)
+        self.assertEqual([("b", SINGLE), ("c", SINGLE), ("a", SINGLE)], result)
+
+    async def testRoundRobinTies(self):
+        multi = async_button.MultiButton(
+            a=self.button_a, b=self.button_b, c=self.button_c
+        )
+        self.set_bursts(a=100)
+        self.assertEqual(("a", SINGLE), await multi.wait(a=SINGLE))
+        self.set_bursts(a=200, b=200, c=200)
+        result = await multi.wait_many(a=SINGLE, b=SINGLE, c=SINGLE)
+        self.assertEqual(["b", "c", "a"], [name for name, _ in result])
+        result = await multi.wait_many(a=SINGLE, b=SINGLE, c=SINGLE)
+        self.assertEqual(["b", "c", "a"], [name for name, _ in result])
+
+    async def testUnwantedQueuedClicksKept(self):
+        multi = async_button.MultiButton(a=self.button_a, b=self.button_b)
+        self.set_bursts(a=100, b=100)
+        self.assertEqual(("a", SINGLE), await multi.wait(a=SINGLE, b=SINGLE))
+        self.button_a.wait = partial(wait_and_return, 0.1)
+        self.assertEqual(("a", DOUBLE), await multi.wait(a=DOUBLE))
+        self.button_b.wait = partial(wait_and_return, 1)
+        self.assertEqual(("b", SINGLE), await multi.wait(b=SINGLE))
+
+    async def testQueueBounded(self):
+        multi = async_button.MultiButton(
+            a=self.button_a, b=self.button_b, c=self.button_c
+        )
+        multi.MAX_PENDING = 1
+        self.set_bursts(a=100, b=200, c=300)
+        self.assertEqual(("a", SINGLE), await multi.wait(a=SINGLE, b=SINGLE, c=SINGLE))
+        self.button_b.wait = partial(wait_and_return, 0.1)
+        self.assertEqual([("c", SINGLE)], await multi.wait_many(b=SINGLE, c=SINGLE))
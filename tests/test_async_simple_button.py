@@ -5,6 +5,7 @@
 """
 Tests for Simple Button implementation
 """
+import asyncio
 import sys
 from unittest import IsolatedAsyncioTestCase
 from unittest.mock import patch, MagicMock, PropertyMock, AsyncMock
@@ -20,8 +21,11 @@ import async_button
 class TestSimpleButton(IsolatedAsyncioTestCase):
     def setUp(self) -> None:
         self.countio = MagicMock()
-        self.patch_countio = patch("async_button.countio", self.countio)
-        self.patch_countio.start()
+        # SimpleButton is in async_button_core, with wait_any added in async_button
+        self.patches = [
+            patch(module + ".countio", self.countio)
+            for module in ("async_button_core", "async_button")
+        ]
         self.counter = MagicMock()
         self.counter.__enter__.return_value = (
             self.counter
@@ -30,14 +34,18 @@ class TestSimpleButton(IsolatedAsyncioTestCase):
         self.countio.Counter.return_value = self.counter
         self.asyncio = MagicMock()
         self.asyncio.sleep = AsyncMock()
-        self.patch_asyncio = patch("async_button.asyncio", self.asyncio)
-        self.patch_asyncio.start()
+        self.patches += [
+            patch(module + ".asyncio", self.asyncio)
+            for module in ("async_button_core", "async_button")
+        ]
+        for patcher in self.patches:
+            patcher.start()
         self.edge_rise = self.countio.Edge.RISE
         self.edge_fall = self.countio.Edge.FALL
 
     def tearDown(self) -> None:
-        self.patch_asyncio.stop()
-        self.patch_countio.stop()
+        for patcher in self.patches:
+            patcher.stop()
 
     async def test_pressed_active_high(self):
         button = async_button.SimpleButton("P1", True)
@@ -99,3 +107,96 @@ class TestSimpleButton(IsolatedAsyncioTestCase):
         self.asyncio.sleep.assert_awaited_with(1.25)
         await button.released()
         self.asyncio.sleep.assert_awaited_with(1.25)
+
+    def set_pin_levels(self, *levels):
+        pin = MagicMock()
+        pin.__enter__.return_value = pin
+        type(pin).value = PropertyMock(side_effect=levels)
+        patcher = patch("async_button_core.digitalio.DigitalInOut", return_value=pin)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_debounce_waits_for_settle(self):
+        type(self.counter).count = PropertyMock(side_effect=[0, 1, 3, 4, 4])
+        self.set_pin_levels(False)
+        button = async_button.SimpleButton("P1", False, debounce=0.02)
+        await button.pressed()
+        self.asyncio.sleep.assert_awaited_with(0.02)
+        self.assertEqual(self.asyncio.sleep.await_count, 4)
+        self.assertEqual(button.bounce_count, 3)
+        self.countio.Counter.assert_called_once()
+
+    async def test_debounce_ignores_glitch(self):
+        type(self.counter).count = PropertyMock(side_effect=[1, 1, 1, 1])
+        self.set_pin_levels(True, False)
+        button = async_button.SimpleButton("P1", False, debounce=0.02)
+        await button.pressed()
+        self.assertEqual(self.countio.Counter.call_count, 2)
+        self.assertEqual(button.bounce_count, 1)
+
+    async def test_debounce_released(self):
+        type(self.counter).count = PropertyMock(side_effect=[2, 2])
+        self.set_pin_levels(True)
+        button = async_button.SimpleButton("P1", False, debounce=0.02)
+        await button.released()
+        self.countio.Counter.assert_called_once_with(
+            "P1", edge=self.edge_rise, pull=digitalio.Pull.UP
+        )
+        self.assertEqual(button.bounce_count, 1)
+
+    async def test_no_debounce_no_pin_read(self):
+        with patch("async_button_core.digitalio.DigitalInOut") as pin:
+            button = async_button.SimpleButton("P1", False)
+            await button.pressed()
+            pin.assert_not_called()
+        self.assertEqual(button.bounce_count, 0)
+
+    def make_counters(self, *counts):
+        counters = []
+        for count in counts:
+            counter = MagicMock()
+            type(counter).count = PropertyMock(side_effect=count)
+            counters.append(counter)
+        self.countio.Counter.side_effect = counters
+        return counters
+
+    async def test_wait_any(self):
+        counters = self.make_counters([0, 0, 0], [0, 0, 2], [0, 0])
+        buttons = [
+            async_button.SimpleButton("P1", False),
+            async_button.SimpleButton("P2", True),
+            async_button.SimpleButton("P3", False, interval=0.01),
+        ]
+        button, count = await async_button.SimpleButton.wait_any(buttons)
+        self.assertIs(button, buttons[1])
+        self.assertEqual(count, 2)
+        self.assertEqual(self.asyncio.sleep.await_count, 2)
+        self.asyncio.sleep.assert_awaited_with(0.01)
+        for counter in counters:
+            counter.deinit.assert_called_once()
+
+    async def test_wait_any_release(self):
+        self.make_counters([1], [0])
+        buttons = [
+            async_button.SimpleButton("P1", False),
+            async_button.SimpleButton("P2", True),
+        ]
+        await async_button.SimpleButton.wait_any(buttons, release=True)
+        self.assertEqual(
+            self.countio.Counter.call_args_list[0].kwargs["edge"], self.edge_rise
+        )
+        self.assertEqual(
+            self.countio.Counter.call_args_list[1].kwargs["edge"], self.edge_fall
+        )
+
+    async def test_wait_any_cancelled(self):
+        counters = self.make_counters([0], [0])
+        self.asyncio.sleep.side_effect = asyncio.CancelledError
+        buttons = [
+            async_button.SimpleButton("P1", False),
+            async_button.SimpleButton("P2", False),
+        ]
+        with self.assertRaises(asyncio.CancelledError):
+            await async_button.SimpleButton.wait_any(buttons)
+        for counter in counters:
+            counter.deinit.assert_called_once()
@@ -0,0 +1,252 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for the I/O free click classifier
+"""
+from unittest import TestCase
+
+from async_button import ClickClassifier
+
+PRESSED = ClickClassifier.PRESSED
+RELEASED = ClickClassifier.RELEASED
+SINGLE = ClickClassifier.SINGLE
+DOUBLE = ClickClassifier.DOUBLE
+TRIPLE = ClickClassifier.TRIPLE
+LONG = ClickClassifier.LONG
+
+
+def click(classifier, press, release):
+    return classifier.update(True, press), classifier.update(False, release)
+
+
+class TestClickClassifier(TestCase):
+    def test_single_click(self):
+        classifier = ClickClassifier()
+        self.assertEqual(click(classifier, 100, 200), (PRESSED, RELEASED | SINGLE))
+
+    def test_double_click(self):
+        classifier = ClickClassifier()
+        click(classifier, 100, 200)
+        self.assertEqual(click(classifier, 300, 400), (PRESSED, RELEASED | DOUBLE))
+        self.assertEqual(click(classifier, 500, 600), (PRESSED, RELEASED | SINGLE))
+
+    def test_first_press_not_double(self):
+        classifier = ClickClassifier()
+        self.assertEqual(click(classifier, 0, 10), (PRESSED, RELEASED | SINGLE))
+
+    def test_double_click_window(self):
+        classifier = ClickClassifier(double_click_max_duration=0.2)
+        click(classifier, 100, 150)
+        self.assertEqual(click(classifier, 300, 350)[1], RELEASED | SINGLE)
+        self.assertEqual(click(classifier, 499, 550)[1], RELEASED | DOUBLE)
+
+    def test_triple_click(self):
+        classifier = ClickClassifier(triple_click_enable=True)
+        click(classifier, 100, 200)
+        click(classifier, 300, 400)
+        self.assertEqual(click(classifier, 500, 600)[1], RELEASED | TRIPLE)
+
+    def test_triple_needs_double(self):
+        with self.assertRaises(ValueError):
+            ClickClassifier(double_click_enable=False, triple_click_enable=True)
+
+    def test_long_click_from_advance(self):
+        classifier = ClickClassifier(long_click_enable=True)
+        classifier.update(True, 100)
+        self.assertEqual(classifier.next_deadline, 2101)
+        self.assertEqual(classifier.advance(2100), 0)
+        self.assertEqual(classifier.advance(2101), LONG)
+        self.assertIsNone(classifier.next_deadline)
+        self.assertEqual(classifier.advance(2200), 0)
+        self.assertEqual(classifier.update(False, 2300), RELEASED)
+
+    def test_long_from_release_time(self):
+        classifier = ClickClassifier(long_click_enable=True)
+        classifier.update(True, 100)
+        self.assertEqual(classifier.update(False, 2200), LONG | RELEASED)
+
+    def test_no_deadline_without_long(self):
+        classifier = ClickClassifier()
+        classifier.update(True, 100)
+        self.assertIsNone(classifier.next_deadline)
+        self.assertEqual(classifier.advance(5000), 0)
+
+    def test_configure_keeps_press(self):
+        classifier = ClickClassifier(long_click_enable=True)
+        classifier.update(True, 100)
+        classifier.configure(long_click_min_duration=1.0)
+        self.assertEqual(classifier.next_deadline, 1101)
+
+    def test_configure_invalid(self):
+        classifier = ClickClassifier()
+        with self.assertRaises(ValueError):
+            classifier.configure(
+                double_click_enable=False,
+                triple_click_enable=True,
+                long_click_min_duration=1.0,
+            )
+        self.assertEqual(classifier.long_click_min_duration, 2.0)
+
+    def test_ticks_wraparound(self):
+        classifier = ClickClassifier()
+        period = 1 << 29
+        click(classifier, period - 100, period - 50)
+        self.assertEqual(click(classifier, 50, 100)[1], RELEASED | DOUBLE)
+
+    def test_in_gesture(self):
+        classifier = ClickClassifier()
+        self.assertFalse(classifier.in_gesture(0))
+        classifier.update(True, 100)
+        self.assertTrue(classifier.in_gesture(5000))
+        classifier.update(False, 200)
+        self.assertTrue(classifier.in_gesture(599))
+        self.assertFalse(classifier.in_gesture(600))
+
+    def test_in_gesture_no_double(self):
+        classifier = ClickClassifier(double_click_enable=False)
+        click(classifier, 100, 200)
+        self.assertFalse(classifier.in_gesture(201))
+        classifier = ClickClassifier(triple_click_enable=True)
+        click(classifier, 100, 200)
+        click(classifier, 300, 400)
+        click(classifier, 500, 600)
+        # after a triple click, the next press starts a new gesture
+        self.assertFalse(classifier.in_gesture(601))
+
+
+class TestExclusiveClicks(TestCase):
+    def test_single_held_for_window(self):
+        classifier = ClickClassifier(exclusive_clicks=True)
+        self.assertEqual(click(classifier, 100, 200), (PRESSED, RELEASED))
+        self.assertEqual(classifier.next_deadline, 600)
+        self.assertEqual(classifier.advance(599), 0)
+        self.assertEqual(classifier.advance(600), SINGLE)
+        self.assertIsNone(classifier.next_deadline)
+        self.assertEqual(classifier.advance(700), 0)
+
+    def test_double_on_release(self):
+        classifier = ClickClassifier(exclusive_clicks=True)
+        click(classifier, 100, 200)
+        self.assertEqual(click(classifier, 300, 400), (PRESSED, RELEASED | DOUBLE))
+        self.assertEqual(classifier.advance(2000), 0)
+
+    def test_double_held_for_triple(self):
+        classifier = ClickClassifier(exclusive_clicks=True, triple_click_enable=True)
+        click(classifier, 100, 200)
+        self.assertEqual(click(classifier, 300, 400), (PRESSED, RELEASED))
+        self.assertEqual(classifier.advance(800), DOUBLE)
+
+    def test_triple_fires_on_release(self):
+        classifier = ClickClassifier(exclusive_clicks=True, triple_click_enable=True)
+        click(classifier, 100, 200)
+        click(classifier, 300, 400)
+        self.assertEqual(click(classifier, 500, 600), (PRESSED, RELEASED | TRIPLE))
+
+    def test_single_on_release(self):
+        classifier = ClickClassifier(exclusive_clicks=True, double_click_enable=False)
+        self.assertEqual(click(classifier, 100, 200)[1], RELEASED | SINGLE)
+
+    def test_slow_release_fires_now(self):
+        classifier = ClickClassifier(exclusive_clicks=True)
+        self.assertEqual(click(classifier, 100, 700)[1], RELEASED | SINGLE)
+
+    def test_late_press_flushes_held(self):
+        classifier = ClickClassifier(exclusive_clicks=True)
+        click(classifier, 100, 200)
+        self.assertEqual(classifier.update(True, 800), SINGLE | PRESSED)
+
+    def test_long_then_no_click(self):
+        classifier = ClickClassifier(exclusive_clicks=True, long_click_enable=True)
+        classifier.update(True, 100)
+        self.assertEqual(classifier.update(False, 2500), LONG | RELEASED)
+        self.assertIsNone(classifier.next_deadline)
+
+
+class TestEventDetails(TestCase):
+    def test_release_details(self):
+        classifier = ClickClassifier()
+        classifier.update(True, 100)
+        self.assertEqual(classifier.press_duration, 0)
+        classifier.update(False, 250)
+        self.assertEqual(classifier.event_time, 250)
+        self.assertEqual(classifier.press_duration, 150)
+        self.assertEqual(classifier.clicks, 1)
+        classifier.update(True, 300)
+        classifier.update(False, 320)
+        self.assertEqual(classifier.clicks, 2)
+        self.assertEqual(classifier.press_duration, 20)
+
+    def test_long_click_details(self):
+        classifier = ClickClassifier(long_click_enable=True)
+        classifier.update(True, 100)
+        classifier.advance(2500)
+        self.assertEqual(classifier.event_time, 2100)
+        self.assertEqual(classifier.press_duration, 2000)
+
+    def test_held_click_time(self):
+        classifier = ClickClassifier(exclusive_clicks=True)
+        classifier.update(True, 100)
+        classifier.update(False, 200)
+        classifier.advance(650)
+        self.assertEqual(classifier.event_time, 600)
+
+
+class TestHoldStages(TestCase):
+    def setUp(self):
+        self.classifier = ClickClassifier(hold_thresholds=(1.0, 3.0, 10.0))
+        self.stages = [ClickClassifier.hold_event(i) for i in range(3)]
+
+    def test_hold_events_are_distinct(self):
+        self.assertEqual(len(set(self.stages)), 3)
+        for event in (PRESSED, RELEASED, SINGLE, DOUBLE, TRIPLE, LONG):
+            self.assertNotIn(event, self.stages)
+
+    def test_stages_fire_in_turn(self):
+        classifier = self.classifier
+        classifier.update(True, 100)
+        self.assertEqual(classifier.next_deadline, 1101)
+        self.assertEqual(classifier.advance(1100), 0)
+        self.assertEqual(classifier.advance(1101), self.stages[0])
+        self.assertEqual(classifier.event_time, 1100)
+        self.assertEqual(classifier.next_deadline, 3101)
+        self.assertEqual(classifier.advance(2000), 0)
+        self.assertEqual(classifier.advance(3200), self.stages[1])
+        self.assertEqual(classifier.press_duration, 3000)
+        self.assertEqual(classifier.update(False, 4000), RELEASED)
+        self.assertIsNone(classifier.next_deadline)
+
+    def test_late_advance_all_stages(self):
+        self.classifier.update(True, 0)
+        self.assertEqual(
+            self.classifier.advance(20000),
+            self.stages[0] | self.stages[1] | self.stages[2],
+        )
+        self.assertIsNone(self.classifier.next_deadline)
+
+    def test_short_press_still_clicks(self):
+        self.classifier.update(True, 100)
+        self.assertEqual(self.classifier.update(False, 500), RELEASED | SINGLE)
+
+    def test_release_time_sets_stage(self):
+        self.classifier.update(True, 100)
+        self.assertEqual(self.classifier.update(False, 1200), self.stages[0] | RELEASED)
+
+    def test_deadline_with_long_click(self):
+        classifier = ClickClassifier(
+            long_click_enable=True, long_click_min_duration=2.0, hold_thresholds=(1, 5)
+        )
+        classifier.update(True, 0)
+        self.assertEqual(classifier.next_deadline, 1001)
+        classifier.advance(1001)
+        self.assertEqual(classifier.next_deadline, 2001)
+        classifier.advance(2001)
+        self.assertEqual(classifier.next_deadline, 5001)
+
+    def test_bad_thresholds(self):
+        with self.assertRaises(ValueError):
+            ClickClassifier(hold_thresholds=(3, 1))
+        with self.assertRaises(ValueError):
+            ClickClassifier(hold_thresholds=(0, 1))
+        with self.assertRaises(ValueError):
+            ClickClassifier(hold_thresholds=range(1, 10))
@@ -0,0 +1,214 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for matching sequences of events across buttons
+"""
+import asyncio
+import sys
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+sys.modules.setdefault("countio", MagicMock())
+
+# pylint: disable=wrong-import-position
+from async_button import Button, ComboMatcher, MultiButton
+from async_button_testing import ScriptedKeys, run_virtual
+
+SINGLE = Button.SINGLE
+LONG = Button.LONG
+PRESSED = Button.PRESSED
+
+
+def feed_all(matcher, events):
+    return [matcher.feed(source, bits, time) for time, source, bits in events]
+
+
+class TestComboMatcher(TestCase):
+    def setUp(self):
+        self.matcher = ComboMatcher()
+        self.matcher.add_sequence(
+            "unlock", [("a", SINGLE), ("a", SINGLE), ("b", SINGLE), ("c", LONG, 3)]
+        )
+
+    def test_match(self):
+        results = feed_all(
+            self.matcher,
+            [
+                (0, "a", SINGLE),
+                (500, "a", SINGLE),
+                (900, "b", SINGLE),
+                (3000, "c", LONG),
+            ],
+        )
+        self.assertEqual(results, [None, None, None, "unlock"])
+        self.assertEqual(self.matcher.last_match, "unlock")
+
+    def test_other_events_ignored(self):
+        results = feed_all(
+            self.matcher,
+            [
+                (0, "a", PRESSED),
+                (100, "a", SINGLE | Button.RELEASED),
+                (200, "x", SINGLE),
+                (300, "a", SINGLE),
+                (400, "b", SINGLE),
+                (500, "c", LONG),
+            ],
+        )
+        self.assertEqual(results[-1], "unlock")
+
+    def test_wrong_step_restarts(self):
+        results = feed_all(
+            self.matcher,
+            [(0, "a", SINGLE), (100, "b", SINGLE), (200, "c", LONG)],
+        )
+        self.assertEqual(results, [None, None, None])
+
+    def test_wrong_step_then_rest(self):
+        # "a, b, c" must not resume the partial match that "b" broke
+        results = feed_all(
+            self.matcher,
+            [
+                (0, "a", SINGLE),
+                (100, "b", SINGLE),
+                (200, "c", LONG),
+                (300, "a", SINGLE),
+                (400, "b", SINGLE),
+                (500, "c", LONG),
+            ],
+        )
+        self.assertEqual(results, [None] * 6)
+
+    def test_repeated_step_breaks(self):
+        matcher = ComboMatcher()
+        matcher.add_sequence("abc", [("a", SINGLE), ("b", SINGLE), ("c", SINGLE)])
+        results = feed_all(
+            matcher,
+            [
+                (0, "a", SINGLE),
+                (100, "b", SINGLE),
+                (200, "b", SINGLE),
+                (300, "c", SINGLE),
+            ],
+        )
+        self.assertEqual(results, [None] * 4)
+        results = feed_all(
+            matcher,
+            [
+                (400, "a", SINGLE),
+                (500, "x", SINGLE),
+                (600, "b", SINGLE),
+                (700, "c", SINGLE),
+            ],
+        )
+        self.assertEqual(results, [None, None, None, "abc"])
+
+    def test_overlapping_start(self):
+        # the third "a" continues from the second one
+        results = feed_all(
+            self.matcher,
+            [
+                (0, "a", SINGLE),
+                (100, "a", SINGLE),
+                (200, "a", SINGLE),
+                (300, "b", SINGLE),
+                (400, "c", LONG),
+            ],
+        )
+        self.assertEqual(results[-1], "unlock")
+
+    def test_timeout(self):
+        results = feed_all(
+            self.matcher,
+            [
+                (0, "a", SINGLE),
+                (1500, "a", SINGLE),
+                (1600, "b", SINGLE),
+                (1700, "c", LONG),
+            ],
+        )
+        self.assertEqual(results[-1], None)
+        feed_all(
+            self.matcher,
+            [(2000, "a", SINGLE), (2100, "a", SINGLE), (2200, "b", SINGLE)],
+        )
+        self.assertEqual(self.matcher.feed("c", LONG, 5300), None)
+
+    def test_timeout_restarts_match(self):
+        results = feed_all(
+            self.matcher,
+            [
+                (0, "a", SINGLE),
+                (2000, "a", SINGLE),
+                (2500, "a", SINGLE),
+                (2600, "b", SINGLE),
+                (2700, "c", LONG),
+            ],
+        )
+        self.assertEqual(results[-1], "unlock")
+
+    def test_many_sequences(self):
+        self.matcher.add_sequence("test", [("b", SINGLE), ("b", LONG)])
+        self.matcher.add_sequence("reset", [("c", SINGLE), ("c", SINGLE)])
+        results = feed_all(
+            self.matcher,
+            [
+                (0, "c", SINGLE),
+                (100, "b", SINGLE),
+                (200, "b", LONG),
+                (300, "c", SINGLE),
+                (400, "c", SINGLE),
+            ],
+        )
+        self.assertEqual(results, [None, None, "test", None, "reset"])
+
+    def test_contained_sequence(self):
+        self.matcher.add_sequence("b", [("b", SINGLE)])
+        results = feed_all(self.matcher, [(0, "a", SINGLE), (100, "b", SINGLE)])
+        self.assertEqual(results, [None, "b"])
+
+    def test_bad_sequences(self):
+        for steps in ([], [("a", SINGLE | LONG)], [("a", SINGLE), ("a", 0)]):
+            with self.assertRaises(ValueError):
+                self.matcher.add_sequence("bad", steps)
+        with self.assertRaises(ValueError):
+            self.matcher.add_sequence("bad", [("a", SINGLE), ("a", SINGLE, 0.2)])
+
+    def test_reset(self):
+        feed_all(self.matcher, [(0, "a", SINGLE), (100, "a", SINGLE)])
+        self.matcher.reset()
+        results = feed_all(self.matcher, [(200, "b", SINGLE), (300, "c", LONG)])
+        self.assertEqual(results, [None, None])
+
+
+class TestComboButtons(TestCase):
+    def test_combo_from_buttons(self):
+        traces = {
+            "a": [(100, True), (200, False), (1000, True), (1100, False)],
+            "b": [(2000, True), (2100, False)],
+        }
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            keys = [ScriptedKeys(loop.ticks_ms, trace) for trace in traces.values()]
+            with patch("async_button.keypad.Keys", side_effect=keys):
+                multi = MultiButton(
+                    **{
+                        name: Button(0, True, clock=loop.ticks_ms, start=False)
+                        for name in traces
+                    }
+                )
+            combos = ComboMatcher()
+            combos.add_sequence("ab", [("a", SINGLE), ("b", SINGLE)])
+            combos.add_sequence("aab", [("a", SINGLE), ("a", SINGLE), ("b", SINGLE)])
+            combos.attach(multi)
+            with patch("async_button.keypad.Keys", side_effect=keys):
+                multi.start()
+            try:
+                return await combos.wait("aab")
+            finally:
+                for button in multi.buttons.values():
+                    button.deinit()
+
+        self.assertEqual(run_virtual(main()), "aab")
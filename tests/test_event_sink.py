@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for the binary event sink and its decoder
+"""
+import io
+from unittest import TestCase
+from unittest.mock import patch
+
+from async_button import ClickClassifier, EventRecord, EventSink
+from async_button_analysis import decode_events
+
+PRESSED = ClickClassifier.PRESSED
+RELEASED = ClickClassifier.RELEASED
+SINGLE = ClickClassifier.SINGLE
+
+
+def make_record(events, timestamp, duration=0, clicks=1):
+    record = EventRecord()
+    record.events = events
+    record.timestamp = timestamp
+    record.duration = duration
+    record.clicks = clicks
+    return record
+
+
+class TestEventSink(TestCase):
+    def setUp(self):
+        self.now = 0
+        self.patch = patch("async_button.ticks_ms", new=lambda: self.now)
+        self.patch.start()
+        self.stream = io.BytesIO()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_nothing_written_early(self):
+        sink = EventSink(self.stream)
+        sink.add(0, make_record(PRESSED, 100))
+        self.assertEqual(len(sink), 1)
+        self.assertEqual(self.stream.getvalue(), b"")
+        sink.flush()
+        self.assertEqual(len(sink), 0)
+        self.assertEqual(len(self.stream.getvalue()), EventSink.RECORD_SIZE)
+        self.assertEqual(sink.records_written, 1)
+
+    def test_round_trip(self):
+        sink = EventSink(self.stream)
+        sink.add(3, make_record(PRESSED, 100))
+        sink.add(3, make_record(RELEASED | SINGLE, 250, 150, 2))
+        sink.add(255, make_record(ClickClassifier.hold_event(7), (1 << 29) - 1, 5000))
+        sink.flush()
+        self.assertEqual(
+            decode_events(self.stream.getvalue()),
+            [
+                (3, PRESSED, 100, 0, 1),
+                (3, RELEASED | SINGLE, 250, 150, 2),
+                (255, ClickClassifier.hold_event(7), (1 << 29) - 1, 5000, 1),
+            ],
+        )
+
+    def test_full_buffer_written(self):
+        writes = []
+        self.stream.write = lambda data: writes.append(bytes(data))
+        sink = EventSink(self.stream, capacity=4)
+        for i in range(9):
+            sink.add(0, make_record(PRESSED, i))
+        self.assertEqual([len(x) for x in writes], [4 * EventSink.RECORD_SIZE] * 2)
+        self.assertEqual(len(sink), 1)
+        self.assertEqual(
+            [x[2] for x in decode_events(b"".join(writes))], list(range(8))
+        )
+
+    def test_service_flushes_later(self):
+        sink = EventSink(self.stream, flush_interval=0.5)
+        sink.service(10000)
+        self.now = 1000
+        sink.add(0, make_record(PRESSED, 1000))
+        self.now = 1200
+        sink.add(0, make_record(RELEASED, 1200))
+        sink.service(1499)
+        self.assertEqual(self.stream.getvalue(), b"")
+        sink.service(1500)
+        self.assertEqual(len(decode_events(self.stream.getvalue())), 2)
+
+    def test_bad_capacity(self):
+        with self.assertRaises(ValueError):
+            EventSink(self.stream, capacity=0)
+
+    def test_decode_partial_record(self):
+        with self.assertRaises(ValueError):
+            decode_events(bytes(EventSink.RECORD_SIZE + 1))
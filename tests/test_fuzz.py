@@ -0,0 +1,114 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for the differential fuzz harness
+"""
+import random
+import sys
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+sys.modules.setdefault("countio", MagicMock())
+
+# pylint: disable=wrong-import-position
+import async_button_testing
+from async_button import Button
+from async_button_analysis import classify_edges
+from async_button_testing import ENGINES, fuzz, fuzz_trace
+
+SETTINGS = (
+    {},
+    {"long_click_enable": True},
+    {"triple_click_enable": True, "long_click_enable": True, "exclusive_clicks": True},
+    {"double_click_enable": False, "long_click_enable": True},
+    {"exclusive_clicks": True, "double_click_max_duration": 0.3},
+    {"hold_thresholds": (1.0, 3.0)},
+)
+
+classifier_engine = ENGINES["classifier"]
+
+
+def without_doubles(timestamps, pressed, end, **kwargs):
+    result = classifier_engine(timestamps, pressed, end, **kwargs)
+    return [(time, events & ~Button.DOUBLE) for time, events in result]
+
+
+class TestFuzzTrace(TestCase):
+    def test_repeatable(self):
+        first = fuzz_trace(random.Random(5), 500)
+        second = fuzz_trace(random.Random(5), 500)
+        self.assertEqual(first, second)
+
+    def test_edges(self):
+        timestamps, pressed = fuzz_trace(random.Random(5), 2000)
+        self.assertEqual(list(pressed[:4]), [1, 0, 1, 0])
+        gaps = [b - a for a, b in zip(timestamps, timestamps[1:])]
+        self.assertGreater(min(gaps), 0)
+        self.assertTrue(any(gap <= 5 for gap in gaps))
+        durations = [gaps[i] for i in range(0, len(gaps), 2)]
+        self.assertTrue(any(abs(duration - 2000) <= 1 for duration in durations))
+
+    def test_min_gap(self):
+        timestamps, _ = fuzz_trace(random.Random(5), 2000, bounce=0.5, min_gap=41)
+        gaps = [b - a for a, b in zip(timestamps, timestamps[1:])]
+        self.assertGreaterEqual(min(gaps), 41)
+
+
+class TestFuzz(TestCase):
+    def test_engines_agree(self):
+        for seed, settings in enumerate(SETTINGS):
+            divergence = fuzz(
+                seed,
+                edges=10000,
+                engines=("vectorised", "classifier", "matrix"),
+                **settings
+            )
+            self.assertIsNone(divergence, settings)
+
+    def test_default_engine(self):
+        with patch.dict(async_button_testing.ENGINES, classifier=without_doubles):
+            self.assertIsNone(fuzz(1, edges=2000))
+            divergence = fuzz(1, edges=2000, hold_thresholds=(1.0,))
+        # the vectorised engine cannot do hold stages, so the classifier is used instead
+        self.assertEqual(divergence.engine, "classifier")
+        self.assertEqual(divergence.expected[1], Button.DOUBLE)
+
+    def test_button_agrees(self):
+        for seed, settings in enumerate(SETTINGS[:3]):
+            divergence = fuzz(
+                seed,
+                edges=400,
+                chunk=200,
+                engines=("button",),
+                bounce=0,
+                min_gap=41,
+                **settings
+            )
+            self.assertIsNone(divergence, settings)
+
+    def test_button_long_at_release(self):
+        divergence = fuzz(
+            1,
+            edges=1000,
+            engines=("button",),
+            near=0.2,
+            min_gap=41,
+            long_click_enable=True,
+        )
+        self.assertIsNone(divergence)
+
+    def test_reports_divergence(self):
+        with patch.dict(async_button_testing.ENGINES, broken=without_doubles):
+            divergence = fuzz(1, engines=("classifier", "broken"))
+        self.assertEqual(divergence.engine, "broken")
+        self.assertEqual(divergence.expected[1], Button.DOUBLE)
+        self.assertNotEqual(divergence.actual, divergence.expected)
+        self.assertIn("DOUBLE", str(divergence))
+        self.assertLessEqual(len(divergence.timestamps), 1000)
+
+    def test_vectorise_flag(self):
+        with self.assertRaises(ValueError):
+            classify_edges([0, 100], [True, False], vectorise=True, hold_thresholds=[1])
+        events, _ = classify_edges([0, 100], [True, False], vectorise=False)
+        self.assertEqual(list(events), [Button.PRESSED, Button.RELEASED, Button.SINGLE])
@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for keeping garbage collections out of gestures
+"""
+import asyncio
+import sys
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+sys.modules.setdefault("countio", MagicMock())
+
+# pylint: disable=wrong-import-position
+from async_button import Button, GCScheduler
+from async_button_testing import ScriptedKeys, run_virtual
+
+# a single click from 1000 to 1100 ms, so the double click window closes at 1500 ms
+CLICK = [(1000, True), (1100, False)]
+
+
+def fake_gc(**kwargs):
+    return SimpleNamespace(
+        collect=MagicMock(), enable=MagicMock(), disable=MagicMock(), **kwargs
+    )
+
+
+async def run_scheduler(fake, until, watch=None, **kwargs):
+    loop = asyncio.get_running_loop()
+    keys = ScriptedKeys(loop.ticks_ms, CLICK)
+    with patch("async_button.keypad.Keys", return_value=keys), patch(
+        "async_button.gc", fake
+    ):
+        button = Button(0, True, clock=loop.ticks_ms)
+        scheduler = GCScheduler([button], collect_interval=10, **kwargs)
+        try:
+            if watch is not None:
+                await watch(loop, scheduler)
+            await asyncio.sleep(until / 1000 - loop.time())
+        finally:
+            scheduler.deinit()
+            button.deinit()
+    return scheduler
+
+
+class TestGCScheduler(TestCase):
+    def test_deferred_during_gesture(self):
+        async def watch(loop, scheduler):
+            await asyncio.sleep(1.075)
+            self.assertTrue(scheduler.critical)
+            fake.disable.assert_called_once()
+            fake.collect.assert_not_called()
+            await scheduler.wait_idle()
+            self.assertGreaterEqual(loop.ticks_ms(), 1500)
+            self.assertLess(loop.ticks_ms(), 1600)
+            fake.enable.assert_called_once()
+            fake.collect.assert_called_once()
+
+        fake = fake_gc(mem_alloc=lambda: 10000)
+        scheduler = run_virtual(run_scheduler(fake, 3000, watch))
+        self.assertFalse(scheduler.critical)
+        self.assertEqual(scheduler.scheduled_collections, 1)
+
+    def test_counts_collections(self):
+        def mem_alloc():
+            now = asyncio.get_running_loop().ticks_ms()
+            if now >= 3000:
+                return 2000
+            if now >= 1200:
+                return 5000
+            return 10000
+
+        fake = fake_gc(mem_alloc=mem_alloc)
+        scheduler = run_virtual(run_scheduler(fake, 4000))
+        self.assertEqual(scheduler.critical_collections, 1)
+        self.assertEqual(scheduler.idle_collections, 2)
+        self.assertEqual(scheduler.scheduled_collections, 1)
+
+    def test_not_deferred(self):
+        fake = fake_gc(mem_alloc=lambda: 10000)
+        scheduler = run_virtual(run_scheduler(fake, 2000, defer=False))
+        fake.disable.assert_not_called()
+        self.assertEqual(scheduler.scheduled_collections, 1)
+
+    def test_gc_callbacks(self):
+        async def watch(_loop, _scheduler):
+            fake.callbacks[0]("start", {})
+            await asyncio.sleep(1.075)
+            fake.callbacks[0]("start", {})
+            fake.callbacks[0]("stop", {})
+
+        fake = fake_gc(callbacks=[])
+        scheduler = run_virtual(run_scheduler(fake, 2000, watch))
+        self.assertEqual(scheduler.critical_collections, 1)
+        self.assertEqual(scheduler.idle_collections, 1)
+        self.assertEqual(fake.callbacks, [])
+
+    def test_wait_idle_when_idle(self):
+        async def watch(loop, scheduler):
+            await scheduler.wait_idle()
+            self.assertEqual(loop.ticks_ms(), 0)
+
+        run_virtual(run_scheduler(fake_gc(mem_alloc=lambda: 0), 100, watch))
@@ -0,0 +1,290 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for the array based key matrix classifier
+"""
+import asyncio
+import random
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import MagicMock
+
+import keypad
+
+import async_button
+from async_button import ClickClassifier, KeyMatrixClassifier
+from async_button_testing import ScriptedKeys, run_virtual
+
+PRESSED = ClickClassifier.PRESSED
+RELEASED = ClickClassifier.RELEASED
+SINGLE = ClickClassifier.SINGLE
+DOUBLE = ClickClassifier.DOUBLE
+TRIPLE = ClickClassifier.TRIPLE
+LONG = ClickClassifier.LONG
+
+PROFILES = (
+    ClickClassifier(),
+    ClickClassifier(triple_click_enable=True, long_click_enable=True),
+    ClickClassifier(exclusive_clicks=True, long_click_min_duration=0.3),
+    ClickClassifier(
+        exclusive_clicks=True, triple_click_enable=True, long_click_enable=True
+    ),
+    ClickClassifier(double_click_enable=False, long_click_enable=True),
+)
+
+
+class TestKeyMatrixClassifier(TestCase):
+    def test_double_click_one_key(self):
+        classifier = KeyMatrixClassifier(4)
+        self.assertEqual(classifier.update(1, True, 100), PRESSED)
+        self.assertEqual(classifier.update(1, False, 200), RELEASED | SINGLE)
+        self.assertEqual(classifier.update(2, True, 250), PRESSED)
+        self.assertEqual(classifier.update(2, False, 260), RELEASED | SINGLE)
+        self.assertEqual(classifier.update(1, True, 300), PRESSED)
+        self.assertEqual(classifier.update(1, False, 400), RELEASED | DOUBLE)
+        self.assertTrue(not classifier.pressed(1))
+        self.assertEqual(classifier.last_click(1), DOUBLE)
+
+    def test_long_click_from_advance(self):
+        classifier = KeyMatrixClassifier(
+            20, profiles=PROFILES[:2], key_profiles=[0] * 19 + [1]
+        )
+        classifier.update(19, True, 100)
+        classifier.update(3, True, 100)
+        self.assertEqual(classifier.advance(2000), 0)
+        self.assertEqual(classifier.advance(2101), 1)
+        self.assertEqual(classifier.fired_keys[0], 19)
+        self.assertEqual(classifier.fired_events[0], LONG)
+        self.assertEqual(classifier.advance(2200), 0)
+        self.assertEqual(classifier.update(19, False, 2300), RELEASED)
+
+    def test_long_click_high_keys(self):
+        classifier = KeyMatrixClassifier(100, profiles=PROFILES[1:2])
+        classifier.update(99, True, 100)
+        classifier.update(40, True, 150)
+        classifier.update(40, True, 150)
+        self.assertEqual(classifier.advance(2101), 1)
+        self.assertEqual(classifier.fired_keys[0], 99)
+        self.assertEqual(classifier.advance(2151), 1)
+        self.assertEqual(classifier.fired_keys[0], 40)
+        self.assertEqual(classifier.advance(5000), 0)
+        classifier.update(99, False, 5000)
+        classifier.update(99, True, 6000)
+        self.assertEqual(classifier.advance(8001), 1)
+        self.assertEqual(classifier.fired_keys[0], 99)
+
+    def test_advance_some_keys(self):
+        classifier = KeyMatrixClassifier(4, profiles=PROFILES[1:2])
+        classifier.update(1, True, 100)
+        classifier.update(2, True, 100)
+        self.assertEqual(classifier.advance(2200, bytearray([0, 0, 1, 0]), 1), 1)
+        self.assertEqual(classifier.fired_keys[0], 2)
+        self.assertEqual(classifier.advance(2200), 1)
+        self.assertEqual(classifier.fired_keys[0], 1)
+
+    def test_hold_thresholds_rejected(self):
+        with self.assertRaises(ValueError):
+            KeyMatrixClassifier(4, profiles=(ClickClassifier(hold_thresholds=(1,)),))
+
+    def test_bad_profile(self):
+        classifier = KeyMatrixClassifier(4)
+        with self.assertRaises(ValueError):
+            classifier.set_profile(0, 1)
+
+    def test_matches_click_classifier(self):
+        rng = random.Random(1)
+        key_count = 40
+        classifier = KeyMatrixClassifier(
+            key_count,
+            profiles=PROFILES,
+            key_profiles=[key % len(PROFILES) for key in range(key_count)],
+        )
+        references = [
+            ClickClassifier(
+                double_click_max_duration=PROFILES[key % 5].double_click_max_duration,
+                long_click_min_duration=PROFILES[key % 5].long_click_min_duration,
+                double_click_enable=PROFILES[key % 5].click_enabled[DOUBLE],
+                triple_click_enable=PROFILES[key % 5].click_enabled[TRIPLE],
+                long_click_enable=PROFILES[key % 5].click_enabled[LONG],
+                exclusive_clicks=PROFILES[key % 5].exclusive_clicks,
+            )
+            for key in range(key_count)
+        ]
+        pressed = [False] * key_count
+        now = 0
+        for _ in range(20000):
+            now += rng.randint(1, 60)
+            if rng.random() < 0.5:
+                key = rng.randrange(key_count)
+                pressed[key] = not pressed[key]
+                self.assertEqual(
+                    classifier.update(key, pressed[key], now),
+                    references[key].update(pressed[key], now),
+                )
+            else:
+                expected = {}
+                for key, reference in enumerate(references):
+                    fired = reference.advance(now)
+                    if fired:
+                        expected[key] = fired
+                count = classifier.advance(now)
+                result = {
+                    classifier.fired_keys[i]: classifier.fired_events[i]
+                    for i in range(count)
+                }
+                self.assertEqual(result, expected)
+
+
+class TestButtonMatrix(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.time = 0
+        self.edges = []
+        self.keys = MagicMock()
+        self.keys.key_count = 8
+        self.keys.events.get_into = self.get_into
+        self.original_ticks = async_button.ticks_ms
+        async_button.ticks_ms = lambda: self.time
+
+    def tearDown(self):
+        async_button.ticks_ms = self.original_ticks
+
+    def get_into(self, event: keypad.Event):
+        self.time += 10
+        if self.edges and self.edges[0][0] <= self.time:
+            _, key, pressed = self.edges.pop(0)
+            # pylint: disable=protected-access
+            event._key_number = key
+            event._pressed = pressed
+            return True
+        return False
+
+    async def test_wait_for_key(self):
+        matrix = async_button.ButtonMatrix(self.keys, interval=0)
+        self.edges = [(100, 3, True), (200, 3, False), (300, 5, True), (400, 5, False)]
+        self.assertEqual(await matrix.wait(SINGLE), (3, [SINGLE]))
+        self.assertEqual(await matrix.wait(SINGLE), (5, [SINGLE]))
+        matrix.deinit()
+        self.keys.deinit.assert_called_once()
+
+    async def test_wait_for_specific_keys(self):
+        matrix = async_button.ButtonMatrix(self.keys, interval=0)
+        self.edges = [(100, 3, True), (200, 3, False), (300, 5, True), (400, 5, False)]
+        self.assertEqual(
+            await matrix.wait((PRESSED, SINGLE), keys=(5,)), (5, [PRESSED])
+        )
+        matrix.deinit()
+
+    async def test_simultaneous_events_kept(self):
+        matrix = async_button.ButtonMatrix(self.keys, interval=0)
+        self.edges = [(100, 1, True), (100, 2, True)]
+        results = []
+        for _ in range(2):
+            results.append(await matrix.wait(PRESSED))
+        self.assertEqual(results, [(1, [PRESSED]), (2, [PRESSED])])
+        matrix.deinit()
+        await asyncio.sleep(0)
+
+
+TIERS = {"key_tiers": [0, 1, 1, 1], "tier_intervals": (0.005, 0.05)}
+
+
+async def record_events(trace, run_ms, handler_ms=0, **kwargs):
+    """
+    Run a trace through a ButtonMatrix, returning ``(time, key, events)`` for everything
+    dispatched, and the matrix
+    """
+    loop = asyncio.get_running_loop()
+    matrix = async_button.ButtonMatrix(
+        ScriptedKeys(loop.ticks_ms, trace, key_count=len(kwargs["key_tiers"])),
+        clock=loop.ticks_ms,
+        **kwargs,
+    )
+    seen = []
+
+    async def watch():
+        while True:
+            key, events = await matrix.wait()
+            seen.append((loop.ticks_ms(), key, events))
+            if key:
+                loop.busy(handler_ms / 1000)
+
+    task = asyncio.create_task(watch())
+    await asyncio.sleep(run_ms / 1000)
+    task.cancel()
+    matrix.deinit()
+    return seen, matrix
+
+
+class TestMatrixTiers(TestCase):
+    def test_critical_key_first(self):
+        trace = [(10, 1, True), (11, 2, True), (12, 0, True)]
+        seen, matrix = run_virtual(record_events(trace, 100, **TIERS))
+        self.assertEqual([key for _, key, _ in seen], [0, 1, 2])
+        self.assertLessEqual(seen[0][0], 17)
+        self.assertGreaterEqual(seen[1][0], 50)
+        self.assertLessEqual(matrix.tier_max_latency[0], 5)
+        self.assertGreater(matrix.tier_max_latency[1], 5)
+
+    def test_relaxed_keep_timestamps(self):
+        trace = [(10, 1, True), (20, 1, False), (30, 1, True), (40, 1, False)]
+        seen, _ = run_virtual(record_events(trace, 100, **TIERS))
+        self.assertEqual(
+            [events for _, _, events in seen],
+            [[PRESSED], [RELEASED, SINGLE], [PRESSED], [RELEASED, DOUBLE]],
+        )
+
+    def test_relaxed_long_click(self):
+        profiles = (ClickClassifier(long_click_enable=True),)
+        trace = [(10, 0, True), (10, 1, True)]
+        seen, _ = run_virtual(record_events(trace, 2200, profiles=profiles, **TIERS))
+        longs = [(time, key) for time, key, events in seen if LONG in events]
+        self.assertEqual(len(longs), 2)
+        self.assertEqual(longs[0][1], 0)
+        self.assertLessEqual(longs[0][0], 2016)
+        self.assertLessEqual(longs[1][0], 2061)
+
+    def test_high_key_numbers(self):
+        profiles = (ClickClassifier(long_click_enable=True),)
+        tiers = {"key_tiers": [1] * 63 + [0], "tier_intervals": (0.005, 0.05)}
+        trace = [(10, 40, True), (10, 63, True)]
+        seen, _ = run_virtual(record_events(trace, 2200, profiles=profiles, **tiers))
+        longs = [(time, key) for time, key, events in seen if LONG in events]
+        self.assertEqual([key for _, key in longs], [63, 40])
+        self.assertLessEqual(longs[0][0], 2016)
+
+    def test_queue_overflow(self):
+        trace = []
+        for i in range(40):
+            trace += [(10 + i, 1 + i % 3, i % 6 < 3)]
+        seen, _ = run_virtual(record_events(trace, 100, **TIERS))
+        presses = [
+            events[0] for _, _, events in seen if events[0] in (PRESSED, RELEASED)
+        ]
+        self.assertEqual(
+            presses, [PRESSED if i % 6 < 3 else RELEASED for i in range(40)]
+        )
+
+    def test_critical_bound_under_load(self):
+        trace = []
+        for start in range(0, 2000, 100):
+            for key in (1, 2, 3):
+                trace += [(start, key, True), (start + 1, key, False)]
+            trace += [(start + 2, 0, True), (start + 50, 0, False)]
+        trace.sort()
+        _, matrix = run_virtual(record_events(trace, 2200, handler_ms=8, **TIERS))
+        self.assertLessEqual(matrix.tier_max_latency[0], 5 + 8)
+        _, matrix = run_virtual(
+            record_events(trace, 2200, handler_ms=8, key_tiers=[0, 0, 0, 0])
+        )
+        self.assertGreater(matrix.tier_max_latency[0], 40)
+
+    def test_bad_tiers(self):
+        async def make(**kwargs):
+            keys = MagicMock()
+            keys.key_count = 4
+            async_button.ButtonMatrix(keys, **kwargs)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(make(tier_intervals=(0.05, 0.005)))
+        with self.assertRaises(ValueError):
+            asyncio.run(make(key_tiers=[0, 1, 0, 0]))
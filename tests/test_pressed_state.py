@@ -0,0 +1,178 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for the pressed bitmap kept by MultiButton and ButtonMatrix
+"""
+import asyncio
+import sys
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+
+sys.modules.setdefault("countio", MagicMock())
+
+# pylint: disable=wrong-import-position
+from async_button import Button, ButtonMatrix, MultiButton, PressedState
+from async_button_testing import ScriptedKeys, run_virtual
+
+
+class TestPressedState(TestCase):
+    def setUp(self):
+        self.now = [0]
+        self.state = PressedState(4, clock=lambda: self.now[0])
+
+    def test_starts_released(self):
+        self.assertFalse(self.state.any_pressed())
+        self.assertEqual(self.state.pressed_mask(), 0)
+        self.assertEqual(self.state.held_ms(2), 0)
+
+    def test_press_and_release(self):
+        self.state.update(1, True, 100)
+        self.state.update(3, True, 150)
+        self.now[0] = 400
+        self.assertTrue(self.state.any_pressed())
+        self.assertEqual(self.state.pressed_mask(), 0b1010)
+        self.assertTrue(self.state.is_pressed(3))
+        self.assertFalse(self.state.is_pressed(0))
+        self.assertEqual(self.state.held_ms(1), 300)
+        self.assertEqual(self.state.held_ms(3), 250)
+        self.state.update(1, False, 500)
+        self.assertEqual(self.state.pressed_mask(), 0b1000)
+        self.assertEqual(self.state.held_ms(1), 0)
+
+    def test_ticks_wraparound(self):
+        self.state.update(0, True, (1 << 29) - 50)
+        self.now[0] = 50
+        self.assertEqual(self.state.held_ms(0), 100)
+
+    def test_repeated_press(self):
+        self.state.update(2, True, 100)
+        self.state.update(2, True, 200)
+        self.state.update(2, False, 300)
+        self.assertFalse(self.state.any_pressed())
+        self.assertEqual(self.state.pressed_mask(), 0)
+
+    def test_large_group(self):
+        state = PressedState(100, clock=lambda: self.now[0])
+        state.update(99, True, 100)
+        state.update(40, True, 100)
+        state.update(40, False, 200)
+        self.now[0] = 300
+        self.assertTrue(state.any_pressed())
+        self.assertTrue(state.is_pressed(99))
+        self.assertFalse(state.is_pressed(40))
+        self.assertEqual(state.held_ms(99), 200)
+        with self.assertRaises(ValueError):
+            state.pressed_mask()
+
+
+class TestGroups(TestCase):
+    def test_multi_button(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            traces = {
+                "a": [(100, True), (900, False)],
+                "b": [(300, True), (400, False)],
+                "c": [(600, True), (2000, False)],
+            }
+            keys = [ScriptedKeys(loop.ticks_ms, trace) for trace in traces.values()]
+            with patch("async_button.keypad.Keys", side_effect=keys):
+                multi = MultiButton(
+                    **{name: Button(0, True, clock=loop.ticks_ms) for name in traces}
+                )
+            seen = []
+            try:
+                for moment in (50, 350, 700, 1000):
+                    await asyncio.sleep((moment - loop.ticks_ms()) / 1000)
+                    seen.append(
+                        (
+                            multi.any_pressed(),
+                            multi.pressed_mask(),
+                            multi.held_ms("a"),
+                            multi.held_ms("c"),
+                        )
+                    )
+            finally:
+                for button in multi.buttons.values():
+                    button.deinit()
+            return seen
+
+        self.assertEqual(
+            run_virtual(main()),
+            [
+                (False, 0, 0, 0),
+                (True, 0b011, 250, 0),
+                (True, 0b101, 600, 100),
+                (True, 0b100, 0, 400),
+            ],
+        )
+
+    def test_button_matrix(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            keys = ScriptedKeys(
+                loop.ticks_ms,
+                [(100, 5, True), (200, 0, True), (300, 5, False)],
+                key_count=8,
+            )
+            matrix = ButtonMatrix(keys, clock=loop.ticks_ms)
+            try:
+                await asyncio.sleep(0.25)
+                during = (matrix.pressed_mask(), matrix.held_ms(5), matrix.held_ms(0))
+                await asyncio.sleep(0.1)
+                after = (matrix.pressed_mask(), matrix.held_ms(5), matrix.held_ms(0))
+            finally:
+                matrix.deinit()
+            return during, after
+
+        self.assertEqual(run_virtual(main()), ((0b100001, 150, 50), (0b000001, 0, 150)))
+
+    def test_shares_one_state(self):
+        async def main():
+            with patch("async_button.keypad.Keys"):
+                buttons = {"x": Button(0, True), "y": Button(1, True)}
+                multi = MultiButton(**buttons)
+            for button in buttons.values():
+                button.deinit()
+            return multi, buttons
+
+        multi, buttons = asyncio.run(main())
+        self.assertEqual(buttons["x"].pressed_states, [(multi.pressed_state, 0)])
+        self.assertEqual(buttons["y"].pressed_states, [(multi.pressed_state, 1)])
+        self.assertIsInstance(multi.pressed_state, PressedState)
+
+    def test_overlapping_groups(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            traces = {
+                "a": [(100, True), (900, False)],
+                "b": [(300, True), (2000, False)],
+                "c": [(600, True), (700, False)],
+            }
+            keys = [ScriptedKeys(loop.ticks_ms, trace) for trace in traces.values()]
+            with patch("async_button.keypad.Keys", side_effect=keys):
+                buttons = {
+                    name: Button(0, True, clock=loop.ticks_ms) for name in traces
+                }
+            first = MultiButton(a=buttons["a"], b=buttons["b"])
+            second = MultiButton(b=buttons["b"], c=buttons["c"])
+            seen = []
+            try:
+                for moment in (400, 1000):
+                    await asyncio.sleep((moment - loop.ticks_ms()) / 1000)
+                    seen.append(
+                        (
+                            first.pressed_mask(),
+                            first.held_ms("b"),
+                            second.pressed_mask(),
+                            second.held_ms("b"),
+                        )
+                    )
+            finally:
+                for button in buttons.values():
+                    button.deinit()
+            return seen
+
+        self.assertEqual(
+            run_virtual(main()), [(0b11, 100, 0b01, 100), (0b10, 700, 0b01, 700)]
+        )
@@ -0,0 +1,198 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for RotaryEncoder, run in virtual time
+"""
+import asyncio
+import sys
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+
+sys.modules.setdefault("countio", MagicMock())
+
+# pylint: disable=wrong-import-position
+import async_button
+from async_button import Button, RotaryEncoder
+from async_button_testing import ScriptedKeys, run_virtual
+
+
+class FakeEncoder:
+    """Stand in for rotaryio.IncrementalEncoder, following a script of positions"""
+
+    def __init__(self, clock, script):
+        self.clock = clock
+        self.script = script
+        self.deinit = MagicMock()
+
+    @property
+    def position(self):
+        position = 0
+        for timestamp, value in self.script:
+            if self.clock() >= timestamp:
+                position = value
+        return position
+
+
+def run_encoder(script, trace, coro_fn, **kwargs):
+    async def main():
+        loop = asyncio.get_running_loop()
+        encoder = FakeEncoder(loop.ticks_ms, script)
+        rotaryio = MagicMock()
+        rotaryio.IncrementalEncoder.return_value = encoder
+        keys = ScriptedKeys(loop.ticks_ms, trace)
+        with patch("async_button.rotaryio", rotaryio), patch(
+            "async_button.keypad.Keys", return_value=keys
+        ):
+            knob = RotaryEncoder(1, 2, 3, clock=loop.ticks_ms, **kwargs)
+            try:
+                return await coro_fn(knob, loop)
+            finally:
+                knob.deinit()
+
+    return run_virtual(main())
+
+
+class TestRotaryEncoder(TestCase):
+    def test_fast_spin_is_one_event(self):
+        # five detents between two polls of the encoder
+        async def consume(knob, _loop):
+            return await knob.wait_rotation()
+
+        delta, velocity = run_encoder([(81, 1), (85, 3), (90, 5)], [], consume)
+        self.assertEqual(delta, 5)
+        self.assertGreater(velocity, 0)
+
+    def test_turns_coalesce_when_busy(self):
+        async def consume(knob, _loop):
+            first = await knob.wait_rotation()
+            await asyncio.sleep(1)  # busy while the knob turns back and forth
+            second = knob.rotation()
+            third = knob.rotation()
+            return first, second, third
+
+        script = [(100, 1), (300, 4), (500, 2), (700, -2)]
+        first, second, third = run_encoder(script, [], consume)
+        self.assertEqual(first[0], 1)
+        self.assertEqual(second[0], -3)
+        self.assertLess(second[1], 0)
+        self.assertEqual(third, (0, 0.0))
+
+    def test_velocity(self):
+        async def consume(knob, _loop):
+            await asyncio.sleep(1)
+            return knob.rotation()
+
+        # 10 detents in 500ms, first seen still at 100ms
+        script = [(100 + 50 * i, i) for i in range(11)]
+        delta, velocity = run_encoder(script, [], consume, interval=0.05)
+        self.assertEqual(delta, 10)
+        self.assertAlmostEqual(velocity, 20, delta=2)
+
+    def test_push_button_clicks(self):
+        async def consume(knob, _loop):
+            return await knob.wait((Button.DOUBLE, RotaryEncoder.ROTATED))
+
+        trace = [(100, True), (200, False), (300, True), (400, False)]
+        self.assertEqual(run_encoder([], trace, consume), [Button.DOUBLE])
+
+    def test_wait_all_includes_rotated(self):
+        async def consume(knob, _loop):
+            return await knob.wait()
+
+        self.assertEqual(run_encoder([(100, 1)], [], consume), [RotaryEncoder.ROTATED])
+
+    def test_rotation_record(self):
+        async def consume(knob, _loop):
+            record = await knob.wait_record(RotaryEncoder.ROTATED)
+            return record.events, record.timestamp, record.duration
+
+        trace = [(100, True), (300, False)]
+        events, timestamp, duration = run_encoder([(3000, 1)], trace, consume)
+        self.assertEqual(events, RotaryEncoder.ROTATED)
+        self.assertGreaterEqual(timestamp, 3000)
+        self.assertLess(timestamp, 3020)
+        self.assertEqual(duration, 0)
+
+    def test_rotation_own_record(self):
+        seen = []
+        sink = MagicMock()
+        sink.add = lambda source, record: seen.append(
+            (record.events, record.timestamp, record.duration)
+        )
+
+        async def consume(_knob, _loop):
+            await asyncio.sleep(3)
+
+        run_encoder([(2000, 1)], [(1000, True), (2000, False)], consume, sink=sink)
+        self.assertEqual(seen[0], (Button.PRESSED, 1000, 0))
+        self.assertEqual(seen[1][:2], (Button.RELEASED | Button.SINGLE, 2000))
+        self.assertEqual(seen[2][0], RotaryEncoder.ROTATED)
+        self.assertGreaterEqual(seen[2][1], 2000)
+        self.assertEqual(seen[2][2], 0)
+
+    def test_without_push_button(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            rotaryio = MagicMock()
+            rotaryio.IncrementalEncoder.return_value = FakeEncoder(
+                loop.ticks_ms, [(100, -1)]
+            )
+            keypad_keys = MagicMock()
+            with patch("async_button.rotaryio", rotaryio), patch(
+                "async_button.keypad.Keys", keypad_keys
+            ):
+                knob = RotaryEncoder(1, 2, clock=loop.ticks_ms)
+                result = await knob.wait_rotation()
+                knob.deinit()
+            keypad_keys.assert_not_called()
+            return result
+
+        self.assertEqual(run_virtual(main())[0], -1)
+
+    def test_in_multi_button(self):
+        async def consume(knob, loop):
+            keys = ScriptedKeys(loop.ticks_ms, [(100, True), (200, False)])
+            with patch("async_button.keypad.Keys", return_value=keys):
+                button = Button(4, True, clock=loop.ticks_ms)
+            multi = async_button.MultiButton(knob=knob, button=button)
+            try:
+                return await multi.wait(knob=RotaryEncoder.ROTATED, button=Button.LONG)
+            finally:
+                button.deinit()
+
+        self.assertEqual(
+            run_encoder([(500, 2)], [], consume), ("knob", RotaryEncoder.ROTATED)
+        )
+
+    def test_group_start_encoder_busy(self):
+        async def main():
+            rotaryio = MagicMock()
+            rotaryio.IncrementalEncoder.side_effect = ValueError("pin in use")
+            keys = MagicMock()
+            with patch("async_button.rotaryio", rotaryio), patch(
+                "async_button.keypad.Keys", return_value=keys
+            ):
+                button = Button(4, True, start=False)
+                knob = RotaryEncoder(1, 2, start=False)
+                multi = async_button.MultiButton(button=button, knob=knob)
+                with self.assertRaises(ValueError):
+                    multi.start()
+            keys.deinit.assert_called_once()
+            self.assertIsNone(button.keys)
+            self.assertIsNone(button.monitor_task)
+            self.assertIsNone(knob.monitor_task)
+
+        run_virtual(main())
+
+    def test_button_rejects_rotated(self):
+        async def main():
+            with patch("async_button.keypad.Keys"):
+                button = Button(4, True)
+                try:
+                    await button.wait(RotaryEncoder.ROTATED)
+                finally:
+                    button.deinit()
+
+        with self.assertRaises(KeyError):
+            run_virtual(main())
@@ -0,0 +1,137 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for touch pad and resistor ladder keys
+"""
+import asyncio
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+
+from async_button import Button, ButtonMatrix, LadderKeys, TouchKeys
+from async_button_testing import run_virtual
+
+
+class FakePad:
+    # pylint: disable=too-few-public-methods
+    def __init__(self, threshold=1000):
+        self.threshold = threshold
+        self.raw_value = 900
+        self.deinit = MagicMock()
+
+
+def make_touch_keys(count, **kwargs):
+    touchio = MagicMock()
+    touchio.TouchIn.side_effect = lambda pin: FakePad()
+    with patch("async_button.touchio", touchio):
+        return TouchKeys(list(range(count)), **kwargs)
+
+
+def make_ladder(levels, **kwargs):
+    analogio = MagicMock()
+    with patch("async_button.analogio", analogio):
+        return LadderKeys(0, levels, **kwargs)
+
+
+def scan(keys):
+    count = keys.scan()
+    return [(keys.changed_keys[i], keys.changed_pressed[i]) for i in range(count)]
+
+
+class TestTouchKeys(TestCase):
+    def test_debounce(self):
+        keys = make_touch_keys(3)
+        keys.pads[1].raw_value = 1200
+        self.assertEqual(scan(keys), [])
+        self.assertEqual(scan(keys), [(1, 1)])
+        self.assertTrue(keys.pressed(1))
+        self.assertEqual(scan(keys), [])
+
+    def test_glitch_is_ignored(self):
+        keys = make_touch_keys(1, debounce=3)
+        keys.pads[0].raw_value = 1200
+        scan(keys)
+        scan(keys)
+        keys.pads[0].raw_value = 900
+        scan(keys)
+        keys.pads[0].raw_value = 1200
+        self.assertEqual(scan(keys), [])
+        self.assertEqual(scan(keys), [])
+        self.assertEqual(scan(keys), [(0, 1)])
+
+    def test_hysteresis(self):
+        keys = make_touch_keys(1, debounce=1, hysteresis=100)
+        keys.pads[0].raw_value = 1001
+        self.assertEqual(scan(keys), [(0, 1)])
+        keys.pads[0].raw_value = 950
+        self.assertEqual(scan(keys), [])
+        keys.pads[0].raw_value = 900
+        self.assertEqual(scan(keys), [(0, 0)])
+
+    def test_all_pads_in_one_pass(self):
+        keys = make_touch_keys(4, debounce=1, thresholds=(100, 200, 300, 400))
+        for pad in keys.pads:
+            pad.raw_value = 250
+        self.assertEqual(scan(keys), [(0, 1), (1, 1)])
+
+    def test_deinit(self):
+        keys = make_touch_keys(2)
+        keys.deinit()
+        for pad in keys.pads:
+            self.assertEqual(pad.deinit.call_count, 1)
+
+    def test_bad_debounce(self):
+        with self.assertRaises(ValueError):
+            make_touch_keys(2, debounce=0)
+
+
+class TestLadderKeys(TestCase):
+    def setUp(self):
+        self.keys = make_ladder((10000, 30000, 50000), debounce=1)
+
+    def read(self, value):
+        self.keys.adc.value = value
+        return scan(self.keys)
+
+    def test_virtual_keys(self):
+        self.assertEqual(self.read(65535), [])
+        self.assertEqual(self.read(29000), [(1, 1)])
+        self.assertEqual(self.read(65535), [(1, 0)])
+        self.assertEqual(self.read(51000), [(2, 1)])
+
+    def test_between_levels_is_nothing(self):
+        self.assertEqual(self.read(20000), [])
+
+    def test_hysteresis(self):
+        self.read(30000)
+        self.assertEqual(self.read(33500), [])
+        self.assertEqual(self.read(34500), [(1, 0)])
+
+    def test_change_of_key(self):
+        self.read(10000)
+        self.assertEqual(self.read(30000), [(0, 0), (1, 1)])
+
+
+class TestThresholdMatrix(TestCase):
+    def test_ladder_clicks(self):
+        samples = [(100, 30000), (200, 65535), (300, 30000), (400, 65535)]
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            keys = make_ladder((10000, 30000, 50000))
+
+            def value():
+                result = 65535
+                for timestamp, level in samples:
+                    if loop.ticks_ms() >= timestamp:
+                        result = level
+                return result
+
+            type(keys.adc).value = property(lambda _: value())
+            matrix = ButtonMatrix(keys, clock=loop.ticks_ms)
+            try:
+                return await matrix.wait(Button.DOUBLE)
+            finally:
+                matrix.deinit()
+
+        self.assertEqual(run_virtual(main()), (1, [Button.DOUBLE]))
@@ -0,0 +1,297 @@
+# SPDX-FileCopyrightText: Copyright (c) 2023 Phil Underwood for Underwood Underground
+#
+# SPDX-License-Identifier: MIT
+"""
+Tests for the virtual time loop, and many gestures run through a real Button with it
+"""
+import asyncio
+import io
+import random
+import sys
+import time
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+
+from adafruit_ticks import ticks_diff
+
+sys.modules.setdefault("countio", MagicMock())
+
+# pylint: disable=wrong-import-position
+import async_button
+from async_button import Button
+from async_button_analysis import classify_edges, decode_events
+from async_button_testing import ScriptedKeys, VirtualTimeLoop, run_virtual
+
+SETTINGS = (
+    {},
+    {"triple_click_enable": True, "long_click_enable": True},
+    {"exclusive_clicks": True, "long_click_min_duration": 0.6},
+    {"double_click_enable": False, "long_click_enable": True},
+)
+
+
+def random_trace(rng, start):
+    # edges at least two polls apart, as PolledButton handles one edge per poll
+    trace = []
+    now = start
+    for _ in range(rng.randint(1, 8)):
+        now += rng.randint(41, 800)
+        trace.append((now, True))
+        now += rng.randint(41, 3000)
+        trace.append((now, False))
+    return trace
+
+
+async def run_button(trace, settings):
+    loop = asyncio.get_running_loop()
+    stream = io.BytesIO()
+    keys = ScriptedKeys(loop.ticks_ms, trace)
+    with patch("async_button.keypad.Keys", return_value=keys):
+        sink = async_button.EventSink(stream, capacity=64, clock=loop.ticks_ms)
+        button = Button(0, True, clock=loop.ticks_ms, sink=sink, **settings)
+        await asyncio.sleep(ticks_diff(trace[-1][0], loop.ticks_ms()) / 1000 + 5)
+        button.deinit()
+    return decode_events(stream.getvalue())
+
+
+def expand(records):
+    result = []
+    for _, events, timestamp, _, _ in records:
+        bit = 1
+        while bit <= events:
+            if events & bit:
+                result.append((timestamp, bit))
+            bit <<= 1
+    return sorted(result)
+
+
+class TestVirtualTimeLoop(TestCase):
+    def test_sleep_takes_no_time(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            before = loop.ticks_ms()
+            await asyncio.sleep(3600)
+            return loop.ticks_ms() - before
+
+        start = time.monotonic()
+        self.assertEqual(run_virtual(main()), 3600000)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_ticks_wrap_around(self):
+        async def main():
+            await asyncio.sleep(2)
+            return asyncio.get_running_loop().ticks_ms()
+
+        self.assertEqual(run_virtual(main(), start_ms=(1 << 29) - 1000), 1000)
+
+    def test_tasks_interleave(self):
+        order = []
+
+        async def sleeper(name, delay):
+            await asyncio.sleep(delay)
+            order.append(name)
+
+        async def main():
+            await asyncio.gather(sleeper("b", 2), sleeper("a", 1), sleeper("c", 3))
+
+        run_virtual(main())
+        self.assertEqual(order, ["a", "b", "c"])
+
+    def test_long_click_timing(self):
+        loop = VirtualTimeLoop()
+
+        async def main():
+            keys = ScriptedKeys(loop.ticks_ms, [(100, True), (2500, False)])
+            with patch("async_button.keypad.Keys", return_value=keys):
+                button = Button(0, True, long_click_enable=True, clock=loop.ticks_ms)
+                record = await button.wait_record(Button.LONG)
+                button.deinit()
+                return record.timestamp, loop.ticks_ms()
+
+        try:
+            self.assertEqual(loop.run_until_complete(main()), (2100, 2101))
+        finally:
+            loop.close()
+
+    def test_simultaneous_clicks(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            names = ("a", "b", "c")
+            keys = [
+                ScriptedKeys(loop.ticks_ms, [(100, True), (200, False)]) for _ in names
+            ]
+            with patch("async_button.keypad.Keys", side_effect=keys):
+                multi = async_button.MultiButton(
+                    **{name: Button(0, True, clock=loop.ticks_ms) for name in names}
+                )
+            clicks = {name: Button.SINGLE for name in names}
+            try:
+                first = await multi.wait(**clicks)
+                rest = await multi.wait_many(**clicks)
+                return [first] + rest
+            finally:
+                for button in multi.buttons.values():
+                    button.deinit()
+
+        self.assertEqual(
+            run_virtual(main()),
+            [("a", Button.SINGLE), ("b", Button.SINGLE), ("c", Button.SINGLE)],
+        )
+
+
+class TestManyGestures(TestCase):
+    def test_matches_offline_classifier(self):
+        rng = random.Random(1234)
+        for i in range(100):
+            settings = SETTINGS[i % len(SETTINGS)]
+            start = rng.choice((0, (1 << 29) - 2000))
+            trace = random_trace(rng, start)
+            # the offline classifier wants times that do not wrap around
+            events, times = classify_edges(
+                [t for t, _ in trace],
+                [p for _, p in trace],
+                end=trace[-1][0] + 5000,
+                **settings,
+            )
+            trace = [(t % (1 << 29), pressed) for t, pressed in trace]
+            records = run_virtual(run_button(trace, settings), start_ms=start)
+            expected = sorted(
+                (int(t) % (1 << 29), int(e)) for t, e in zip(times, events)
+            )
+            self.assertEqual(expand(records), expected, (settings, trace))
+
+
+class TestLateness(TestCase):
+    @staticmethod
+    async def run_with_hog(trace, hog_at, hog_for, **kwargs):
+        loop = asyncio.get_running_loop()
+        late = []
+        keys = ScriptedKeys(loop.ticks_ms, trace)
+        with patch("async_button.keypad.Keys", return_value=keys):
+            button = Button(
+                0,
+                True,
+                clock=loop.ticks_ms,
+                lateness_budget=0.05,
+                on_late=lambda button, lateness: late.append(lateness),
+                **kwargs,
+            )
+            await asyncio.sleep(hog_at / 1000)
+            loop.busy(hog_for / 1000)
+            clicks = await button.wait(Button.ANY_CLICK)
+            button.deinit()
+        return button, late, clicks
+
+    def test_on_time(self):
+        button, late, _ = run_virtual(
+            self.run_with_hog([(100, True), (200, False)], 50, 0)
+        )
+        self.assertEqual(late, [])
+        self.assertEqual(button.max_lateness, 0)
+        self.assertEqual(button.late_count, 0)
+
+    def test_starved_monitor_reported(self):
+        button, late, _ = run_virtual(
+            self.run_with_hog([(100, True), (200, False)], 50, 300)
+        )
+        self.assertEqual(len(late), 1)
+        self.assertAlmostEqual(late[0], 300, delta=20)
+        self.assertEqual(button.max_lateness, late[0])
+        self.assertEqual(button.late_count, 1)
+
+    def test_short_press_stall_not_long(self):
+        _, _, clicks = run_virtual(
+            self.run_with_hog(
+                [(100, True), (300, False)], 50, 3000, long_click_enable=True
+            )
+        )
+        self.assertEqual(clicks, [Button.SINGLE])
+
+    def test_double_click_during_stall(self):
+        _, _, clicks = run_virtual(
+            self.run_with_hog(
+                [(100, True), (200, False), (400, True), (500, False)],
+                50,
+                2000,
+                exclusive_clicks=True,
+            )
+        )
+        self.assertEqual(clicks, [Button.DOUBLE])
+
+    def test_overdue_long_own_record(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            seen = []
+            sink = MagicMock()
+            sink.add = lambda source, record: seen.append(
+                (record.events, record.timestamp, record.duration)
+            )
+            keys = ScriptedKeys(loop.ticks_ms, [(100, True), (2600, False)])
+            with patch("async_button.keypad.Keys", return_value=keys):
+                button = Button(
+                    0, True, long_click_enable=True, clock=loop.ticks_ms, sink=sink
+                )
+                await asyncio.sleep(0.05)
+                loop.busy(3)
+                await asyncio.sleep(0.1)
+                button.deinit()
+            return seen
+
+        self.assertEqual(
+            run_virtual(main()),
+            [
+                (Button.PRESSED, 100, 0),
+                (Button.LONG, 2100, 2000),
+                (Button.RELEASED, 2600, 2500),
+            ],
+        )
+
+
+class TestSharedWait(TestCase):
+    def test_wait_sees_both_records(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            keys = ScriptedKeys(loop.ticks_ms, [(100, True), (2600, False)])
+            with patch("async_button.keypad.Keys", return_value=keys):
+                button = Button(0, True, long_click_enable=True, clock=loop.ticks_ms)
+                waiter = asyncio.create_task(
+                    button.wait((Button.LONG, Button.RELEASED))
+                )
+                await asyncio.sleep(0.05)
+                loop.busy(3)
+                clicks = await waiter
+                button.deinit()
+            return clicks
+
+        self.assertEqual(run_virtual(main()), [Button.LONG, Button.RELEASED])
+
+    def test_ignores_unwatched_events(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            trace = [(100, True), (200, False), (1000, True), (1100, False)]
+            keys = ScriptedKeys(loop.ticks_ms, trace + [(2000, True), (3000, False)])
+            with patch("async_button.keypad.Keys", return_value=keys):
+                button = Button(0, True, clock=loop.ticks_ms)
+                first = await button.wait((Button.PRESSED, Button.RELEASED))
+                await asyncio.sleep(1.5)  # busy while the second click happens
+                second = await button.wait((Button.PRESSED, Button.RELEASED))
+                button.deinit()
+            return first, second
+
+        self.assertEqual(run_virtual(main()), ([Button.PRESSED], [Button.PRESSED]))
+
+    def test_exclusive_after_unwatched(self):
+        async def main():
+            loop = asyncio.get_running_loop()
+            trace = [(100, True), (200, False), (1000, True), (1100, False)]
+            trace += [(2000, True), (2100, False), (2200, True), (2300, False)]
+            keys = ScriptedKeys(loop.ticks_ms, trace)
+            with patch("async_button.keypad.Keys", return_value=keys):
+                button = Button(0, True, exclusive_clicks=True, clock=loop.ticks_ms)
+                first = await button.wait_for_click()
+                await asyncio.sleep(1.2)  # busy while the second click happens
+                second = await button.wait_for_click()
+                button.deinit()
+            return first, second
+
+        self.assertEqual(run_virtual(main()), (Button.SINGLE, Button.DOUBLE))